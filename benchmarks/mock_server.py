@@ -0,0 +1,351 @@
+"""Local stand-in for the Shaarli REST API
+
+The server keeps a seeded link collection in memory, and implements the
+endpoints used by the client with Shaarli's semantics, so that the client can
+be benchmarked without a PHP instance. Authentication tokens are not
+checked, but must be sent.
+
+Usage::
+
+    $ python -m benchmarks.mock_server --links 10000 --tags 500 --latency 5
+"""
+import json
+import random
+import re
+import sys
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from shaarli_client.search import LinkFilter
+
+ROUTES = [
+    ('GET', re.compile(r'^/api/v1/info$'), 'get_info'),
+    ('GET', re.compile(r'^/api/v1/links$'), 'get_links'),
+    ('POST', re.compile(r'^/api/v1/links$'), 'post_link'),
+    ('PUT', re.compile(r'^/api/v1/links/(\d+)$'), 'put_link'),
+    ('DELETE', re.compile(r'^/api/v1/links/(\d+)$'), 'delete_link'),
+    ('GET', re.compile(r'^/api/v1/tags$'), 'get_tags'),
+    ('GET', re.compile(r'^/api/v1/tags/(.+)$'), 'get_tag'),
+    ('PUT', re.compile(r'^/api/v1/tags/(.+)$'), 'put_tag'),
+    ('DELETE', re.compile(r'^/api/v1/tags/(.+)$'), 'delete_tag'),
+]
+
+WORDS = (
+    'alpha bravo charlie delta echo foxtrot golf hotel india juliet kilo lima'
+    ' mike november oscar papa quebec romeo sierra tango uniform victor'
+    ' whiskey xray yankee zulu'
+).split()
+
+
+def make_link(link_id, tags, rng):
+    """Build a link, as returned by the REST API"""
+    date = time.strftime('%Y-%m-%dT%H:%M:%S+00:00',
+                         time.gmtime(1500000000 + link_id * 3600))
+    return {
+        'id': link_id,
+        'url': 'https://example.org/%s/%d' % (rng.choice(WORDS), link_id),
+        'shorturl': 'x%06d' % link_id,
+        'title': ' '.join(rng.choice(WORDS) for _ in range(5)),
+        'description': ' '.join(rng.choice(WORDS) for _ in range(30)),
+        'tags': tags,
+        'private': rng.random() < 0.2,
+        'created': date,
+        'updated': date,
+    }
+
+
+class LinkStore:
+    """Thread-safe in-memory link collection, newest links first"""
+
+    def __init__(self, links=0, tags=0, seed=0):
+        """Seed the collection with ``links`` links, using ``tags`` tags"""
+        rng = random.Random(seed)
+        tag_names = ['tag%d' % index for index in range(tags)]
+
+        self.lock = threading.Lock()
+        self.links = [
+            make_link(link_id,
+                      rng.sample(tag_names, min(len(tag_names), 3)),
+                      rng)
+            for link_id in range(links, 0, -1)
+        ]
+        self.next_id = links + 1
+
+    def get_info(self, query, body):
+        """Get information about this instance"""
+        # pylint: disable=unused-argument
+        return (200, {
+            'global_counter': len(self.links),
+            'private_counter': sum(link['private'] for link in self.links),
+            'settings': {'title': "Mock Shaarli", 'header_link': '?',
+                         'timezone': 'UTC', 'enabled_plugins': [],
+                         'default_private_links': False},
+        })
+
+    def get_links(self, query, body):
+        """Get a page of links, filtered by get-links parameters"""
+        # pylint: disable=unused-argument
+        link_filter = LinkFilter(query.get('searchterm'),
+                                 query.get('searchtags'))
+        visibility = query.get('visibility', 'all')
+        offset = int(query.get('offset', 0))
+        limit = query.get('limit', '20')
+
+        links = [
+            link for link in self.links
+            if (visibility == 'all'
+                or link['private'] == (visibility == 'private'))
+            and link_filter.match(link)
+        ]
+        end = None if limit == 'all' else offset + int(limit)
+        return (200, links[offset:end])
+
+    def post_link(self, query, body):
+        """Create a link"""
+        # pylint: disable=unused-argument
+        with self.lock:
+            date = time.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            link = dict(body, id=self.next_id, shorturl='x%06d' % self.next_id,
+                        created=date, updated=date)
+            # fields defaulted by Shaarli
+            link.setdefault('tags', [])
+            link.setdefault('private', False)
+            link.setdefault('description', '')
+            link['title'] = link.get('title') or link.get('url') or ''
+            self.next_id += 1
+            self.links.insert(0, link)
+        return (201, link)
+
+    def _find_link(self, link_id):
+        """Find a link by ID"""
+        for link in self.links:
+            if link['id'] == int(link_id):
+                return link
+        return None
+
+    def put_link(self, query, body, link_id):
+        """Update a link"""
+        # pylint: disable=unused-argument
+        with self.lock:
+            link = self._find_link(link_id)
+            if link is None:
+                return (404, {})
+            link.update(body)
+            link['updated'] = time.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+        return (200, link)
+
+    def delete_link(self, query, body, link_id):
+        """Delete a link"""
+        # pylint: disable=unused-argument
+        with self.lock:
+            link = self._find_link(link_id)
+            if link is None:
+                return (404, {})
+            self.links.remove(link)
+        return (204, None)
+
+    @staticmethod
+    def _tag_counts(links):
+        """Count tag occurrences"""
+        counts = {}
+        for link in links:
+            for tag in link['tags']:
+                counts[tag] = counts.get(tag, 0) + 1
+        return counts
+
+    def get_tags(self, query, body):
+        """Get tags ordered by decreasing occurrences"""
+        # pylint: disable=unused-argument
+        visibility = query.get('visibility', 'all')
+        offset = int(query.get('offset', 0))
+        limit = query.get('limit', 'all')
+
+        counts = self._tag_counts(
+            link for link in self.links
+            if visibility == 'all'
+            or link['private'] == (visibility == 'private')
+        )
+        tags = [
+            {'name': name, 'occurrences': count}
+            for name, count in sorted(counts.items(),
+                                      key=lambda item: (-item[1], item[0]))
+        ]
+        end = None if limit == 'all' else offset + int(limit)
+        return (200, tags[offset:end])
+
+    def get_tag(self, query, body, name):
+        """Get a single tag"""
+        # pylint: disable=unused-argument
+        count = self._tag_counts(self.links).get(name)
+        if count is None:
+            return (404, {})
+        return (200, {'name': name, 'occurrences': count})
+
+    def put_tag(self, query, body, name):
+        """Rename a tag on every link"""
+        # pylint: disable=unused-argument
+        new_name = body.get('name')
+        with self.lock:
+            count = 0
+            for link in self.links:
+                if name in link['tags']:
+                    link['tags'] = [new_name if tag == name else tag
+                                    for tag in link['tags']]
+                    count += 1
+        if not count:
+            return (404, {})
+        return (200, {'name': new_name, 'occurrences': count})
+
+    def delete_tag(self, query, body, name):
+        """Remove a tag from every link"""
+        # pylint: disable=unused-argument
+        with self.lock:
+            count = 0
+            for link in self.links:
+                if name in link['tags']:
+                    link['tags'] = [tag for tag in link['tags']
+                                    if tag != name]
+                    count += 1
+        if not count:
+            return (404, {})
+        return (204, None)
+
+
+class MockShaarliHandler(BaseHTTPRequestHandler):
+    """Route API requests to the link store of the server"""
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format,  # pylint: disable=redefined-builtin
+                    *args):
+        """Do not log requests"""
+
+    def _respond(self, method):
+        """Answer a request"""
+        url = urlsplit(self.path)
+        query = {
+            name: values[-1]
+            for name, values in parse_qs(url.query).items()
+        }
+
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'null') or {}
+
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        status, data = (404, {})
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            status, data = (401, {})
+        else:
+            for route_method, pattern, name in ROUTES:
+                match = pattern.match(url.path)
+                if route_method == method and match:
+                    try:
+                        status, data = getattr(self.server.store, name)(
+                            query, body, *map(unquote, match.groups())
+                        )
+                    except Exception as exc:  # pylint: disable=broad-except
+                        # answer, rather than dropping the connection
+                        status, data = (500, {'message': str(exc)})
+                    break
+
+        content = b'' if data is None else json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def do_GET(self):
+        """Answer GET requests"""
+        # pylint: disable=invalid-name
+        self._respond('GET')
+
+    def do_POST(self):
+        """Answer POST requests"""
+        # pylint: disable=invalid-name
+        self._respond('POST')
+
+    def do_PUT(self):
+        """Answer PUT requests"""
+        # pylint: disable=invalid-name
+        self._respond('PUT')
+
+    def do_DELETE(self):
+        """Answer DELETE requests"""
+        # pylint: disable=invalid-name
+        self._respond('DELETE')
+
+
+class MockShaarliServer(ThreadingMixIn, HTTPServer):
+    """Multi-threaded mock Shaarli server
+
+    Every request is answered after ``latency`` seconds.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, store, latency=0):
+        """Server constructor"""
+        HTTPServer.__init__(self, address, MockShaarliHandler)
+        self.store = store
+        self.latency = latency
+
+    @property
+    def url(self):
+        """URL of the mock Shaarli instance"""
+        return 'http://%s:%d' % self.server_address[:2]
+
+
+def start_server(links=0, tags=0, latency=0, seed=0, port=0):
+    """Start a mock server in a background thread, and return it"""
+    server = MockShaarliServer(('127.0.0.1', port),
+                               LinkStore(links, tags, seed), latency)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def serve(connection, links, tags, latency, seed):
+    """Run a mock server, sending its URL through a pipe
+
+    This is the target of the server process started by the benchmarks.
+    """
+    server = MockShaarliServer(('127.0.0.1', 0),
+                               LinkStore(links, tags, seed), latency)
+    connection.send(server.url)
+    server.serve_forever()
+
+
+def main():
+    """Mock server entrypoint"""
+    parser = ArgumentParser(description="Run a mock Shaarli API server")
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--links', type=int, default=1000,
+                        help="Number of seeded links")
+    parser.add_argument('--tags', type=int, default=100,
+                        help="Number of seeded tags")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Artificial latency, in milliseconds")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockShaarliServer(('127.0.0.1', args.port),
+                               LinkStore(args.links, args.tags, args.seed),
+                               args.latency / 1000)
+    print("Serving a mock Shaarli instance on %s" % server.url)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
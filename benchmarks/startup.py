@@ -0,0 +1,160 @@
+"""CLI startup benchmark
+
+Measures, in fresh interpreters, the time it takes to import the CLI
+entrypoint and to run a few commands that do not reach any server, and
+checks that heavy modules are not imported on these paths.
+
+Usage::
+
+    $ python -m benchmarks.startup --output startup.json
+    $ python -m benchmarks.startup --baseline startup.json --max-regression 20
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+# modules that must only be imported when a request is actually sent
+HEAVY_MODULES = ['aiohttp', 'gzip', 'html.parser', 'jwt', 'requests',
+                 'shaarli_client.analytics', 'shaarli_client.bookmarks',
+                 'shaarli_client.dedupe', 'shaarli_client.export',
+                 'shaarli_client.tags', 'sqlite3', 'urllib3']
+
+SCENARIOS = {
+    'import': ['-c', 'import shaarli_client.main'],
+    'help': ['-m', 'shaarli_client.main', '--help'],
+    'endpoint-help': ['-m', 'shaarli_client.main', 'get-links', '--help'],
+    'missing-config': ['-m', 'shaarli_client.main', 'get-info'],
+}
+
+PROBE = '''
+import sys
+from shaarli_client.main import generate_parser
+generate_parser().parse_args(sys.argv[1:])
+print(' '.join(sorted(
+    name for name in %r if name in sys.modules
+)))
+''' % (HEAVY_MODULES,)
+
+
+def run_scenario(arguments, runs, env):
+    """Run a command in fresh interpreters, returning durations in ms"""
+    durations = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable] + arguments,
+            env=env,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        durations.append((time.perf_counter() - start) * 1000)
+
+    return durations
+
+
+def heavy_imports(arguments, env):
+    """List the heavy modules imported while parsing CLI arguments"""
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE] + arguments,
+        env=env,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return output.split()
+
+
+def baseline_interpreter(runs, env):
+    """Measure the startup time of a bare interpreter, in ms"""
+    return statistics.median(run_scenario(['-c', 'pass'], runs, env))
+
+
+def benchmark(runs):
+    """Run all startup scenarios, returning a report"""
+    with tempfile.TemporaryDirectory() as home:
+        # isolate from the user's configuration files
+        env = dict(os.environ, HOME=home, XDG_CONFIG_HOME=home)
+
+        report = {
+            'python': sys.version.split()[0],
+            'runs': runs,
+            'interpreter_ms': baseline_interpreter(runs, env),
+            'scenarios': {},
+            'heavy_imports': heavy_imports(['get-info'], env),
+        }
+
+        for name, arguments in SCENARIOS.items():
+            durations = run_scenario(arguments, runs, env)
+            report['scenarios'][name] = {
+                'median_ms': statistics.median(durations),
+                'min_ms': min(durations),
+                'max_ms': max(durations),
+            }
+
+    return report
+
+
+def compare(report, baseline, max_regression):
+    """List the scenarios slower than in a baseline report"""
+    regressions = []
+
+    for name, result in report['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+
+        # compare the time spent on top of the bare interpreter startup
+        current = result['median_ms'] - report['interpreter_ms']
+        reference = previous['median_ms'] - baseline['interpreter_ms']
+        if current > reference * (1 + max_regression / 100) + 1:
+            regressions.append(
+                "%s: %.1f ms (baseline: %.1f ms)" % (name, current, reference)
+            )
+
+    return regressions
+
+
+def main():
+    """Benchmark entrypoint"""
+    parser = ArgumentParser(description="Measure the CLI startup time")
+    parser.add_argument('--runs', type=int, default=10,
+                        help="Number of runs per scenario")
+    parser.add_argument('--output', help="Save the report to a JSON file")
+    parser.add_argument('--baseline',
+                        help="Compare with a report saved earlier")
+    parser.add_argument('--max-regression', type=float, default=25,
+                        help="Tolerated slowdown against the baseline, in %%")
+    args = parser.parse_args()
+
+    report = benchmark(args.runs)
+    print(json.dumps(report, indent=4, sort_keys=True))
+
+    if args.output:
+        with open(args.output, 'w') as f_output:
+            json.dump(report, f_output, indent=4, sort_keys=True)
+
+    errors = []
+    if report['heavy_imports']:
+        errors.append("Heavy modules imported at startup: %s"
+                      % ', '.join(report['heavy_imports']))
+
+    if args.baseline:
+        with open(args.baseline) as f_baseline:
+            errors.extend(compare(report, json.load(f_baseline),
+                                  args.max_regression))
+
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,347 @@
+"""Client benchmark suite, run against a local mock Shaarli server
+
+Each scenario drives the client through a typical workload, and reports its
+throughput (requests and items per second), the latency of its requests
+(50th, 95th and 99th percentiles) and its memory usage: each scenario runs
+in a fresh process, so that peak memory usages can be compared.
+
+Usage::
+
+    $ python -m benchmarks.suite --links 5000 --latency 2 --output run.json
+    $ python -m benchmarks.suite --baseline run.json --max-regression 10
+"""
+import json
+import multiprocessing
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+from shaarli_client.client import ShaarliV1Client
+from shaarli_client.client.bulk import bulk_map
+from shaarli_client.models import LinkCollection
+from shaarli_client.utils import format_items
+
+from .mock_server import serve
+
+SECRET = 'benchmark-secret-benchmark-secret-benchmark-secret-benchmark-sec'
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of values"""
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def peak_rss():
+    """Peak resident set size of this process, in MiB, if available"""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kibibytes on Linux, bytes on macOS
+    return usage / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def record_latencies(client):
+    """Record the duration of the requests sent by a client, in seconds"""
+    latencies = []
+    send = client.session.request
+
+    def timed_request(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return send(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    client.session.request = timed_request
+    return latencies
+
+
+def scenario_get_links(client, options):
+    """Walk the whole link collection, page by page"""
+    links = client.iter_links({}, page_size=options.page_size)
+    return sum(1 for _ in links)
+
+
+def scenario_get_links_parallel(client, options):
+    """Walk the whole link collection, fetching pages concurrently"""
+    links = client.iter_links({}, page_size=options.page_size,
+                              parallel=options.concurrency)
+    return sum(1 for _ in links)
+
+
+def scenario_bulk_post(client, options):
+    """Create links concurrently"""
+    links = (
+        {'url': 'https://bench.example.org/%d' % index,
+         'title': "Benchmark link %d" % index,
+         'tags': ['benchmark']}
+        for index in range(options.posts)
+    )
+    results = client.post_links(links, concurrency=options.concurrency)
+    return sum(1 for result in results if result.ok)
+
+
+def scenario_tag_renames(client, options):
+    """Rename tags concurrently"""
+    results = bulk_map(
+        lambda index: client.put_tag('tag%d' % index,
+                                     {'name': 'renamed%d' % index}),
+        range(min(options.renames, options.tags)),
+        options.concurrency
+    )
+    return sum(1 for result in results if result.ok)
+
+
+def scenario_format(client, options):
+    """Format a page of links for every output format, without requests"""
+    response = client.get_links({'limit': options.page_size})
+    links = response.json()
+    del client.latencies[:]
+
+    count = 0
+    for _ in range(options.format_rounds):
+        for output_format in ('json', 'jsonl', 'pprint', 'text'):
+            for _ in format_items(output_format, links):
+                pass
+            count += len(links)
+    return count
+
+
+def scenario_link_collection(client, options):
+    """Load the whole link collection into memory, indexed"""
+    links = LinkCollection.from_dicts(
+        client.iter_links({}, page_size=options.page_size)
+    )
+    return len(links)
+
+
+SCENARIOS = {
+    'get-links': scenario_get_links,
+    'get-links-parallel': scenario_get_links_parallel,
+    'bulk-post': scenario_bulk_post,
+    'tag-renames': scenario_tag_renames,
+    'format': scenario_format,
+    'link-collection': scenario_link_collection,
+}
+
+
+def run_scenario(url, name, options):
+    """Run a scenario with a fresh client, returning its measures"""
+    rss_before = peak_rss()
+
+    with ShaarliV1Client(url, SECRET,
+                         pool_maxsize=max(10, options.concurrency)) as client:
+        client.latencies = record_latencies(client)
+
+        start = time.perf_counter()
+        items = SCENARIOS[name](client, options)
+        duration = time.perf_counter() - start
+
+        latencies = [latency * 1000 for latency in client.latencies]
+
+    rss_after = peak_rss()
+    rss_growth = rss_after - rss_before if rss_after is not None else None
+    return {
+        'duration_s': duration,
+        'items': items,
+        'items_per_s': items / duration if duration else None,
+        'requests': len(latencies),
+        'rps': len(latencies) / duration if duration else None,
+        'latency_ms': {
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+        },
+        'peak_rss_mb': rss_after,
+        'rss_growth_mb': rss_growth,
+    }
+
+
+def _send_scenario_result(sender, url, name, options):
+    """Run a scenario, and send its measures through a pipe"""
+    sender.send(run_scenario(url, name, options))
+    sender.close()
+
+
+def run_isolated_scenario(url, name, options):
+    """Run a scenario in a fresh process, returning its measures
+
+    The peak memory usage of a process only grows: running each scenario in
+    its own process measures the memory usage of this scenario alone.
+    """
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_send_scenario_result,
+                              args=(sender, url, name, options))
+    process.start()
+    # only the scenario process holds the sending end, once started
+    sender.close()
+
+    try:
+        return receiver.recv()
+    except EOFError:
+        raise RuntimeError("Scenario %s failed" % name)
+    finally:
+        process.join()
+
+
+def git_revision():
+    """Current git commit, if any"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            universal_newlines=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(options):
+    """Start a mock server in a separate process, and run the scenarios"""
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    server = multiprocessing.Process(
+        target=serve,
+        args=(sender, options.links, options.tags, options.latency / 1000,
+              options.seed),
+        daemon=True,
+    )
+    server.start()
+
+    try:
+        url = receiver.recv()
+        report = {
+            'python': sys.version.split()[0],
+            'revision': git_revision(),
+            'parameters': {
+                name: getattr(options, name)
+                for name in ('links', 'tags', 'latency', 'page_size',
+                             'concurrency', 'posts', 'renames')
+            },
+            'scenarios': {},
+        }
+
+        # scenarios run in order: reads first, then writes
+        for name in SCENARIOS:
+            if options.scenarios and name not in options.scenarios:
+                continue
+            report['scenarios'][name] = run_isolated_scenario(url, name,
+                                                              options)
+    finally:
+        server.terminate()
+        server.join()
+
+    return report
+
+
+def compare(report, baseline, max_regression):
+    """List the measures worse than in a baseline report"""
+    regressions = []
+    tolerance = max_regression / 100
+
+    for name, result in report['scenarios'].items():
+        previous = baseline['scenarios'].get(name)
+        if previous is None:
+            continue
+
+        if result['items_per_s'] and previous['items_per_s'] \
+                and result['items_per_s'] < \
+                previous['items_per_s'] * (1 - tolerance):
+            regressions.append(
+                "%s: %.1f items/s (baseline: %.1f items/s)"
+                % (name, result['items_per_s'], previous['items_per_s'])
+            )
+
+        current, reference = (result['latency_ms']['p95'],
+                              previous['latency_ms']['p95'])
+        if current and reference and current > reference * (1 + tolerance):
+            regressions.append(
+                "%s: p95 latency %.2f ms (baseline: %.2f ms)"
+                % (name, current, reference)
+            )
+
+        current, reference = (result.get('peak_rss_mb'),
+                              previous.get('peak_rss_mb'))
+        if current and reference and current > reference * (1 + tolerance):
+            regressions.append(
+                "%s: peak memory usage %.1f MiB (baseline: %.1f MiB)"
+                % (name, current, reference)
+            )
+
+    return regressions
+
+
+def generate_parser():
+    """Generate the benchmark argument parser"""
+    parser = ArgumentParser(description="Benchmark the Shaarli client")
+    parser.add_argument('scenarios', nargs='*',
+                        help="Scenarios to run, among: %s (default: all)"
+                        % ', '.join(SCENARIOS))
+    parser.add_argument('--links', type=int, default=2000,
+                        help="Number of links seeded on the server")
+    parser.add_argument('--tags', type=int, default=200,
+                        help="Number of tags seeded on the server")
+    parser.add_argument('--latency', type=float, default=0,
+                        help="Artificial server latency, in milliseconds")
+    parser.add_argument('--seed', type=int, default=0,
+                        help="Random seed of the link collection")
+    parser.add_argument('--page-size', type=int, default=100,
+                        help="Number of links per page")
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help="Number of concurrent requests")
+    parser.add_argument('--posts', type=int, default=500,
+                        help="Number of links to create")
+    parser.add_argument('--renames', type=int, default=100,
+                        help="Number of tags to rename")
+    parser.add_argument('--format-rounds', type=int, default=20,
+                        help="Number of times a page is formatted")
+    parser.add_argument('--output', help="Save the report to a JSON file")
+    parser.add_argument('--baseline',
+                        help="Compare with a report saved earlier")
+    parser.add_argument('--max-regression', type=float, default=10,
+                        help="Tolerated slowdown or memory usage increase"
+                             " against the baseline, in %%")
+    return parser
+
+
+def main():
+    """Benchmark entrypoint"""
+    parser = generate_parser()
+    options = parser.parse_args()
+
+    unknown = set(options.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error("unknown scenarios: %s" % ', '.join(sorted(unknown)))
+
+    report = benchmark(options)
+    print(json.dumps(report, indent=4, sort_keys=True))
+
+    if options.output:
+        with open(options.output, 'w') as f_output:
+            json.dump(report, f_output, indent=4, sort_keys=True)
+
+    if not options.baseline:
+        return 0
+
+    with open(options.baseline) as f_baseline:
+        regressions = compare(report, json.load(f_baseline),
+                              options.max_regression)
+
+    for regression in regressions:
+        print(regression, file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
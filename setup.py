@@ -33,7 +33,7 @@ setup(
     license='MIT',
     url='https://github.com/shaarli/python-shaarli-client',
     keywords='bookmark bookmarking shaarli social',
-    packages=find_packages(exclude=['tests.*', 'tests']),
+    packages=find_packages(exclude=['benchmarks', 'tests.*', 'tests']),
     entry_points={
         'console_scripts': [
             'shaarli = shaarli_client.main:main',
@@ -43,6 +43,11 @@ setup(
         'requests >= 2.25',
         'pyjwt == 2.4.0'
     ],
+    extras_require={
+        'async': ['aiohttp >= 3.7'],
+        'zstd': ['zstandard >= 0.15'],
+        'arrow': ['pyarrow >= 3.0'],
+    },
     classifiers=[
         'Development Status :: 3 - Alpha',
         'Environment :: Console',
@@ -0,0 +1,176 @@
+"""Tag analytics, computed from a single pass over a link collection"""
+import csv
+import io
+from collections import Counter
+from itertools import chain, combinations, islice
+
+from .utils import GROWTH_PERIODS
+
+
+class TagStats:
+    """Tag counts, co-occurrences, visibility and growth over time
+
+    Links are accounted in batches: the tags of a whole batch are counted at
+    once, which is much faster than counting them link by link.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, period='month', batch_size=1000):
+        """Start accounting links, with growth measured per ``period``"""
+        if period not in GROWTH_PERIODS:
+            raise ValueError("%s is not a supported period" % period)
+
+        self.period = period
+        self.batch_size = batch_size
+        self.links = 0
+        self.private_links = 0
+        self.counts = Counter()
+        self.private_counts = Counter()
+        self.pairs = Counter()
+        self.growth = Counter()
+
+    def add_links(self, links):
+        """Account links, consuming them batch by batch"""
+        links = iter(links)
+        while True:
+            batch = list(islice(links, self.batch_size))
+            if not batch:
+                return
+            self._add_batch(batch)
+
+    def _add_batch(self, links):
+        """Account a batch of links"""
+        length = GROWTH_PERIODS[self.period]
+        tag_sets = [sorted(set(link.get('tags') or [])) for link in links]
+        private = [
+            tags for link, tags in zip(links, tag_sets) if link.get('private')
+        ]
+
+        self.links += len(links)
+        self.private_links += len(private)
+        self.counts.update(chain.from_iterable(tag_sets))
+        self.private_counts.update(chain.from_iterable(private))
+        self.pairs.update(chain.from_iterable(
+            combinations(tags, 2) for tags in tag_sets
+        ))
+        self.growth.update(
+            ((link.get('created') or '')[:length] or None, tag)
+            for link, tags in zip(links, tag_sets)
+            for tag in tags
+        )
+
+    def top_tags(self, top=None):
+        """Get the ``top`` most used tags, or all of them, most used first"""
+        tags = sorted(self.counts, key=lambda tag: (-self.counts[tag], tag))
+        return tags if top is None else tags[:top]
+
+    def periods(self):
+        """Get the periods during which tagged links were created"""
+        return sorted({period for period, _ in self.growth if period})
+
+    def tag_rows(self, top=None):
+        """Get the counts of each tag, overall and per visibility"""
+        first_seen, last_seen = {}, {}
+        for period, tag in self.growth:
+            if period is None:
+                continue
+            first_seen[tag] = min(first_seen.get(tag, period), period)
+            last_seen[tag] = max(last_seen.get(tag, period), period)
+
+        return [
+            {
+                'name': tag,
+                'count': self.counts[tag],
+                'public': self.counts[tag] - self.private_counts[tag],
+                'private': self.private_counts[tag],
+                'first_seen': first_seen.get(tag),
+                'last_seen': last_seen.get(tag),
+            }
+            for tag in self.top_tags(top)
+        ]
+
+    def cooccurrence_matrix(self, top=None):
+        """Get the number of links sharing each pair of tags
+
+        Returns the tags, and a symmetric matrix as a list of rows, whose
+        diagonal holds the count of each tag.
+        """
+        tags = self.top_tags(top)
+        matrix = [
+            [
+                self.counts[tag] if tag == other
+                else self.pairs[min(tag, other), max(tag, other)]
+                for other in tags
+            ]
+            for tag in tags
+        ]
+        return (tags, matrix)
+
+    def growth_series(self, top=None):
+        """Get the number of links created per period, for each tag"""
+        periods = self.periods()
+        return (periods, {
+            tag: [self.growth[period, tag] for period in periods]
+            for tag in self.top_tags(top)
+        })
+
+    def to_dict(self, top=None):
+        """Get all statistics, as JSON-serializable data"""
+        tags, matrix = self.cooccurrence_matrix(top)
+        periods, series = self.growth_series(top)
+        return {
+            'links': self.links,
+            'private_links': self.private_links,
+            'tags': self.tag_rows(top),
+            'cooccurrence': {'tags': tags, 'matrix': matrix},
+            'growth': {
+                'period': self.period,
+                'periods': periods,
+                'series': series,
+            },
+        }
+
+    def table_rows(self, table, top=None):
+        """Get a table of statistics, as a header and rows"""
+        if table == 'tags':
+            header = ['name', 'count', 'public', 'private', 'first_seen',
+                      'last_seen']
+            return (header, [
+                [row[column] for column in header]
+                for row in self.tag_rows(top)
+            ])
+
+        if table == 'cooccurrence':
+            tags, matrix = self.cooccurrence_matrix(top)
+            return (['tag', 'other', 'count'], [
+                [tag, other, count]
+                for tag, row in zip(tags, matrix)
+                for other, count in zip(tags, row)
+                if tag < other and count
+            ])
+
+        if table == 'growth':
+            periods, series = self.growth_series(top)
+            return ([self.period, 'tag', 'count'], [
+                [period, tag, count]
+                for tag, counts in series.items()
+                for period, count in zip(periods, counts)
+                if count
+            ])
+
+        raise ValueError("%s is not a supported table" % table)
+
+
+def format_csv(header, rows):
+    """Format a table as CSV, row by row"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='')
+    separator = ''
+
+    for row in chain([header], rows):
+        writer.writerow(row)
+        yield separator + buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        separator = '\n'
@@ -0,0 +1,158 @@
+"""Netscape bookmark files, as imported and exported by web browsers"""
+import re
+from html import escape
+from html.parser import HTMLParser
+
+from .utils import parse_datetime
+
+BOOKMARKS_HEADER = '''<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<!-- This is an automatically generated file.
+     It will be read and overwritten.
+     Do Not Edit! -->
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Shaarli export</TITLE>
+<H1>Shaarli export</H1>
+<DL><p>'''
+
+BOOKMARKS_FOOTER = '</DL><p>'
+
+TAG_SEPARATOR = re.compile(r'[,\s]+')
+
+
+class BookmarkParser(HTMLParser):
+    """Incremental parser of Netscape bookmark files
+
+    Bookmarks are extracted as the file is fed to the parser, without
+    building a document tree; parsed bookmarks are retrieved with
+    ``pop_bookmarks``, as ``post-link`` parameters.
+    """
+
+    # ParserBase.error is only abstract before Python 3.10, and never called
+    # pylint: disable=abstract-method
+
+    def __init__(self):
+        """Parser constructor"""
+        super(BookmarkParser, self).__init__(convert_charrefs=True)
+        self._bookmarks = []
+        self._current = None
+        self._field = None
+
+    def _flush(self):
+        """Complete the current bookmark"""
+        if self._current is not None:
+            bookmark = {
+                field: value.strip() if isinstance(value, str) else value
+                for field, value in self._current.items()
+            }
+            self._bookmarks.append({
+                field: value
+                for field, value in bookmark.items()
+                if value not in ('', [])
+            })
+        self._current = None
+        self._field = None
+
+    def handle_starttag(self, tag, attrs):
+        """Start a bookmark, or its description"""
+        if tag == 'a':
+            self._flush()
+            attrs = dict(attrs)
+            if not attrs.get('href'):
+                return
+            self._current = {
+                'url': attrs['href'],
+                'title': '',
+                'tags': [
+                    tag_name
+                    for tag_name in TAG_SEPARATOR.split(attrs.get('tags')
+                                                        or '')
+                    if tag_name
+                ],
+                'private': attrs.get('private') == '1',
+            }
+            self._field = 'title'
+        elif tag == 'dd' and self._current is not None:
+            self._current['description'] = ''
+            self._field = 'description'
+        elif tag == 'br' and self._field == 'description':
+            self._current['description'] += '\n'
+        elif tag in ('dt', 'dl', 'h3'):
+            self._flush()
+
+    def handle_endtag(self, tag):
+        """End a bookmark title, or a list of bookmarks"""
+        if tag == 'a' and self._field == 'title':
+            self._field = None
+        elif tag == 'dl':
+            self._flush()
+
+    def handle_data(self, data):
+        """Read a bookmark title or description"""
+        if self._field is not None:
+            self._current[self._field] += data
+
+    def close(self):
+        """Parse the remaining data, completing the last bookmark"""
+        super(BookmarkParser, self).close()
+        self._flush()
+
+    def pop_bookmarks(self):
+        """Get the bookmarks parsed since the last call"""
+        bookmarks, self._bookmarks = self._bookmarks, []
+        return bookmarks
+
+
+def read_bookmarks(infile, chunk_size=65536):
+    """Read bookmarks from a Netscape bookmark file, chunk by chunk
+
+    Yields ``post-link`` parameters, as bookmarks are parsed.
+    """
+    parser = BookmarkParser()
+
+    for chunk in iter(lambda: infile.read(chunk_size), ''):
+        parser.feed(chunk)
+        yield from parser.pop_bookmarks()
+
+    parser.close()
+    yield from parser.pop_bookmarks()
+
+
+def _absolute_url(url, base_uri):
+    """Make the URL of a note absolute, using the instance URI"""
+    if base_uri and not re.match(r'[a-zA-Z][a-zA-Z0-9+.-]*:', url or ''):
+        return '%s/%s' % (base_uri.rstrip('/'), (url or '').lstrip('/'))
+    return url
+
+
+def format_bookmark(link, base_uri=None):
+    """Format a link as a Netscape bookmark entry"""
+    attributes = [('HREF', _absolute_url(link.get('url'), base_uri))]
+
+    for attribute, field in (('ADD_DATE', 'created'),
+                             ('LAST_MODIFIED', 'updated')):
+        date = parse_datetime(link.get(field))
+        if date is not None:
+            attributes.append((attribute, str(int(date.timestamp()))))
+
+    attributes.append(('PRIVATE', '1' if link.get('private') else '0'))
+    attributes.append(('TAGS', ','.join(link.get('tags') or [])))
+
+    entry = '<DT><A %s>%s</A>' % (
+        ' '.join('%s="%s"' % (name, escape(value or ''))
+                 for name, value in attributes),
+        escape(link.get('title') or '', quote=False)
+    )
+    if link.get('description'):
+        entry += '\n<DD>%s' % escape(link['description'], quote=False)
+    return entry
+
+
+def format_bookmarks(links, base_uri=None):
+    """Format links as a Netscape bookmark file, link by link
+
+    The relative URLs of notes are made absolute with ``base_uri``, if set.
+    """
+    yield BOOKMARKS_HEADER
+    for link in links:
+        yield '\n' + format_bookmark(link, base_uri)
+    yield '\n' + BOOKMARKS_FOOTER
@@ -1,2 +1,9 @@
 """Shaarli REST API clients"""
+from .bulk import BulkResult
+from .cache import DiskResponseCache, ResponseCache
+from .deadline import Deadline, DeadlineExceeded
+from .metrics import Instrumentation, MetricsExporter, RequestMetrics
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
 from .v1 import InvalidEndpointParameters, ShaarliV1Client
+from .v1_async import AsyncShaarliV1Client
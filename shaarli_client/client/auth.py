@@ -0,0 +1,65 @@
+"""Shaarli REST API authentication"""
+import threading
+import time
+
+# Shaarli rejects tokens issued more than 9 minutes ago
+JWT_IAT_TOLERANCE = 540
+
+
+class JWTTokenCache:
+    """Sign JWT authentication tokens, and reuse them for a while
+
+    Signing a token for every request is costly in tight loops; a signed
+    token is instead reused for ``ttl`` seconds, which must stay below
+    Shaarli's tolerance for the token's issue time (``iat``). A ``ttl`` of 0
+    disables caching.
+
+    Cache hits and misses are counted to help assessing its efficiency.
+    """
+
+    def __init__(self, secret, ttl=60):
+        """Token cache constructor"""
+        if not 0 <= ttl < JWT_IAT_TOLERANCE:
+            raise ValueError(
+                "Token TTL must be between 0 and %d seconds"
+                % (JWT_IAT_TOLERANCE - 1)
+            )
+
+        self.secret = secret
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0
+
+    def _sign(self):
+        """Sign a new token, issued now"""
+        import jwt  # pylint: disable=import-outside-toplevel
+
+        return jwt.encode(
+            {'iat': int(time.time())},
+            self.secret,
+            algorithm='HS512',
+        )
+
+    def get(self):
+        """Get a signed token
+
+        Returns the token, and whether it was taken from the cache.
+        """
+        with self._lock:
+            if self._token is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return (self._token, True)
+
+            self.misses += 1
+            self._token = self._sign()
+            self._expires_at = time.monotonic() + self.ttl
+            return (self._token, False)
+
+    def invalidate(self):
+        """Discard the cached token, if any"""
+        with self._lock:
+            self._token = None
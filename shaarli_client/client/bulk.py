@@ -0,0 +1,101 @@
+"""Helpers to run many API calls concurrently"""
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .deadline import DeadlineExceeded
+
+
+class BulkResult(namedtuple('BulkResult',
+                            ['index', 'params', 'response', 'error'])):
+    """Outcome of a single operation within a bulk operation
+
+    ``response`` is the API response, if any, and ``error`` the exception
+    raised while performing the operation, if any. An operation which had
+    nothing to do, and sent no request, succeeds without a response.
+    """
+
+    __slots__ = ()
+
+    @property
+    def ok(self):
+        """Whether the operation succeeded"""
+        # pylint: disable=invalid-name
+        return self.error is None \
+            and (self.response is None or self.response.ok)
+
+
+def _run(function, index, params):
+    """Run an operation, capturing its outcome"""
+    try:
+        return BulkResult(index, params, function(params), None)
+    except Exception as exc:  # pylint: disable=broad-except
+        return BulkResult(index, params, None, exc)
+
+
+def _next_item(items, deadline):
+    """Get the next item, unless the deadline is over
+
+    Returns None once items are exhausted, and raises ``DeadlineExceeded``
+    without consuming an item once the deadline is over.
+    """
+    if deadline is not None:
+        deadline.check()
+    return next(items, None)
+
+
+def _map_sequentially(function, items, deadline):
+    """Call a function for every enumerated item, one at a time"""
+    while True:
+        item = _next_item(items, deadline)
+        if item is None:
+            return
+        yield _run(function, *item)
+
+
+def bulk_map(function, items, concurrency=1, deadline=None):
+    """Call a function for every item, yielding results in input order
+
+    Up to ``concurrency`` calls run at the same time. Items are consumed
+    lazily, so that arbitrarily long streams can be processed with bounded
+    memory usage.
+
+    Errors are captured in each ``BulkResult`` so that a single failure
+    does not abort the whole operation.
+
+    Once ``deadline`` (a ``Deadline``) is over, no more items are consumed:
+    the results of the calls already started are yielded, then
+    ``DeadlineExceeded`` is raised.
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be a strictly positive integer")
+
+    items = enumerate(items)
+
+    if concurrency == 1:
+        yield from _map_sequentially(function, items, deadline)
+        return
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = deque()
+
+        try:
+            while True:
+                try:
+                    item = _next_item(items, deadline)
+                except DeadlineExceeded:
+                    # report the calls already started before giving up
+                    while pending:
+                        yield pending.popleft().result()
+                    raise
+                if item is None:
+                    break
+
+                pending.append(executor.submit(_run, function, *item))
+                if len(pending) >= concurrency:
+                    yield pending.popleft().result()
+
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,252 @@
+"""Response caches for GET requests"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from pathlib import Path
+
+# headers describing the transfer of the body, rather than the body itself
+TRANSFER_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+def default_cache_path():
+    """Get the default location of the on-disk response cache"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.cache')
+
+    return Path(cache_home) / 'shaarli' / 'responses.sqlite'
+
+
+class CachedResponse(namedtuple('CachedResponse',
+                                ['url', 'headers', 'content', 'stored_at'])):
+    """Successful response to a GET request, as stored in a cache"""
+
+    __slots__ = ()
+
+    @classmethod
+    def from_response(cls, response):
+        """Extract the cacheable parts of a ``requests.Response``"""
+        headers = {
+            name: value
+            for name, value in response.headers.items()
+            if name.lower() not in TRANSFER_HEADERS
+        }
+        return cls(response.url, headers, response.content, time.time())
+
+    def validators(self):
+        """Build the headers of a conditional request for this response"""
+        headers = {
+            name.lower(): value for name, value in self.headers.items()
+        }
+        validators = {}
+
+        if 'etag' in headers:
+            validators['If-None-Match'] = headers['etag']
+        if 'last-modified' in headers:
+            validators['If-Modified-Since'] = headers['last-modified']
+
+        return validators
+
+    def to_response(self):
+        """Rebuild a ``requests.Response``"""
+        # pylint: disable=import-outside-toplevel,protected-access
+        import requests
+        from requests.structures import CaseInsensitiveDict
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = requests.utils.get_encoding_from_headers(
+            response.headers
+        )
+        response._content = self.content
+        response._content_consumed = True
+        return response
+
+
+class ResponseCache:
+    """In-memory LRU cache of responses to GET requests
+
+    Up to ``maxsize`` responses are kept, the least recently used being
+    evicted first, and are served without reaching the server for ``ttl``
+    seconds. Once expired, a response holding an ``ETag`` or
+    ``Last-Modified`` header is kept to revalidate it with a conditional
+    request; other responses are dropped.
+
+    Cache hits, misses and revalidations are counted to help assessing its
+    efficiency.
+    """
+
+    def __init__(self, maxsize=128, ttl=60):
+        """Cache constructor"""
+        if maxsize < 1:
+            raise ValueError("maxsize must be a strictly positive integer")
+        if ttl < 0:
+            raise ValueError("ttl must be a positive number")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(uri, params):
+        """Build the cache key of a GET request"""
+        return '%s %s' % (uri, json.dumps(
+            {name: value for name, value in (params or {}).items()
+             if value is not None},
+            sort_keys=True
+        ))
+
+    def _load(self, key):
+        """Get an entry from storage, marking it as recently used"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def _save(self, key, entry):
+        """Put an entry in storage, evicting the least recently used ones"""
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _discard(self, prefix):
+        """Remove the entries whose key starts with a prefix from storage"""
+        for key in [key for key in self._entries if key.startswith(prefix)]:
+            del self._entries[key]
+
+    def lookup(self, key):
+        """Look up the cached response to a request
+
+        Returns the ``CachedResponse`` (or None), and whether it is still
+        fresh; stale responses must be revalidated before being used.
+        """
+        with self._lock:
+            entry = self._load(key)
+
+            if entry is not None \
+                    and time.time() < entry.stored_at + self.ttl:
+                self.hits += 1
+                return (entry, True)
+
+            self.misses += 1
+            if entry is not None and not entry.validators():
+                self._discard(key)
+                entry = None
+            return (entry, False)
+
+    def store(self, key, response):
+        """Cache a successful response, unless the server forbids it"""
+        if 'no-store' in response.headers.get('Cache-Control', ''):
+            return None
+
+        entry = CachedResponse.from_response(response)
+        with self._lock:
+            self._save(key, entry)
+        return entry
+
+    def revalidate(self, key, entry):
+        """Mark a stale response as fresh again, after a 304 response"""
+        entry = entry._replace(stored_at=time.time())
+        with self._lock:
+            self.revalidations += 1
+            self._save(key, entry)
+        return entry
+
+    def invalidate(self, prefix=''):
+        """Drop cached responses, for URIs starting with a given prefix"""
+        with self._lock:
+            self._discard(prefix)
+
+
+class DiskResponseCache(ResponseCache):
+    """Response cache stored in a SQLite database
+
+    The database can be shared between processes, e.g. successive CLI
+    invocations; see ``ResponseCache`` for the caching policy.
+    """
+
+    def __init__(self, path, maxsize=1024, ttl=60):
+        """Cache constructor"""
+        super(DiskResponseCache, self).__init__(maxsize, ttl)
+        self.path = str(path)
+
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        import sqlite3  # pylint: disable=import-outside-toplevel
+
+        self.connection = sqlite3.connect(self.path, timeout=10,
+                                          check_same_thread=False)
+        self.connection.executescript('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                headers TEXT NOT NULL,
+                content BLOB NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_accessed
+                ON responses (accessed_at);
+        ''')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the cache database"""
+        self.connection.close()
+
+    def _load(self, key):
+        """Get an entry from storage, marking it as recently used"""
+        with self.connection:
+            row = self.connection.execute(
+                'SELECT url, headers, content, stored_at FROM responses'
+                ' WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            self.connection.execute(
+                'UPDATE responses SET accessed_at = ? WHERE key = ?',
+                (time.time(), key)
+            )
+
+        url, headers, content, stored_at = row
+        return CachedResponse(url, json.loads(headers), content, stored_at)
+
+    def _save(self, key, entry):
+        """Put an entry in storage, evicting the least recently used ones"""
+        with self.connection:
+            self.connection.execute(
+                'INSERT OR REPLACE INTO responses'
+                ' (key, url, headers, content, stored_at, accessed_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?)',
+                (key, entry.url, json.dumps(entry.headers), entry.content,
+                 entry.stored_at, time.time())
+            )
+            self.connection.execute(
+                'DELETE FROM responses WHERE key NOT IN (SELECT key'
+                ' FROM responses ORDER BY accessed_at DESC LIMIT ?)',
+                (self.maxsize,)
+            )
+
+    def _discard(self, prefix):
+        """Remove the entries whose key starts with a prefix from storage"""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM responses WHERE substr(key, 1, ?) = ?',
+                (len(prefix), prefix)
+            )
@@ -0,0 +1,65 @@
+"""Request timeouts and deadlines for multi-request operations"""
+import time
+
+# seconds to wait for a connection, and between bytes of the response
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when an operation is still running past its deadline"""
+
+    def __init__(self, deadline):
+        """Custom exception message"""
+        super(DeadlineExceeded, self).__init__(
+            "Deadline of %g seconds exceeded" % deadline.seconds
+        )
+
+
+class Deadline:
+    """Point in time after which an operation must be cancelled
+
+    A deadline is shared by all the requests of an operation, e.g. the pages
+    of a paginated listing: the timeouts of each request are shortened to
+    the time remaining, and no request is sent once the deadline is over.
+    """
+
+    def __init__(self, seconds):
+        """Start counting down ``seconds`` seconds"""
+        if seconds <= 0:
+            raise ValueError("deadline must be a strictly positive number")
+
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        """Number of seconds left before the deadline"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        """Whether the deadline is over"""
+        return self.remaining() <= 0
+
+    def check(self):
+        """Raise ``DeadlineExceeded`` if the deadline is over"""
+        if self.expired:
+            raise DeadlineExceeded(self)
+
+    def clamp(self, timeout):
+        """Shorten request timeouts to the time left before the deadline
+
+        ``timeout`` is either a number of seconds, or a (connect, read)
+        tuple, as accepted by ``requests``; None means no timeout.
+        """
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded(self)
+
+        if isinstance(timeout, tuple):
+            return tuple(
+                remaining if value is None else min(value, remaining)
+                for value in timeout
+            )
+        if timeout is None:
+            return remaining
+        return min(timeout, remaining)
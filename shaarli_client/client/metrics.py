@@ -0,0 +1,294 @@
+"""Request instrumentation: timings, sizes, hooks and exporters"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+EXPORT_FORMATS = ['prometheus', 'statsd']
+
+METRICS_PREFIX = 'shaarli_client'
+
+
+class RequestMetrics:
+    """Measures of a single API request
+
+    ``phases`` maps phase names to the number of seconds spent in them,
+    accumulated over retries:
+
+    - ``sign``: signing the authentication token;
+    - ``throttle``: waiting for the rate limiter;
+    - ``wait``: connecting, sending the request and waiting for the response
+      headers, i.e. network and server time;
+    - ``download``: downloading the response body;
+    - ``decode``: decoding the JSON body, when done by the client.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    __slots__ = ('method', 'url', 'endpoint_name', 'started_at', 'duration',
+                 'phases', 'status', 'size', 'retries', 'cached', 'error',
+                 '_start')
+
+    def __init__(self, method, url, endpoint_name):
+        """Start measuring a request"""
+        self.method = method
+        self.url = url
+        self.endpoint_name = endpoint_name
+        self.started_at = time.time()
+        self.duration = None
+        self.phases = OrderedDict()
+        self.status = None
+        self.size = None
+        self.retries = 0
+        self.cached = False
+        self.error = None
+        self._start = time.perf_counter()
+
+    def add(self, phase, seconds):
+        """Account time spent in a phase"""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def measure(self, phase):
+        """Measure the time spent in a block as a phase"""
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def finish(self, response=None, error=None):
+        """Stop measuring a request, recording its outcome"""
+        self.duration = time.perf_counter() - self._start
+        self.error = error
+
+        if error is not None:
+            self.retries = getattr(error, 'retries', 0)
+        if response is None:
+            return
+
+        self.status = response.status_code
+        self.retries = getattr(response, 'retries', 0)
+        if response.headers.get('Content-Length') is not None:
+            self.size = int(response.headers['Content-Length'])
+        elif getattr(response, '_content_consumed', False):
+            self.size = len(response.content)
+
+
+@contextmanager
+def measure(metrics, phase):
+    """Measure a phase of a request, unless it is not instrumented"""
+    if metrics is None:
+        yield None
+        return
+
+    with metrics.measure(phase):
+        yield metrics
+
+
+class Instrumentation:
+    """Hooks called around every request sent by a client
+
+    Pre-request hooks are called with the ``RequestMetrics`` of a request
+    about to be sent, and post-request hooks once its response has been
+    received (and decoded, when the client decodes it), or once it failed.
+    """
+
+    def __init__(self, pre_request=(), post_request=()):
+        """Instrumentation constructor"""
+        self.pre_request_hooks = list(pre_request)
+        self.post_request_hooks = list(post_request)
+
+    def start(self, method, url, endpoint_name):
+        """Start measuring a request, and call pre-request hooks"""
+        metrics = RequestMetrics(method, url, endpoint_name)
+        for hook in self.pre_request_hooks:
+            hook(metrics)
+        return metrics
+
+    def finish(self, metrics, response=None, error=None):
+        """Stop measuring a request, and call post-request hooks"""
+        metrics.finish(response, error)
+        for hook in self.post_request_hooks:
+            hook(metrics)
+
+
+def _format_size(size):
+    """Format a number of bytes"""
+    if size is None:
+        return '-'
+    if size < 1024:
+        return '%dB' % size
+    return '%.1fKiB' % (size / 1024)
+
+
+def format_metrics(metrics):
+    """Format the measures of a request as a single line"""
+    fields = [
+        metrics.method,
+        metrics.endpoint_name or metrics.url,
+        str(metrics.status) if metrics.status is not None else 'error',
+        _format_size(metrics.size),
+        'retries=%d' % metrics.retries,
+    ]
+    if metrics.cached:
+        fields.append('cached')
+
+    fields.extend(
+        '%s=%.1fms' % (phase, seconds * 1000)
+        for phase, seconds in metrics.phases.items()
+    )
+    fields.append('total=%.1fms' % (metrics.duration * 1000))
+
+    if metrics.error is not None:
+        fields.append('error=%r' % str(metrics.error))
+
+    return ' '.join(fields)
+
+
+class MetricsExporter:
+    """Write request metrics to a file, as a post-request hook
+
+    Two formats are supported:
+
+    - ``prometheus``: metrics are aggregated, and written in the Prometheus
+      text exposition format when the exporter is closed, e.g. for the
+      node exporter's textfile collector;
+    - ``statsd``: StatsD lines (with DogStatsD tags) are appended to the
+      file as requests complete.
+    """
+
+    def __init__(self, path, output_format='prometheus'):
+        """Exporter constructor"""
+        if output_format not in EXPORT_FORMATS:
+            raise ValueError("%s is not a supported metrics format"
+                             % output_format)
+
+        self.path = str(path)
+        self.output_format = output_format
+
+        self._lock = threading.Lock()
+        self._counters = OrderedDict()
+        self._file = None
+        if output_format == 'statsd':
+            self._file = open(self.path, 'a')
+
+    def __call__(self, metrics):
+        """Record the measures of a request"""
+        if self.output_format == 'statsd':
+            lines = self._statsd_lines(metrics)
+            with self._lock:
+                self._file.write(''.join(lines))
+            return
+
+        endpoint = metrics.endpoint_name or 'unknown'
+        status = str(metrics.status) if metrics.status is not None \
+            else 'error'
+
+        with self._lock:
+            self._count('requests_total', (endpoint, metrics.method, status),
+                        1)
+            self._count('retries_total', (endpoint,), metrics.retries)
+            if metrics.cached:
+                self._count('cached_responses_total', (endpoint,), 1)
+            if metrics.size is not None:
+                self._count('response_bytes_total', (endpoint,),
+                            metrics.size)
+            for phase, seconds in metrics.phases.items():
+                self._count('phase_seconds_sum', (endpoint, phase), seconds)
+                self._count('phase_seconds_count', (endpoint, phase), 1)
+            self._count('request_seconds_sum', (endpoint,), metrics.duration)
+            self._count('request_seconds_count', (endpoint,), 1)
+
+    def _count(self, name, labels, value):
+        """Increment an aggregated counter"""
+        counter = self._counters.setdefault(name, OrderedDict())
+        counter[labels] = counter.get(labels, 0) + value
+
+    @staticmethod
+    def _statsd_lines(metrics):
+        """Format the measures of a request as StatsD lines"""
+        tags = '#endpoint:%s,method:%s,status:%s' % (
+            metrics.endpoint_name or 'unknown',
+            metrics.method,
+            metrics.status if metrics.status is not None else 'error',
+        )
+        lines = [
+            '%s.requests:1|c|%s\n' % (METRICS_PREFIX, tags),
+            '%s.request:%.3f|ms|%s\n' % (METRICS_PREFIX,
+                                         metrics.duration * 1000, tags),
+        ]
+        if metrics.retries:
+            lines.append('%s.retries:%d|c|%s\n'
+                         % (METRICS_PREFIX, metrics.retries, tags))
+        if metrics.size is not None:
+            lines.append('%s.response_bytes:%d|h|%s\n'
+                         % (METRICS_PREFIX, metrics.size, tags))
+        lines.extend(
+            '%s.phase.%s:%.3f|ms|%s\n'
+            % (METRICS_PREFIX, phase, seconds * 1000, tags)
+            for phase, seconds in metrics.phases.items()
+        )
+        return lines
+
+    def _prometheus_text(self):
+        """Format aggregated metrics in the Prometheus text format"""
+        label_names = {
+            'requests_total': ('endpoint', 'method', 'status'),
+            'phase_seconds_sum': ('endpoint', 'phase'),
+            'phase_seconds_count': ('endpoint', 'phase'),
+        }
+        descriptions = OrderedDict([
+            ('requests_total', ('counter', "Number of requests")),
+            ('retries_total', ('counter', "Number of retries")),
+            ('cached_responses_total',
+             ('counter', "Number of responses served from the cache")),
+            ('response_bytes_total',
+             ('counter', "Size of the response bodies, in bytes")),
+            ('phase_seconds', ('summary', "Time spent per request phase")),
+            ('request_seconds', ('summary', "Total time spent per request")),
+        ])
+
+        lines = []
+        for base, (metric_type, description) in descriptions.items():
+            names = [base] if metric_type == 'counter' \
+                else [base + '_sum', base + '_count']
+            if not any(name in self._counters for name in names):
+                continue
+
+            lines.append('# HELP %s_%s %s'
+                         % (METRICS_PREFIX, base, description))
+            lines.append('# TYPE %s_%s %s'
+                         % (METRICS_PREFIX, base, metric_type))
+            for name in names:
+                for labels, value in self._counters.get(name, {}).items():
+                    lines.append('%s_%s{%s} %s' % (
+                        METRICS_PREFIX,
+                        name,
+                        ','.join(
+                            '%s="%s"' % (label, label_value)
+                            for label, label_value in zip(
+                                label_names.get(name, ('endpoint',)), labels
+                            )
+                        ),
+                        repr(value),
+                    ))
+
+        return '\n'.join(lines) + '\n'
+
+    def close(self):
+        """Write aggregated metrics, or close the StatsD file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            return
+
+        if self.output_format != 'prometheus':
+            return
+
+        # write atomically, so that collectors never read a partial file
+        temporary_path = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(temporary_path, 'w') as f_metrics:
+            f_metrics.write(self._prometheus_text())
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,125 @@
+"""Client-side request rate and concurrency limits"""
+import threading
+import time
+
+# delay between attempts to enter a full semaphore from a coroutine
+ASYNC_POLL_INTERVAL = 0.005
+
+
+class RateLimiter:
+    """Limit the rate and concurrency of the requests sent to an instance
+
+    Requests are admitted at up to ``max_rps`` requests per second, following
+    a token bucket holding up to ``burst`` tokens (by default, one second
+    worth of requests), and up to ``max_concurrency`` requests can be in
+    flight at the same time. Both limits are disabled when unset.
+
+    A limiter is thread-safe, and can be shared by several clients, e.g.
+    synchronous and asynchronous clients of the same instance, so that their
+    requests are limited as a whole:
+
+    - synchronous clients use it as a context manager, which blocks the
+      calling thread until the request is admitted;
+    - asynchronous clients use it as an asynchronous context manager, which
+      does not block the event loop.
+
+    The time spent waiting for admission is accumulated in ``wait_time``.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    def __init__(self, max_rps=None, max_concurrency=None, burst=None):
+        """Rate limiter constructor"""
+        if max_rps is not None and max_rps <= 0:
+            raise ValueError("max_rps must be a strictly positive number")
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be a strictly positive"
+                             " integer")
+
+        self.max_rps = max_rps
+        self.max_concurrency = max_concurrency
+        self.burst = burst or max(1.0, max_rps or 0)
+        self.wait_time = 0.0
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._semaphore = None
+        if max_concurrency is not None:
+            self._semaphore = threading.BoundedSemaphore(max_concurrency)
+
+    def _reserve(self):
+        """Take a token from the bucket
+
+        Tokens can be borrowed from the future: the returned delay is the
+        time to wait until the borrowed token is available.
+        """
+        if self.max_rps is None:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst,
+                self._tokens + (now - self._updated_at) * self.max_rps
+            )
+            self._updated_at = now
+            self._tokens -= 1
+
+            delay = max(0.0, -self._tokens / self.max_rps)
+            self.wait_time += delay
+            return delay
+
+    def acquire(self):
+        """Wait until a request can be sent"""
+        if self._semaphore is not None:
+            start = time.monotonic()
+            self._semaphore.acquire()
+            with self._lock:
+                self.wait_time += time.monotonic() - start
+
+        try:
+            delay = self._reserve()
+            if delay:
+                time.sleep(delay)
+        except BaseException:
+            self.release()
+            raise
+
+    async def acquire_async(self):
+        """Wait until a request can be sent, without blocking the loop"""
+        import asyncio  # pylint: disable=import-outside-toplevel
+
+        if self._semaphore is not None:
+            start = time.monotonic()
+            while not self._semaphore.acquire(blocking=False):
+                await asyncio.sleep(ASYNC_POLL_INTERVAL)
+            with self._lock:
+                self.wait_time += time.monotonic() - start
+
+        try:
+            delay = self._reserve()
+            if delay:
+                await asyncio.sleep(delay)
+        except BaseException:
+            self.release()
+            raise
+
+    def release(self):
+        """Signal that a request has completed"""
+        if self._semaphore is not None:
+            self._semaphore.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    async def __aenter__(self):
+        await self.acquire_async()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.release()
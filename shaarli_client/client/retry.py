@@ -0,0 +1,177 @@
+"""Retry policy for transient failures"""
+import random
+import threading
+import time
+
+# methods that can be sent several times with the same effect
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# statuses reporting a transient server-side failure
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# statuses guaranteeing that the request has not been processed
+REJECTED_STATUSES = frozenset([429, 503])
+
+
+def parse_retry_after(value):
+    """Parse a Retry-After header into a number of seconds, if possible"""
+    # pylint: disable=import-outside-toplevel
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def connection_failed(error):
+    """Whether a request failed before a connection was established
+
+    Refused connections and failed DNS lookups are raised by requests as a
+    ``ConnectionError``, wrapping the ``NewConnectionError`` of urllib3.
+    """
+    # pylint: disable=import-outside-toplevel
+    import requests
+    from urllib3.exceptions import NewConnectionError
+
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+
+    reason = error.args[0] if error.args else None
+    # urllib3 wraps the failure of the last attempt in a MaxRetryError
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+
+class RetryPolicy:
+    """Decide whether, and when, to send a failed request again
+
+    A request is sent up to ``max_attempts`` times. Between attempts, the
+    client waits for the delay requested by the server through a
+    ``Retry-After`` header, or else for a random delay (full jitter) of up to
+    ``backoff * 2 ** (attempt - 1)`` seconds; delays are capped to
+    ``max_backoff`` seconds.
+
+    Idempotent requests are retried after connection errors, timeouts and
+    transient server errors. Other requests, e.g. creating a link, are only
+    retried when they have certainly not been processed: the connection
+    could not be established (refused, timed out or failed DNS lookup), or
+    the server rejected them with a 429 or 503 status.
+
+    Retries are counted to help assessing the health of an instance.
+    """
+
+    def __init__(self, max_attempts=3, backoff=0.5, max_backoff=30):
+        """Retry policy constructor"""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be a strictly positive"
+                             " integer")
+        if backoff < 0 or max_backoff < 0:
+            raise ValueError("Backoff delays must be positive numbers")
+
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retries = 0
+
+        self._lock = threading.Lock()
+
+    def should_retry(self, method, attempt, response=None, error=None):
+        """Whether a request should be sent again after a failed attempt"""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        if attempt >= self.max_attempts:
+            return False
+
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        if error is not None:
+            if connection_failed(error):
+                return True
+            return idempotent and isinstance(
+                error,
+                (requests.exceptions.ConnectionError,
+                 requests.exceptions.Timeout)
+            )
+
+        if idempotent:
+            return response.status_code in RETRY_STATUSES
+        return response.status_code in REJECTED_STATUSES
+
+    def delay(self, attempt, response=None):
+        """Number of seconds to wait before the next attempt"""
+        retry_after = None
+        if response is not None:
+            retry_after = parse_retry_after(
+                response.headers.get('Retry-After')
+            )
+
+        if retry_after is None:
+            retry_after = random.uniform(
+                0, self.backoff * 2 ** (attempt - 1)
+            )
+
+        return min(retry_after, self.max_backoff)
+
+    def _next_delay(self, retry, attempt, response, deadline):
+        """Delay before the next attempt, or None to stop retrying
+
+        Requests are not retried when the next attempt would start after
+        ``deadline``, if set.
+        """
+        if not retry:
+            return None
+
+        delay = self.delay(attempt, response)
+        if deadline is not None and delay >= deadline.remaining():
+            return None
+        return delay
+
+    def call(self, method, send, deadline=None):
+        """Send a request with ``send()`` until it succeeds or must stop
+
+        Requests are not retried once ``deadline`` (a ``Deadline``), if set,
+        would be over before the next attempt.
+
+        The number of retries is recorded in the ``retries`` attribute of the
+        returned response, or of the raised exception.
+        """
+        import requests  # pylint: disable=import-outside-toplevel
+
+        attempt = 1
+
+        while True:
+            try:
+                response = send()
+            except requests.exceptions.RequestException as exc:
+                delay = self._next_delay(
+                    self.should_retry(method, attempt, error=exc),
+                    attempt, None, deadline
+                )
+                if delay is None:
+                    exc.retries = attempt - 1
+                    raise
+            else:
+                delay = self._next_delay(
+                    self.should_retry(method, attempt, response=response),
+                    attempt, response, deadline
+                )
+                if delay is None:
+                    response.retries = attempt - 1
+                    return response
+                response.close()
+
+            with self._lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
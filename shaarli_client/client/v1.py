@@ -1,10 +1,16 @@
 """Shaarli REST API v1 client"""
-import calendar
 import time
 from argparse import Action, ArgumentTypeError
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 
-import jwt
-import requests
+from .auth import JWTTokenCache
+from .bulk import bulk_map
+from .deadline import DEFAULT_TIMEOUT, DeadlineExceeded
+from .metrics import measure
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
 
 
 def check_positive_integer(value):
@@ -49,8 +55,10 @@ class InvalidEndpointParameters(Exception):
         )
 
 
-class ShaarliV1Client:
-    """Shaarli REST API v1 client"""
+class ShaarliV1ClientBase:
+    """Endpoint metadata and helpers shared by Shaarli REST API v1 clients"""
+
+    # pylint: disable=too-few-public-methods
 
     endpoints = {
         'get-info': {
@@ -204,8 +212,20 @@ class ShaarliV1Client:
         },
     }
 
-    def __init__(self, uri, secret):
-        """Client constructor"""
+    def __init__(self, uri, secret, verify_certs=True, token_ttl=60,
+                 rate_limiter=None, timeout=DEFAULT_TIMEOUT):
+        """Client constructor
+
+        Signed authentication tokens are reused for ``token_ttl`` seconds.
+
+        Requests are admitted by ``rate_limiter``, if set, e.g. a
+        ``RateLimiter`` shared by several clients of the same instance.
+
+        Requests give up after ``timeout`` seconds without being able to
+        connect or to read from the server; this is either a number, or a
+        (connect, read) tuple.
+        """
+        # pylint: disable=too-many-arguments
         if not uri:
             raise TypeError("Missing Shaarli URI")
         if not secret:
@@ -214,6 +234,11 @@ class ShaarliV1Client:
         self.uri = uri.rstrip('/')
         self.secret = secret
         self.version = 1
+        self.verify_certs = verify_certs
+        self.token_cache = JWTTokenCache(secret, token_ttl)
+        self.rate_limiter = rate_limiter if rate_limiter is not None \
+            else RateLimiter()
+        self.timeout = timeout
 
     @classmethod
     def _check_endpoint_params(cls, endpoint_name, params):
@@ -255,79 +280,553 @@ class ShaarliV1Client:
 
         return (endpoint['method'], path, params)
 
-    def _request(self, method, endpoint, params, verify_certs=True):
-        """Send an HTTP request to this instance"""
-        encoded_token = jwt.encode(
-            {'iat': calendar.timegm(time.gmtime())},
-            self.secret,
-            algorithm='HS512',
+    def _auth_headers(self, renew=False):
+        """Build HTTP headers holding a signed JWT authentication token
+
+        Returns the headers, and whether the token was taken from the cache.
+        """
+        if renew:
+            self.token_cache.invalidate()
+
+        token, cached = self.token_cache.get()
+        return ({'Authorization': 'Bearer %s' % token}, cached)
+
+    @classmethod
+    def _endpoint_name(cls, method, endpoint):
+        """Find the name of the endpoint matching a request, if any"""
+        path, _, resource = endpoint.partition('/')
+
+        for name, metadata in cls.endpoints.items():
+            if metadata['path'] == path and metadata['method'] == method \
+                    and bool(metadata.get('resource')) == bool(resource):
+                return name
+        return None
+
+    def _endpoint_uri(self, endpoint):
+        """Build the full URI of an API endpoint"""
+        return '%s/api/v%d/%s' % (self.uri, self.version, endpoint)
+
+    @classmethod
+    def diff_link(cls, current, changes):
+        """Compute the fields of a link actually modified by some changes
+
+        ``current`` is the link, as returned by the API, and ``changes`` maps
+        ``put-link`` parameters to their new values; tags are compared
+        regardless of their order.
+
+        Returns a dict of the changed fields, which is empty when the
+        changes are already applied.
+        """
+        cls._check_endpoint_params('put-link', changes)
+        changed = {}
+
+        for field, value in changes.items():
+            old_value = current.get(field)
+            if field == 'tags':
+                if set(value or []) == set(old_value or []):
+                    continue
+            elif field == 'private':
+                if bool(value) == bool(old_value):
+                    continue
+            elif (value or '') == (old_value or ''):
+                continue
+            changed[field] = value
+
+        return changed
+
+    @staticmethod
+    def _links_windows(offset, limit, page_size):
+        """Generate the (offset, limit) windows covering a link collection"""
+        remaining = None if limit == 'all' else int(limit)
+
+        while remaining is None or remaining > 0:
+            window = page_size if remaining is None \
+                else min(page_size, remaining)
+            yield (offset, window)
+
+            offset += window
+            if remaining is not None:
+                remaining -= window
+
+    @classmethod
+    def _prepare_links_iteration(cls, params, page_size):
+        """Check link iteration parameters and split them into pages
+
+        Returns the filtering parameters common to all pages, and a generator
+        of (offset, limit) windows.
+        """
+        if page_size < 1:
+            raise ValueError("page_size must be a strictly positive integer")
+
+        params = {
+            param: value
+            for param, value in (params or {}).items()
+            if value is not None
+        }
+        cls._check_endpoint_params('get-links', params)
+
+        windows = cls._links_windows(
+            int(params.pop('offset', 0)),
+            params.pop('limit', 'all'),
+            page_size
         )
-        headers = {'Authorization': 'Bearer %s' % encoded_token}
+        return (params, windows)
+
+
+class ShaarliV1Client(ShaarliV1ClientBase):
+    """Shaarli REST API v1 client"""
+
+    def __init__(self, uri, secret, session=None,
+                 pool_connections=10, pool_maxsize=10, verify_certs=True,
+                 token_ttl=60, cache=None, retry_policy=None,
+                 rate_limiter=None, instrumentation=None,
+                 timeout=DEFAULT_TIMEOUT):
+        """Client constructor
+
+        Requests are sent through a pooled HTTP session, so that connections
+        to the Shaarli instance are kept alive and reused across calls.
+
+        An existing ``requests.Session`` can be passed, in which case the
+        caller remains responsible for closing it.
 
-        endpoint_uri = '%s/api/v%d/%s' % (self.uri, self.version, endpoint)
+        Responses to GET requests are cached in ``cache``, if set, e.g. a
+        ``ResponseCache``; cached responses of this instance are invalidated
+        whenever this client sends another request.
 
+        Failed requests are sent again according to ``retry_policy``, if set,
+        e.g. a ``RetryPolicy``; by default, requests are sent only once.
+
+        Requests are measured and reported to ``instrumentation``, if set,
+        e.g. an ``Instrumentation`` holding pre and post-request hooks.
+        """
+        # pylint: disable=too-many-arguments
+        super(ShaarliV1Client, self).__init__(uri, secret, verify_certs,
+                                              token_ttl, rate_limiter,
+                                              timeout)
+        self.cache = cache
+        self.retry_policy = retry_policy if retry_policy is not None \
+            else RetryPolicy(max_attempts=1)
+        self.instrumentation = instrumentation
+
+        if session is None:
+            self.session = self._create_session(pool_connections,
+                                                pool_maxsize)
+            self._owns_session = True
+        else:
+            self.session = session
+            self._owns_session = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @staticmethod
+    def _create_session(pool_connections, pool_maxsize):
+        """Create a keep-alive HTTP session with a sized connection pool"""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+        )
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def close(self):
+        """Release the connections held by this client's HTTP session"""
+        if self._owns_session:
+            self.session.close()
+
+    def _send(self, method, endpoint_uri, headers, params, verify_certs,
+              stream, metrics=None, timeout=None, deadline=None):
+        """Send an HTTP request through this client's session
+
+        Requests expose the time until the response headers are received,
+        which covers connecting to the server (DNS resolution, TCP and TLS
+        handshakes, unless the connection is reused) and the server time;
+        this is accounted as the ``wait`` phase.
+
+        Timeouts are shortened to the time left before ``deadline``, if set.
+        """
+        # pylint: disable=too-many-arguments
         if method == 'GET':
-            return requests.request(
+            payload = {'params': params}
+        else:
+            payload = {'json': params}
+
+        start = time.perf_counter()
+        with self.rate_limiter:
+            if metrics is not None:
+                metrics.add('throttle', time.perf_counter() - start)
+                start = time.perf_counter()
+
+            if deadline is not None:
+                timeout = deadline.clamp(timeout)
+
+            response = self.session.request(
                 method,
                 endpoint_uri,
                 headers=headers,
-                params=params,
-                verify=verify_certs
+                verify=verify_certs,
+                stream=stream,
+                timeout=timeout,
+                **payload
             )
-        return requests.request(
+
+        if metrics is not None:
+            total = time.perf_counter() - start
+            wait = min(total, response.elapsed.total_seconds())
+            metrics.add('wait', wait)
+            metrics.add('download', total - wait)
+
+        return response
+
+    def _send_authenticated(self, method, endpoint_uri, params,
+                            verify_certs, stream, extra_headers=None,
+                            metrics=None, timeout=None, deadline=None):
+        """Send an HTTP request holding an authentication token
+
+        Transient failures are handled according to the retry policy, unless
+        ``deadline`` is over before the next attempt; the number of retries
+        is recorded in the ``retries`` attribute of the response.
+        """
+        # pylint: disable=too-many-arguments
+        return self.retry_policy.call(
             method,
-            endpoint_uri,
-            headers=headers,
-            json=params,
-            verify=verify_certs
+            lambda: self._send_signed(method, endpoint_uri, params,
+                                      verify_certs, stream, extra_headers,
+                                      metrics, timeout, deadline),
+            deadline
+        )
+
+    def _send_signed(self, method, endpoint_uri, params, verify_certs,
+                     stream, extra_headers, metrics=None, timeout=None,
+                     deadline=None):
+        """Send an HTTP request holding an authentication token, once
+
+        If a cached authentication token is rejected, the request is sent
+        once more with a freshly signed token.
+        """
+        # pylint: disable=too-many-arguments
+        with measure(metrics, 'sign'):
+            headers, cached_token = self._auth_headers()
+        headers.update(extra_headers or {})
+
+        response = self._send(method, endpoint_uri, headers, params,
+                              verify_certs, stream, metrics, timeout,
+                              deadline)
+
+        if response.status_code == 401 and cached_token:
+            response.close()
+            with measure(metrics, 'sign'):
+                headers, _ = self._auth_headers(renew=True)
+            headers.update(extra_headers or {})
+            response = self._send(method, endpoint_uri, headers, params,
+                                  verify_certs, stream, metrics, timeout,
+                                  deadline)
+
+        return response
+
+    def _cached_get(self, endpoint_uri, params, verify_certs, metrics=None,
+                    timeout=None, deadline=None):
+        """Send a GET request, unless its response is cached
+
+        Stale responses are revalidated with a conditional request when the
+        server provided an ``ETag`` or ``Last-Modified`` header.
+        """
+        # pylint: disable=too-many-arguments
+        key = self.cache.key(endpoint_uri, params)
+        entry, fresh = self.cache.lookup(key)
+        if fresh:
+            if metrics is not None:
+                metrics.cached = True
+            return entry.to_response()
+
+        response = self._send_authenticated(
+            'GET', endpoint_uri, params, verify_certs, False,
+            entry.validators() if entry is not None else None,
+            metrics, timeout, deadline
         )
 
-    def request(self, args):
+        if response.status_code == 304 and entry is not None:
+            response.close()
+            if metrics is not None:
+                metrics.cached = True
+            return self.cache.revalidate(key, entry).to_response()
+        if response.status_code == 200:
+            self.cache.store(key, response)
+
+        return response
+
+    def _dispatch(self, method, endpoint_uri, params, verify_certs, stream,
+                  metrics=None, timeout=None, deadline=None):
+        """Send an HTTP request, through the response cache if any"""
+        # pylint: disable=too-many-arguments
+        if self.cache is None:
+            return self._send_authenticated(method, endpoint_uri, params,
+                                            verify_certs, stream, None,
+                                            metrics, timeout, deadline)
+
+        if method == 'GET':
+            return self._cached_get(endpoint_uri, params, verify_certs,
+                                    metrics, timeout, deadline)
+
+        try:
+            return self._send_authenticated(method, endpoint_uri, params,
+                                            verify_certs, stream, None,
+                                            metrics, timeout, deadline)
+        finally:
+            self.cache.invalidate(self._endpoint_uri(''))
+
+    def _request(self, method, endpoint, params, verify_certs=None,
+                 stream=False, decode=False, timeout=None, deadline=None):
+        """Send an HTTP request to this instance
+
+        When ``stream`` is set, the response body is only downloaded as it is
+        accessed, e.g. through ``response.iter_content()``; cached responses
+        are always downloaded at once.
+
+        When ``decode`` is set, errors are raised, and the decoded JSON body
+        is returned instead of the response, so that decoding is measured
+        along with the request.
+
+        The measures of instrumented requests are available in the
+        ``metrics`` attribute of their response.
+
+        ``timeout`` overrides the timeout of the client for this request.
+        When ``deadline`` (a ``Deadline``) is set, timeouts are shortened to
+        the time it leaves, and ``DeadlineExceeded`` is raised once it is
+        over.
+        """
+        # pylint: disable=too-many-arguments
+        if verify_certs is None:
+            verify_certs = self.verify_certs
+        if timeout is None:
+            timeout = self.timeout
+
+        endpoint_uri = self._endpoint_uri(endpoint)
+        metrics = None
+        if self.instrumentation is not None:
+            metrics = self.instrumentation.start(
+                method, endpoint_uri, self._endpoint_name(method, endpoint)
+            )
+
+        response = None
+        try:
+            if deadline is not None:
+                deadline.check()
+            response = self._dispatch(method, endpoint_uri, params,
+                                      verify_certs, stream, metrics,
+                                      timeout, deadline)
+            if decode:
+                response.raise_for_status()
+                with measure(metrics, 'decode'):
+                    data = response.json()
+        except Exception as exc:
+            if metrics is not None:
+                self.instrumentation.finish(metrics, response, exc)
+            if self._timed_out(exc, deadline):
+                raise DeadlineExceeded(deadline) from exc
+            raise
+
+        if metrics is not None:
+            response.metrics = metrics
+            self.instrumentation.finish(metrics, response)
+
+        return data if decode else response
+
+    @staticmethod
+    def _timed_out(error, deadline):
+        """Whether a request failed because its deadline is over"""
+        import requests  # pylint: disable=import-outside-toplevel
+
+        return deadline is not None and deadline.expired \
+            and isinstance(error, requests.exceptions.Timeout)
+
+    def request(self, args, stream=False, timeout=None, deadline=None):
         """Send a parameterized request to this instance"""
         verify_certs = False if args.insecure else True
         return self._request(* self._retrieve_http_params(args),
-                             verify_certs)
+                             verify_certs, stream,
+                             timeout=timeout, deadline=deadline)
 
-    def get_info(self):
+    def get_info(self, timeout=None):
         """Get information about this instance"""
-        return self._request('GET', 'info', {})
+        return self._request('GET', 'info', {}, timeout=timeout)
 
-    def get_links(self, params):
+    def get_links(self, params, timeout=None):
         """Get a collection of links ordered by creation date"""
         self._check_endpoint_params('get-links', params)
-        return self._request('GET', 'links', params)
+        return self._request('GET', 'links', params, timeout=timeout)
+
+    def _get_links_page(self, params, offset, limit, deadline=None):
+        """Get a single page of links as a list of dicts"""
+        params = dict(params, offset=offset, limit=limit)
+        self._check_endpoint_params('get-links', params)
+        return self._request('GET', 'links', params, decode=True,
+                             deadline=deadline)
+
+    def iter_links(self, params=None, page_size=100, parallel=1,
+                   deadline=None):
+        """Iterate over a collection of links, one page at a time
+
+        Links are requested by windows of ``page_size`` items, walking the
+        ``offset`` parameter until a short page is returned, and yielded one
+        at a time so that memory usage does not grow with the collection.
 
-    def post_link(self, params):
+        The ``offset`` parameter sets where to start listing links, and
+        ``limit`` the maximum number of links to yield (or 'all').
+
+        When ``parallel`` is greater than 1, up to ``parallel`` pages are
+        requested concurrently; links are still yielded in ``offset`` order.
+
+        Once ``deadline`` (a ``Deadline``) is over, pending pages are
+        cancelled and ``DeadlineExceeded`` is raised, the links of the pages
+        already received having been yielded.
+        """
+        if parallel < 1:
+            raise ValueError("parallel must be a strictly positive integer")
+
+        params, windows = self._prepare_links_iteration(params, page_size)
+
+        if parallel == 1:
+            for offset, window in windows:
+                links = self._get_links_page(params, offset, window,
+                                             deadline)
+                yield from links
+                if len(links) < window:
+                    return
+            return
+
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            pending = deque(
+                (executor.submit(self._get_links_page, params, *window,
+                                 deadline),
+                 window[1])
+                for window in islice(windows, parallel)
+            )
+
+            try:
+                while pending:
+                    future, window = pending.popleft()
+                    links = future.result()
+                    yield from links
+                    if len(links) < window:
+                        return
+
+                    for offset, limit in islice(windows, 1):
+                        pending.append((
+                            executor.submit(self._get_links_page,
+                                            params, offset, limit, deadline),
+                            limit
+                        ))
+            finally:
+                for future, _ in pending:
+                    future.cancel()
+
+    def post_link(self, params, timeout=None, deadline=None):
         """Create a new link or note"""
         self._check_endpoint_params('post-link', params)
-        return self._request('POST', 'links', params)
+        return self._request('POST', 'links', params, timeout=timeout,
+                             deadline=deadline)
+
+    def post_links(self, links, concurrency=4, deadline=None):
+        """Create links or notes in bulk
+
+        ``links`` is an iterable of ``post-link`` parameters, consumed lazily;
+        a ``BulkResult`` is yielded for each of them, in input order. Items
+        which are exceptions, e.g. links that could not be read from a file,
+        are reported as failures without being sent.
+
+        Once ``deadline`` (a ``Deadline``) is over, no more links are sent,
+        and ``DeadlineExceeded`` is raised after the results of the requests
+        already sent.
+        """
+        def post_link(params):
+            if isinstance(params, Exception):
+                raise params
+            if deadline is None:
+                return self.post_link(params)
+            return self.post_link(params, deadline=deadline)
 
-    def put_link(self, resource, params):
+        return bulk_map(post_link, links, concurrency, deadline)
+
+    def put_link(self, resource, params, timeout=None):
         """Update an existing link or note"""
         self._check_endpoint_params('put-link', params)
-        return self._request('PUT', 'links/%d' % resource, params)
+        return self._request('PUT', 'links/%d' % resource, params,
+                             timeout=timeout)
+
+    def patch_link(self, resource, changes, current, timeout=None,
+                   deadline=None):
+        """Update some fields of a link or note, given its current state
+
+        The API replaces the whole link on update: the fields which are not
+        changed are sent as they are in ``current``.
+
+        Returns None, without sending a request, when nothing changed.
+        """
+        # pylint: disable=too-many-arguments
+        changed = self.diff_link(current, changes)
+        if not changed:
+            return None
+
+        params = {
+            field: current.get(field)
+            for field in self.endpoints['put-link']['params']
+            if current.get(field) is not None
+        }
+        params.update(changed)
+        return self._request('PUT', 'links/%d' % resource, params,
+                             timeout=timeout, deadline=deadline)
+
+    def patch_links(self, patches, links, concurrency=4, deadline=None):
+        """Update some fields of links or notes in bulk
+
+        ``patches`` is an iterable of (link ID, changes) pairs, consumed
+        lazily, and ``links`` maps link IDs to their current state, e.g. as
+        found in a local mirror or a page of links. A ``BulkResult`` is
+        yielded for each patch, in input order; unchanged links are not
+        sent, and their result has no response.
+        """
+        def patch_link(patch):
+            resource, changes = patch
+            if resource not in links:
+                raise LookupError("Link %d not found" % resource)
+            return self.patch_link(resource, changes, links[resource],
+                                   deadline=deadline)
+
+        return bulk_map(patch_link, patches, concurrency, deadline)
 
-    def get_tags(self, params):
+    def get_tags(self, params, timeout=None):
         """Get a list of all tags"""
         self._check_endpoint_params('get-tags', params)
-        return self._request('GET', 'tags', params)
+        return self._request('GET', 'tags', params, timeout=timeout)
 
-    def get_tag(self, resource, params):
+    def get_tag(self, resource, params, timeout=None):
         """Get a single tag"""
         self._check_endpoint_params('get-tag', params)
-        return self._request('GET', 'tags/%s' % resource, params)
+        return self._request('GET', 'tags/%s' % resource, params,
+                             timeout=timeout)
 
-    def put_tag(self, resource, params):
+    def put_tag(self, resource, params, timeout=None):
         """Rename an existing tag"""
         self._check_endpoint_params('put-tag', params)
-        return self._request('PUT', 'tags/%s' % resource, params)
+        return self._request('PUT', 'tags/%s' % resource, params,
+                             timeout=timeout)
 
-    def delete_tag(self, resource, params):
+    def delete_tag(self, resource, params, timeout=None):
         """Delete a tag"""
         self._check_endpoint_params('delete-tag', params)
-        return self._request('DELETE', 'tags/%s' % resource, params)
+        return self._request('DELETE', 'tags/%s' % resource, params,
+                             timeout=timeout)
 
-    def delete_link(self, resource, params):
+    def delete_link(self, resource, params, timeout=None):
         """Delete a link"""
         self._check_endpoint_params('delete-link', params)
-        return self._request('DELETE', 'links/%d' % resource, params)
+        return self._request('DELETE', 'links/%d' % resource, params,
+                             timeout=timeout)
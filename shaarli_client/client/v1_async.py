@@ -0,0 +1,189 @@
+"""Shaarli REST API v1 asynchronous client"""
+from .deadline import DEFAULT_TIMEOUT
+from .v1 import ShaarliV1ClientBase
+
+
+class AsyncShaarliV1Client(ShaarliV1ClientBase):
+    """Shaarli REST API v1 asynchronous client
+
+    This client relies on the optional `aiohttp` dependency, and exposes
+    awaitable versions of the ``ShaarliV1Client`` endpoint methods.
+
+    Responses are returned as ``aiohttp.ClientResponse`` objects whose body
+    has already been read, so that ``await response.json()`` can be called
+    once the underlying connection has been released to the pool.
+    """
+
+    def __init__(self, uri, secret, session=None,
+                 pool_limit=100, pool_limit_per_host=0, verify_certs=True,
+                 token_ttl=60, rate_limiter=None, timeout=DEFAULT_TIMEOUT):
+        """Client constructor
+
+        Requests are sent through a pooled HTTP session, which is created on
+        first use so that it is bound to the running event loop.
+        ``pool_limit`` sets the maximum number of concurrent connections.
+
+        An existing ``aiohttp.ClientSession`` can be passed, in which case
+        the caller remains responsible for closing it.
+        """
+        # pylint: disable=too-many-arguments
+        super(AsyncShaarliV1Client, self).__init__(uri, secret, verify_certs,
+                                                   token_ttl, rate_limiter,
+                                                   timeout)
+
+        self.pool_limit = pool_limit
+        self.pool_limit_per_host = pool_limit_per_host
+        self.session = session
+        self._owns_session = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _create_session(self):
+        """Create a keep-alive HTTP session with a sized connection pool"""
+        try:
+            import aiohttp  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise ImportError(
+                "The asynchronous client requires aiohttp, which can be "
+                "installed with: pip install shaarli-client[async]"
+            )
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_limit,
+            limit_per_host=self.pool_limit_per_host,
+        )
+        connect_timeout, read_timeout = self.timeout \
+            if isinstance(self.timeout, tuple) \
+            else (self.timeout, self.timeout)
+        return aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout,
+                                          sock_read=read_timeout)
+        )
+
+    async def close(self):
+        """Release the connections held by this client's HTTP session"""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _send(self, method, endpoint_uri, kwargs):
+        """Send an HTTP request through this client's session"""
+        async with self.rate_limiter:
+            async with self.session.request(
+                    method,
+                    endpoint_uri,
+                    **kwargs) as response:
+                await response.read()
+                return response
+
+    async def _request(self, method, endpoint, params, verify_certs=None):
+        """Send an HTTP request to this instance
+
+        If a cached authentication token is rejected, the request is sent
+        once more with a freshly signed token.
+        """
+        if verify_certs is None:
+            verify_certs = self.verify_certs
+
+        if self.session is None:
+            self.session = self._create_session()
+
+        endpoint_uri = self._endpoint_uri(endpoint)
+        headers, cached_token = self._auth_headers()
+        kwargs = {'headers': headers}
+
+        if method == 'GET':
+            # unlike requests, aiohttp does not skip unset query parameters
+            kwargs['params'] = {
+                param: value
+                for param, value in (params or {}).items()
+                if value is not None
+            }
+        else:
+            kwargs['json'] = params
+
+        if not verify_certs:
+            kwargs['ssl'] = False
+
+        response = await self._send(method, endpoint_uri, kwargs)
+
+        if response.status == 401 and cached_token:
+            kwargs['headers'], _ = self._auth_headers(renew=True)
+            response = await self._send(method, endpoint_uri, kwargs)
+
+        return response
+
+    async def request(self, args):
+        """Send a parameterized request to this instance"""
+        verify_certs = False if args.insecure else True
+        return await self._request(* self._retrieve_http_params(args),
+                                   verify_certs)
+
+    async def get_info(self):
+        """Get information about this instance"""
+        return await self._request('GET', 'info', {})
+
+    async def get_links(self, params):
+        """Get a collection of links ordered by creation date"""
+        self._check_endpoint_params('get-links', params)
+        return await self._request('GET', 'links', params)
+
+    async def iter_links(self, params=None, page_size=100):
+        """Iterate over a collection of links, one page at a time
+
+        See ``ShaarliV1Client.iter_links``.
+        """
+        params, windows = self._prepare_links_iteration(params, page_size)
+
+        for offset, window in windows:
+            response = await self.get_links(
+                dict(params, offset=offset, limit=window)
+            )
+            response.raise_for_status()
+            links = await response.json()
+
+            for link in links:
+                yield link
+
+            if len(links) < window:
+                return
+
+    async def post_link(self, params):
+        """Create a new link or note"""
+        self._check_endpoint_params('post-link', params)
+        return await self._request('POST', 'links', params)
+
+    async def put_link(self, resource, params):
+        """Update an existing link or note"""
+        self._check_endpoint_params('put-link', params)
+        return await self._request('PUT', 'links/%d' % resource, params)
+
+    async def get_tags(self, params):
+        """Get a list of all tags"""
+        self._check_endpoint_params('get-tags', params)
+        return await self._request('GET', 'tags', params)
+
+    async def get_tag(self, resource, params):
+        """Get a single tag"""
+        self._check_endpoint_params('get-tag', params)
+        return await self._request('GET', 'tags/%s' % resource, params)
+
+    async def put_tag(self, resource, params):
+        """Rename an existing tag"""
+        self._check_endpoint_params('put-tag', params)
+        return await self._request('PUT', 'tags/%s' % resource, params)
+
+    async def delete_tag(self, resource, params):
+        """Delete a tag"""
+        self._check_endpoint_params('delete-tag', params)
+        return await self._request('DELETE', 'tags/%s' % resource, params)
+
+    async def delete_link(self, resource, params):
+        """Delete a link"""
+        self._check_endpoint_params('delete-link', params)
+        return await self._request('DELETE', 'links/%d' % resource, params)
@@ -0,0 +1,808 @@
+"""CLI commands built on top of the REST API endpoints"""
+import itertools
+import json
+import logging
+import os
+import shlex
+from argparse import FileType
+
+from .client.bulk import bulk_map
+from .client.deadline import Deadline, DeadlineExceeded
+from .client.v1 import (InvalidEndpointParameters, ShaarliV1Client,
+                        TextFormatAction, check_positive_integer)
+from .mirror import LinkMirror, default_mirror_path
+from .utils import (EXPORT_FORMATS, GROWTH_PERIODS, STATS_TABLES,
+                    LazyArgumentParser, format_bulk_results, format_items,
+                    generate_all_endpoints_parsers, iter_json_array, read_links)
+
+
+class InvalidCommandLine(Exception):
+    """Raised when a command line of a batch cannot be parsed"""
+
+
+class BatchArgumentParser(LazyArgumentParser):
+    """Argument parser raising errors instead of exiting the program"""
+
+    def __init__(self, *args, **kwargs):
+        """Parser constructor, without help options"""
+        kwargs['add_help'] = False
+        super(BatchArgumentParser, self).__init__(*args, **kwargs)
+
+    def error(self, message):
+        """Raise parsing errors"""
+        raise InvalidCommandLine(message)
+
+
+def generate_batch_parser():
+    """Generate the parser of batch command lines, from endpoint metadata"""
+    parser = BatchArgumentParser(prog='batch')
+    subparsers = parser.add_subparsers(
+        dest='endpoint_name',
+        parser_class=BatchArgumentParser
+    )
+    subparsers.required = True
+    generate_all_endpoints_parsers(subparsers, ShaarliV1Client.endpoints)
+    return parser
+
+
+def parse_batch(parser, lines):
+    """Parse batch command lines, skipping blank lines and comments
+
+    Yields the number of each command line, the line, and either its parsed
+    arguments or the error raised while parsing it.
+    """
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        try:
+            yield (number, line, parser.parse_args(shlex.split(line)), None)
+        except (InvalidCommandLine, ValueError) as exc:
+            yield (number, line, None, exc)
+
+
+def get_mirror_path(args):
+    """Get the location of the local mirror of the selected instance"""
+    return args.mirror or default_mirror_path(args.instance)
+
+
+def get_deadline(args):
+    """Start the deadline of the selected command, if any"""
+    seconds = getattr(args, 'deadline', None)
+    return Deadline(seconds) if seconds else None
+
+
+def bulk_post(client, args):
+    """Create links in bulk from a JSON Lines or CSV file
+
+    Returns the per-link report, as chunks of output.
+    """
+    # invalid links are reported, without stopping the links that follow
+    links = read_links(args.infile, args.input_format, report_errors=True)
+    return format_bulk_results(
+        client.post_links(links, concurrency=args.concurrency,
+                          deadline=get_deadline(args))
+    )
+
+
+def sync(client, args):
+    """Synchronize the local mirror of an instance
+
+    Returns synchronization statistics, as chunks of output; when the
+    deadline is over, the statistics of the partial synchronization are
+    output before ``DeadlineExceeded`` is raised.
+    """
+    with LinkMirror(get_mirror_path(args)) as mirror:
+        try:
+            stats = mirror.sync(
+                client,
+                full=args.full,
+                page_size=args.page_size,
+                parallel=args.parallel,
+                deadline=get_deadline(args)
+            )
+        except DeadlineExceeded as exc:
+            yield json.dumps(exc.stats, sort_keys=True)
+            raise
+    yield json.dumps(stats, sort_keys=True)
+
+
+def read_link_patches(infile, input_format):
+    """Read link changes from a JSON Lines or CSV file
+
+    Each link holds the ID of the link to update, and the fields to change;
+    empty fields are left unchanged. Yields (link ID, changes) pairs.
+    """
+    for number, link in enumerate(read_links(infile, input_format), 1):
+        try:
+            resource = int(link.pop('id'))
+        except (KeyError, ValueError):
+            raise ValueError("Link %d: missing or invalid ID" % number)
+        yield (resource, link)
+
+
+def find_links(client, link_ids, page_size=100, deadline=None):
+    """Retrieve links by ID, from the newest to the oldest
+
+    Pages of links are retrieved until all links are found, which usually
+    takes a single page when recent links are updated. As IDs grow with
+    creation dates, retrieval stops once a whole page of links older than
+    the oldest requested link has been read, and missing IDs are logged.
+
+    Returns a dict mapping the IDs of the links found to the links.
+    """
+    link_ids = set(link_ids)
+    links = {}
+    if not link_ids:
+        return links
+
+    oldest = min(link_ids)
+    # imported links may be older than their ID: tolerate a page of them
+    older = 0
+    for link in client.iter_links({'visibility': 'all'},
+                                  page_size=page_size, deadline=deadline):
+        if link['id'] in link_ids:
+            links[link['id']] = link
+            if len(links) == len(link_ids):
+                break
+        elif link['id'] < oldest:
+            older += 1
+            if older >= page_size:
+                break
+
+    missing = sorted(link_ids - set(links))
+    if missing:
+        logging.warning("Links not found: %s",
+                        ', '.join(str(link_id) for link_id in missing))
+    return links
+
+
+def patch_links(client, args):
+    """Update some fields of links in bulk, skipping unchanged links
+
+    The current state of the links is read from the local mirror, or
+    retrieved from the instance before sending updates.
+
+    Returns the per-link report, as chunks of output.
+    """
+    patches = list(read_link_patches(args.infile, args.input_format))
+    link_ids = [resource for resource, _ in patches]
+    deadline = get_deadline(args)
+
+    if args.from_mirror:
+        with LinkMirror(get_mirror_path(args)) as mirror:
+            links = mirror.links_by_id(link_ids)
+    else:
+        links = find_links(client, link_ids, args.page_size, deadline)
+
+    def describe(patch):
+        resource, changes = patch
+        try:
+            changed = sorted(client.diff_link(links[resource], changes))
+        except (KeyError, InvalidEndpointParameters):
+            # already reported as the error of this link
+            changed = None
+        return {'id': resource, 'changed': changed}
+
+    return format_bulk_results(
+        client.patch_links(patches, links, args.concurrency, deadline),
+        describe
+    )
+
+
+def _iter_lines(chunks):
+    """Split chunks of text into lines"""
+    pending = ''
+
+    for chunk in chunks:
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        yield from lines
+
+    yield pending
+
+
+def batch(client, args):
+    """Send requests read from a file, one CLI-style command per line
+
+    Returns the per-command report, as chunks of output.
+    """
+    parser = generate_batch_parser()
+    parser.set_defaults(insecure=args.insecure)
+    deadline = get_deadline(args)
+
+    def send(command):
+        _, _, command_args, error = command
+        if error is not None:
+            raise error
+        return client.request(command_args, deadline=deadline)
+
+    def describe(command):
+        number, line, _, _ = command
+        return {'line': number, 'command': line}
+
+    # command lines are parsed lazily by bulk_map, in the calling thread
+    return format_bulk_results(
+        bulk_map(send, parse_batch(parser, args.infile), args.concurrency,
+                 deadline),
+        describe
+    )
+
+
+def tags_apply(client, args):
+    """Rename, merge and delete tags following a mapping file
+
+    The mapping is validated against the tags of the instance, retrieved
+    once; applied operations are recorded in the journal, if any, and
+    skipped when running again.
+
+    Returns the per-operation report, as chunks of output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from . import tags
+
+    mapping = tags.read_tag_mapping(args.infile)
+
+    done = set()
+    if args.journal and os.path.exists(args.journal):
+        with open(args.journal) as f_journal:
+            done = tags.read_journal(f_journal)
+
+    response = client.get_tags({'limit': 'all', 'visibility': 'all'})
+    response.raise_for_status()
+    plan, dropped = tags.plan_tag_operations(
+        mapping, [tag['name'] for tag in response.json()], done
+    )
+
+    for operation, reason in dropped:
+        if reason == 'missing':
+            logging.warning("Tag '%s' not found, skipping", operation.tag)
+
+    journal = open(args.journal, 'a') if args.journal else None
+    try:
+        yield from format_bulk_results(
+            tags.apply_tag_plan(client, plan, args.concurrency, journal,
+                                get_deadline(args)),
+            tags.TagOperation.describe
+        )
+    finally:
+        if journal is not None:
+            journal.close()
+
+
+def tags_stats(source, args):
+    """Compute tag statistics from a single pass over all links
+
+    Links are retrieved from the instance, or read from the local mirror
+    with ``--local``.
+
+    Returns all statistics as JSON, or a single table as CSV, as chunks of
+    output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .analytics import TagStats, format_csv
+
+    top = None if args.top == 'all' else int(args.top)
+    params = {'limit': 'all', 'visibility': 'all'}
+
+    if isinstance(source, LinkMirror):
+        links = source.iter_links(params)
+    else:
+        links = source.iter_links(params, page_size=args.page_size,
+                                  parallel=args.parallel,
+                                  deadline=get_deadline(args))
+
+    stats = TagStats(args.period)
+    stats.add_links(links)
+
+    if args.output_format == 'csv':
+        return format_csv(*stats.table_rows(args.table, top))
+    return [json.dumps(stats.to_dict(top), sort_keys=True)]
+
+
+def dedupe(source, args):
+    """Find duplicate links, and optionally merge and delete them
+
+    Links are retrieved from the instance, or read from the local mirror
+    with ``--local``, and grouped by normalized URL.
+
+    Returns the duplicate groups, or the per-operation report when merging
+    tags or deleting links, as chunks of output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .dedupe import DedupeOperation, DuplicateFinder, apply_dedupe
+
+    params = {'limit': 'all', 'visibility': 'all'}
+    deadline = get_deadline(args)
+
+    if isinstance(source, LinkMirror):
+        if args.merge_tags or args.delete:
+            raise ValueError("Links of a local mirror cannot be modified")
+        links = source.iter_links(params)
+    else:
+        links = source.iter_links(params, page_size=args.page_size,
+                                  parallel=args.parallel, deadline=deadline)
+
+    finder = DuplicateFinder(exact=args.exact)
+    finder.add_links(links)
+
+    if not (args.merge_tags or args.delete):
+        return format_items('jsonl', (
+            group.describe() for group in finder.groups()
+        ))
+
+    return format_bulk_results(
+        apply_dedupe(source, finder.groups(), merge_tags=args.merge_tags,
+                     delete=args.delete, concurrency=args.concurrency,
+                     deadline=deadline),
+        DedupeOperation.describe
+    )
+
+
+def export(source, args):
+    """Export all links to a file, as they are retrieved
+
+    Links are retrieved page by page from the instance, or read from the
+    local mirror with ``--local``.
+
+    Returns export statistics, as chunks of output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .export import create_exporter
+
+    params = {'limit': 'all', 'visibility': 'all'}
+
+    if isinstance(source, LinkMirror):
+        links = source.iter_links(params)
+    else:
+        links = source.iter_links(params, page_size=args.page_size,
+                                  parallel=args.parallel,
+                                  deadline=get_deadline(args))
+
+    with create_exporter(args.path, args.export_format) as exporter:
+        count = exporter.write_links(links)
+
+    return [json.dumps({'links': count, 'path': args.path}, sort_keys=True)]
+
+
+def _url_key(url):
+    """Key identifying a URL, regardless of its variants"""
+    # pylint: disable=import-outside-toplevel
+    from .dedupe import normalize_url
+
+    return normalize_url(url) or url
+
+
+def import_html(client, args):
+    """Create links from a Netscape bookmark file, as it is parsed
+
+    Bookmarks whose URL is already used by a link of the instance, or by a
+    previous bookmark of the file, are skipped; the URLs of all links are
+    retrieved beforehand, unless duplicates are allowed.
+
+    Returns the per-bookmark report, as chunks of output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .bookmarks import read_bookmarks
+
+    deadline = get_deadline(args)
+    known_urls = set()
+    if not args.allow_duplicates:
+        known_urls.update(
+            _url_key(link.get('url'))
+            for link in client.iter_links(
+                {'limit': 'all', 'visibility': 'all'},
+                page_size=args.page_size,
+                parallel=args.parallel,
+                deadline=deadline
+            )
+        )
+
+    def bookmarks():
+        # URLs are checked lazily, in the calling thread
+        for bookmark in read_bookmarks(args.infile):
+            key = _url_key(bookmark['url'])
+            skipped = not args.allow_duplicates and key in known_urls
+            known_urls.add(key)
+            yield (bookmark, skipped)
+
+    def post_link(item):
+        bookmark, skipped = item
+        if skipped:
+            return None
+        return client.post_link(bookmark, deadline=deadline)
+
+    def describe(item):
+        bookmark, skipped = item
+        return {'url': bookmark['url'], 'skipped': skipped}
+
+    return format_bulk_results(
+        bulk_map(post_link, bookmarks(), args.concurrency, deadline),
+        describe
+    )
+
+
+def export_html(source, args):
+    """Export links as a Netscape bookmark file, as they are retrieved
+
+    Links are retrieved page by page from the instance, or read from the
+    local mirror with ``--local``.
+
+    Returns the bookmark file, as chunks of output.
+    """
+    # pylint: disable=import-outside-toplevel
+    from .bookmarks import format_bookmarks
+
+    params = {'limit': 'all', 'visibility': args.visibility}
+
+    if isinstance(source, LinkMirror):
+        links = source.iter_links(params)
+        base_uri = source.get_metadata('uri')
+    else:
+        links = source.iter_links(params, page_size=args.page_size,
+                                  parallel=args.parallel,
+                                  deadline=get_deadline(args))
+        base_uri = source.uri
+
+    return format_bookmarks(links, base_uri)
+
+
+def read_dump(infile, chunk_size=65536):
+    """Read links from a get-links dump, as a JSON array or JSON Lines"""
+    chunks = iter(lambda: infile.read(chunk_size), '')
+    head = ''
+
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+
+    if head.lstrip().startswith('['):
+        return iter_json_array(itertools.chain([head], chunks))
+
+    return (
+        json.loads(line)
+        for line in _iter_lines(itertools.chain([head], chunks))
+        if line.strip()
+    )
+
+
+def load_dump(mirror, args):
+    """Load links from a get-links dump into the local mirror
+
+    Returns loading statistics, as chunks of output.
+    """
+    stats = mirror.load_links(read_dump(args.infile))
+    return [json.dumps(stats, sort_keys=True)]
+
+
+def search(mirror, args):
+    """Search links in the local mirror, ranked by relevance
+
+    Returns matching links, as chunks of output.
+    """
+    return format_items(args.format, mirror.search({
+        'searchterm': args.searchterm,
+        'searchtags': args.searchtags,
+        'visibility': args.visibility,
+        'offset': args.offset,
+        'limit': args.limit,
+    }))
+
+
+COMMANDS = {
+    'batch': {
+        'function': batch,
+        'help': "Send requests read from a file, one command per line",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "File to read commands from (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r'),
+            },
+            '--concurrency': {
+                'default': 1,
+                'help': "Number of requests to send concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'bulk-post': {
+        'function': bulk_post,
+        'help': "Create links or notes in bulk from a JSON Lines or CSV file",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "File to read links from (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r'),
+            },
+            '--input-format': {
+                'choices': ['jsonl', 'csv'],
+                'default': 'jsonl',
+                'help': "Input file format",
+            },
+            '--concurrency': {
+                'default': 4,
+                'help': "Number of links to create concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'patch-links': {
+        'function': patch_links,
+        'help': "Update some fields of links in bulk, from a JSON Lines or"
+                " CSV file",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "File to read link IDs and changed fields from"
+                        " (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r'),
+            },
+            '--input-format': {
+                'choices': ['jsonl', 'csv'],
+                'default': 'jsonl',
+                'help': "Input file format",
+            },
+            '--concurrency': {
+                'default': 4,
+                'help': "Number of links to update concurrently",
+                'type': check_positive_integer,
+            },
+            '--from-mirror': {
+                'action': 'store_true',
+                'help': "Read the current state of links from the local"
+                        " mirror, instead of retrieving them",
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'tags-apply': {
+        'function': tags_apply,
+        'help': "Rename, merge and delete tags following a mapping file",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "File to read the mapping from, one 'tag new-name'"
+                        " or 'tag-to-delete' per line (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r'),
+            },
+            '--concurrency': {
+                'default': 4,
+                'help': "Number of operations to apply concurrently",
+                'type': check_positive_integer,
+            },
+            '--journal': {
+                'help': "File recording applied operations, to resume an"
+                        " interrupted run",
+            },
+        },
+    },
+    'tags-stats': {
+        'function': tags_stats,
+        'mirror': True,
+        'help': "Compute tag counts, co-occurrences and growth over time",
+        'arguments': {
+            '--period': {
+                'choices': list(GROWTH_PERIODS),
+                'default': 'month',
+                'help': "Period over which tag growth is measured",
+            },
+            '--top': {
+                'default': '50',
+                'help': "Number of most used tags to report, or 'all'",
+            },
+            '--output-format': {
+                'choices': ['json', 'csv'],
+                'default': 'json',
+                'help': "Output format: JSON holds all statistics, CSV a"
+                        " single table",
+            },
+            '--table': {
+                'choices': STATS_TABLES,
+                'default': 'tags',
+                'help': "Table to output as CSV",
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'dedupe': {
+        'function': dedupe,
+        'mirror': True,
+        'help': "Find duplicate links, and optionally merge and delete them",
+        'arguments': {
+            '--exact': {
+                'action': 'store_true',
+                'help': "Only group links with exactly the same URL",
+            },
+            '--merge-tags': {
+                'action': 'store_true',
+                'help': "Add the tags of duplicate links to the oldest one",
+            },
+            '--delete': {
+                'action': 'store_true',
+                'help': "Delete duplicate links, keeping the oldest one",
+            },
+            '--concurrency': {
+                'default': 4,
+                'help': "Number of links to update or delete concurrently",
+                'type': check_positive_integer,
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'export': {
+        'function': export,
+        'mirror': True,
+        # instances would all be exported to the same file
+        'single_instance': True,
+        'help': "Export all links to a file, e.g. for backups",
+        'arguments': {
+            'path': {
+                'help': "File to export links to",
+            },
+            '--export-format': {
+                'choices': EXPORT_FORMATS,
+                'help': "Export format (default: guessed from the file"
+                        " extension, or jsonl)",
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'import-html': {
+        'function': import_html,
+        'help': "Create links from a Netscape bookmark file, as exported by"
+                " web browsers",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "Bookmark file to read (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r', encoding='utf-8'),
+            },
+            '--allow-duplicates': {
+                'action': 'store_true',
+                'help': "Import bookmarks whose URL is already used",
+            },
+            '--concurrency': {
+                'default': 4,
+                'help': "Number of links to create concurrently",
+                'type': check_positive_integer,
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page, when looking"
+                        " for existing URLs",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'export-html': {
+        'function': export_html,
+        'mirror': True,
+        'help': "Export links as a Netscape bookmark file, to import in web"
+                " browsers",
+        'arguments': {
+            '--visibility': {
+                'choices': ['all', 'private', 'public'],
+                'default': 'all',
+                'help': "Filter links by visibility",
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently",
+                'type': check_positive_integer,
+            },
+        },
+    },
+    'load-dump': {
+        'function': load_dump,
+        'local': True,
+        'help': "Load links from a get-links dump into the local mirror",
+        'arguments': {
+            'infile': {
+                'default': '-',
+                'help': "JSON or JSON Lines file to read links from"
+                        " (default: stdin)",
+                'nargs': '?',
+                'type': FileType('r'),
+            },
+        },
+    },
+    'search': {
+        'function': search,
+        'local': True,
+        'help': "Search links in the local mirror, ranked by relevance",
+        'arguments': {
+            'searchterm': {
+                'action': TextFormatAction,
+                'help': "Search terms across all links fields",
+                'nargs': '*',
+            },
+            '--searchtags': {
+                'action': TextFormatAction,
+                'help': "List of tags",
+                'nargs': '+',
+            },
+            '--visibility': {
+                'choices': ['all', 'private', 'public'],
+                'help': "Filter links by visibility",
+            },
+            '--offset': {
+                'help': "Offset from which to start listing results",
+                'type': int,
+            },
+            '--limit': {
+                'default': 20,
+                'help': "Number of results to retrieve or 'all'",
+            },
+        },
+    },
+    'sync': {
+        'function': sync,
+        'help': "Synchronize the local mirror of this instance",
+        'arguments': {
+            '--full': {
+                'action': 'store_true',
+                'help': "Retrieve all links, instead of recent changes only",
+            },
+            '--page-size': {
+                'default': 100,
+                'help': "Number of links to retrieve per page",
+                'type': check_positive_integer,
+            },
+            '--parallel': {
+                'default': 1,
+                'help': "Number of pages to retrieve concurrently"
+                        " (full synchronization only)",
+                'type': check_positive_integer,
+            },
+        },
+    },
+}
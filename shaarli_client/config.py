@@ -15,14 +15,12 @@ class InvalidConfiguration(Exception):
         )
 
 
-def get_credentials(args):
-    """Retrieve Shaarli authentication information"""
-    if args.url and args.secret:
-        # credentials passed as CLI arguments
-        logging.warning("Passing credentials as arguments is unsafe"
-                        " and should be used for debugging only")
-        return (args.url, args.secret)
+def _read_config(args):
+    """Read the configuration file(s), and select the instance section
 
+    Returns the configuration, the name of the selected section, and the
+    list of files successfully read.
+    """
     config = ConfigParser()
 
     if args.instance:
@@ -42,6 +40,19 @@ def get_credentials(args):
             'shaarli_client.ini'
         ])
 
+    return (config, instance, config_files)
+
+
+def get_credentials(args):
+    """Retrieve Shaarli authentication information"""
+    if args.url and args.secret:
+        # credentials passed as CLI arguments
+        logging.warning("Passing credentials as arguments is unsafe"
+                        " and should be used for debugging only")
+        return (args.url, args.secret)
+
+    config, instance, config_files = _read_config(args)
+
     if not config_files:
         raise InvalidConfiguration("No configuration file found")
 
@@ -52,3 +63,69 @@ def get_credentials(args):
         return (config[instance]['url'], config[instance]['secret'])
     except KeyError as exc:
         raise InvalidConfiguration("Missing entry: %s" % exc)
+
+
+def get_instances(args):
+    """Retrieve the aliases of the instances to run a request against
+
+    Aliases are either listed with ``--instances``, or, with
+    ``--all-instances``, those of all the ``[shaarli:<alias>]`` sections of
+    the configuration. Returns an empty list when neither is set.
+    """
+    if getattr(args, 'instances', None):
+        aliases = [alias.strip() for alias in args.instances.split(',')]
+        # keep the first occurrence of each alias
+        aliases = list(dict.fromkeys(alias for alias in aliases if alias))
+        if not aliases:
+            raise InvalidConfiguration("No instance selected")
+        return aliases
+
+    if not getattr(args, 'all_instances', False):
+        return []
+
+    config, _, config_files = _read_config(args)
+
+    if not config_files:
+        raise InvalidConfiguration("No configuration file found")
+
+    aliases = [
+        section.split(':', 1)[1]
+        for section in config.sections()
+        if section.startswith('shaarli:')
+    ]
+    if not aliases:
+        raise InvalidConfiguration("No [shaarli:<alias>] section found")
+    return aliases
+
+
+def get_settings(args):
+    """Retrieve the client settings of the selected instance
+
+    Returns the entries of the instance section as a dict of strings; the
+    dict is empty when no configuration file or section is found.
+    """
+    config, instance, _ = _read_config(args)
+
+    if not config.has_section(instance):
+        return {}
+    return dict(config[instance])
+
+
+def get_setting(args, settings, name, convert, default=None):
+    """Get a client setting from CLI arguments, or else the configuration
+
+    Values read from the configuration are converted with ``convert``.
+    """
+    value = getattr(args, name, None)
+    if value is not None:
+        return value
+
+    if name not in settings:
+        return default
+
+    try:
+        return convert(settings[name])
+    except ValueError:
+        raise InvalidConfiguration(
+            "Invalid value for %s: %s" % (name, settings[name])
+        )
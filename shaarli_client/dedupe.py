@@ -0,0 +1,229 @@
+"""Detection and removal of duplicate links"""
+import re
+from collections import namedtuple
+
+from .client.bulk import BulkResult, bulk_map
+from .models import Link
+
+# query parameters added by analytics and marketing tools
+TRACKING_PARAMETERS = frozenset([
+    'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', 'igshid',
+    'yclid', '_hsenc', '_hsmi', 'ref_src', 'spm',
+])
+TRACKING_PREFIXES = ('utm_',)
+
+DEFAULT_PORTS = {'http': '80', 'https': '443'}
+
+# scheme, network location, path and query of a URL with a host
+URL_PATTERN = re.compile(r'([a-zA-Z][a-zA-Z0-9+.-]*)://([^/?#]*)([^?#]*)'
+                         r'(?:\?([^#]*))?')
+
+
+def _is_tracking(parameter):
+    """Whether a query parameter is only used to track visitors"""
+    parameter = parameter.lower()
+    return parameter in TRACKING_PARAMETERS \
+        or parameter.startswith(TRACKING_PREFIXES)
+
+
+def normalize_url(url):
+    """Normalize a URL, so that variants of the same URL are equal
+
+    The scheme (HTTP or HTTPS), host case, user information, ``www.``
+    prefix, default port, trailing slashes, fragment, tracking parameters
+    and query parameter order are ignored.
+
+    URLs are split with a regular expression, rather than ``urllib.parse``,
+    as it is several times faster over whole collections.
+
+    Returns None for notes, and other URLs without a host.
+    """
+    match = URL_PATTERN.match((url or '').strip())
+    if match is None:
+        return None
+
+    scheme, netloc, path, query = match.groups()
+    scheme = scheme.lower()
+    host = netloc.rpartition('@')[2].lower()
+    if not host:
+        return None
+
+    if host.startswith('www.'):
+        host = host[4:]
+    if ':' in host and not host.endswith(']'):
+        host, _, port = host.rpartition(':')
+        if port and port != DEFAULT_PORTS.get(scheme):
+            host = '%s:%s' % (host, port)
+
+    normalized = host if scheme in DEFAULT_PORTS \
+        else '%s://%s' % (scheme, host)
+    normalized += path.rstrip('/')
+
+    if query:
+        query = '&'.join(sorted(
+            parameter for parameter in query.split('&')
+            if parameter and not _is_tracking(parameter.partition('=')[0])
+        ))
+        if query:
+            normalized += '?' + query
+
+    return normalized
+
+
+class DuplicateGroup(namedtuple('DuplicateGroup', ['key', 'links'])):
+    """Links sharing the same URL, once normalized
+
+    The oldest link is kept, and the others are redundant.
+    """
+
+    __slots__ = ()
+
+    @property
+    def keep(self):
+        """Link to keep"""
+        return self.links[0]
+
+    @property
+    def duplicates(self):
+        """Redundant links"""
+        return self.links[1:]
+
+    @property
+    def exact(self):
+        """Whether all links have exactly the same URL"""
+        return len({link.url for link in self.links}) == 1
+
+    def merged_tags(self):
+        """Tags of all links, those of the kept link first"""
+        tags = []
+        for link in self.links:
+            tags.extend(tag for tag in link.tags if tag not in tags)
+        return tags
+
+    def describe(self):
+        """Describe the group, for reports"""
+        return {
+            'url': self.key,
+            'exact': self.exact,
+            'keep': self.keep.id,
+            'duplicates': [link.id for link in self.duplicates],
+            'tags': self.merged_tags(),
+        }
+
+
+class DuplicateFinder:
+    """Group links by URL through a hashed index, in a single pass
+
+    URLs are normalized (see: ``normalize_url``), unless only exact
+    duplicates are looked for.
+    """
+
+    def __init__(self, exact=False):
+        """Finder constructor"""
+        self.exact = exact
+        # URLs are mostly unique: a list is only used for duplicates
+        self._index = {}
+
+    def add_links(self, links):
+        """Index links, given as returned by the REST API"""
+        index = self._index
+        for data in links:
+            key = data.get('url') if self.exact \
+                else normalize_url(data.get('url'))
+            if not key:
+                continue
+
+            link = Link.from_dict(data)
+            same_url = index.setdefault(key, link)
+            if same_url is link:
+                continue
+            if isinstance(same_url, Link):
+                index[key] = [same_url, link]
+            else:
+                same_url.append(link)
+
+    def groups(self):
+        """Get groups of duplicate links, the oldest link of each first"""
+        for key, links in self._index.items():
+            if isinstance(links, Link):
+                continue
+            yield DuplicateGroup(key, sorted(links, key=lambda link: (
+                link.created is None,
+                link.created.timestamp() if link.created else 0,
+                link.id,
+            )))
+
+
+class DedupeOperation(namedtuple('DedupeOperation',
+                                 ['action', 'link', 'group'])):
+    """Tag merge into a kept link, or deletion of a redundant link"""
+
+    __slots__ = ()
+
+    def describe(self):
+        """Describe the operation, for reports"""
+        return {
+            'action': self.action,
+            'id': self.link.id,
+            'url': self.group.key,
+        }
+
+    def apply(self, client):
+        """Send the request performing this operation"""
+        if self.action == 'merge':
+            return client.patch_link(self.link.id,
+                                     {'tags': self.group.merged_tags()},
+                                     self.link.to_dict())
+        return client.delete_link(self.link.id, {})
+
+
+class MergeFailed(Exception):
+    """Raised when redundant links are kept, as their tags were not merged"""
+
+    def __init__(self, group):
+        """Custom exception message"""
+        super(MergeFailed, self).__init__(
+            "Not deleted, as tags could not be merged into link %d"
+            % group.keep.id
+        )
+
+
+def apply_dedupe(client, groups, *, merge_tags=False, delete=False,
+                 concurrency=4, deadline=None):
+    """Merge the tags of duplicate links, and delete redundant links
+
+    Tags are merged into the kept links first; redundant links are then
+    deleted, unless the merge into their kept link failed.
+
+    Yields a ``BulkResult`` for each operation, whose ``params`` is the
+    ``DedupeOperation``.
+    """
+    groups = list(groups)
+    failed = set()
+    index = 0
+
+    if merge_tags:
+        merges = (DedupeOperation('merge', group.keep, group)
+                  for group in groups)
+        for result in bulk_map(lambda operation: operation.apply(client),
+                               merges, concurrency, deadline):
+            if not result.ok:
+                failed.add(result.params.group.key)
+            yield result
+            index += 1
+
+    if not delete:
+        return
+
+    def apply(operation):
+        if operation.group.key in failed:
+            raise MergeFailed(operation.group)
+        return operation.apply(client)
+
+    deletions = (
+        DedupeOperation('delete', link, group)
+        for group in groups
+        for link in group.duplicates
+    )
+    for result in bulk_map(apply, deletions, concurrency, deadline):
+        yield BulkResult(index + result.index, *result[1:])
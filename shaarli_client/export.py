@@ -0,0 +1,295 @@
+"""Streaming exporters of link collections, e.g. for backups
+
+Links are written as they are retrieved, so that whole collections can be
+exported with bounded memory usage:
+
+- ``jsonl``: JSON Lines, optionally compressed (``jsonl.gz``, or
+  ``jsonl.zst`` which requires the optional ``zstandard`` dependency);
+- ``csv``: one column per link field, with space-separated tags, as read by
+  the ``bulk-post`` command;
+- ``parquet`` and ``arrow`` (Arrow IPC file): columnar formats, which
+  require the optional ``pyarrow`` dependency;
+- ``packed``: a simple columnar format without dependencies, read back by
+  ``read_packed``. The file starts with ``PACKED_MAGIC``, followed by
+  blocks of links: each block is a 4-byte little-endian length, and a
+  zlib-compressed JSON object mapping link fields to columns of values.
+"""
+import abc
+import csv
+import gzip
+import importlib
+import io
+import json
+import struct
+import zlib
+
+from .models import LINK_FIELDS
+from .utils import EXPORT_FORMATS
+
+PACKED_MAGIC = b'SHAARLI-PACKED-1\n'
+
+BLOCK_LENGTH = struct.Struct('<I')
+
+
+def guess_export_format(path):
+    """Guess an export format from a file name, defaulting to JSON Lines"""
+    for export_format in sorted(EXPORT_FORMATS, key=len, reverse=True):
+        if str(path).endswith('.' + export_format):
+            return export_format
+    return 'jsonl'
+
+
+def _import_optional(module, feature, extra):
+    """Import an optional dependency, explaining how to install it"""
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ImportError(
+            "%s requires %s, which can be installed with: "
+            "pip install shaarli-client[%s]"
+            % (feature, module.split('.')[0], extra)
+        )
+
+
+class LinkExporter(abc.ABC):
+    """Write links to a file, one at a time"""
+
+    def __init__(self, path):
+        """Exporter constructor"""
+        self.path = str(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abc.abstractmethod
+    def write(self, link):
+        """Write a link, as returned by the REST API"""
+
+    def write_links(self, links):
+        """Write links, consuming them one at a time
+
+        Returns the number of links written.
+        """
+        count = 0
+        for count, link in enumerate(links, 1):
+            self.write(link)
+        return count
+
+    @abc.abstractmethod
+    def close(self):
+        """Flush pending links, and close the file"""
+
+
+class JsonLinesExporter(LinkExporter):
+    """Write links as JSON Lines, optionally compressed"""
+
+    def __init__(self, path, compression=None):
+        """Open the file, compressing it with 'gzip' or 'zstd', if set"""
+        super(JsonLinesExporter, self).__init__(path)
+
+        if compression == 'gzip':
+            self._file = gzip.open(self.path, 'wt', encoding='utf-8',
+                                   compresslevel=6)
+        elif compression == 'zstd':
+            zstandard = _import_optional('zstandard', "Zstandard compression",
+                                         'zstd')
+            self._file = io.TextIOWrapper(
+                zstandard.ZstdCompressor().stream_writer(open(self.path,
+                                                              'wb')),
+                encoding='utf-8'
+            )
+        elif compression is None:
+            self._file = open(self.path, 'w', encoding='utf-8')
+        else:
+            raise ValueError("%s is not a supported compression"
+                             % compression)
+
+    def write(self, link):
+        """Write a link, as returned by the REST API"""
+        self._file.write(json.dumps(link, separators=(',', ':')) + '\n')
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class CsvExporter(LinkExporter):
+    """Write links as CSV, one column per link field"""
+
+    def __init__(self, path):
+        """Open the file, and write the header"""
+        super(CsvExporter, self).__init__(path)
+        self._file = open(self.path, 'w', encoding='utf-8', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(LINK_FIELDS)
+
+    def write(self, link):
+        """Write a link, as returned by the REST API"""
+        self._writer.writerow([
+            ' '.join(link.get('tags') or []) if field == 'tags'
+            else link.get(field)
+            for field in LINK_FIELDS
+        ])
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class ColumnarExporter(LinkExporter):
+    """Write links in blocks, one column per link field"""
+
+    def __init__(self, path, block_size=10000):
+        """Start collecting blocks of ``block_size`` links"""
+        super(ColumnarExporter, self).__init__(path)
+        self.block_size = block_size
+        self._columns = self._empty_columns()
+        self._pending = 0
+
+    @staticmethod
+    def _empty_columns():
+        """Get empty columns"""
+        return {field: [] for field in LINK_FIELDS}
+
+    def write(self, link):
+        """Write a link, as returned by the REST API"""
+        for field, column in self._columns.items():
+            column.append(link.get(field))
+        self._pending += 1
+
+        if self._pending >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """Write the pending block of links"""
+        if self._pending:
+            self._write_block(self._columns)
+            self._columns = self._empty_columns()
+            self._pending = 0
+
+    @abc.abstractmethod
+    def _write_block(self, columns):
+        """Write a block of links, as columns"""
+
+    @abc.abstractmethod
+    def _close(self):
+        """Close the file"""
+
+    def close(self):
+        """Write the pending block of links, and close the file"""
+        try:
+            self.flush()
+        finally:
+            self._close()
+
+
+class PackedExporter(ColumnarExporter):
+    """Write links in the packed format (see: ``read_packed``)"""
+
+    def __init__(self, path, block_size=10000):
+        """Open the file, and write its header"""
+        super(PackedExporter, self).__init__(path, block_size)
+        self._file = open(self.path, 'wb')
+        self._file.write(PACKED_MAGIC)
+
+    def _write_block(self, columns):
+        """Write a block of links, as compressed JSON columns"""
+        block = zlib.compress(
+            json.dumps(columns, separators=(',', ':')).encode('utf-8'), 6
+        )
+        self._file.write(BLOCK_LENGTH.pack(len(block)))
+        self._file.write(block)
+
+    def _close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class ArrowExporter(ColumnarExporter):
+    """Write links as Parquet or as an Arrow IPC file"""
+
+    def __init__(self, path, file_format='parquet', block_size=10000):
+        """Open the file, with the schema of links"""
+        super(ArrowExporter, self).__init__(path, block_size)
+        pyarrow = _import_optional('pyarrow', "Parquet and Arrow exports",
+                                   'arrow')
+        self._pyarrow = pyarrow
+        self.schema = pyarrow.schema([
+            ('id', pyarrow.int64()),
+            ('url', pyarrow.string()),
+            ('shorturl', pyarrow.string()),
+            ('title', pyarrow.string()),
+            ('description', pyarrow.string()),
+            ('tags', pyarrow.list_(pyarrow.string())),
+            ('private', pyarrow.bool_()),
+            ('created', pyarrow.string()),
+            ('updated', pyarrow.string()),
+        ])
+
+        if file_format == 'parquet':
+            parquet = _import_optional('pyarrow.parquet',
+                                       "Parquet and Arrow exports", 'arrow')
+            self._writer = parquet.ParquetWriter(self.path, self.schema,
+                                                 compression='zstd')
+        elif file_format == 'arrow':
+            ipc = _import_optional('pyarrow.ipc', "Parquet and Arrow exports",
+                                   'arrow')
+            self._writer = ipc.new_file(self.path, self.schema)
+        else:
+            raise ValueError("%s is not a supported Arrow format"
+                             % file_format)
+
+    def _write_block(self, columns):
+        """Write a block of links, as a table"""
+        self._writer.write_table(
+            self._pyarrow.Table.from_pydict(columns, schema=self.schema)
+        )
+
+    def _close(self):
+        """Close the file"""
+        self._writer.close()
+
+
+def create_exporter(path, export_format=None):
+    """Create the exporter of a format, guessed from the path if not set"""
+    export_format = export_format or guess_export_format(path)
+
+    if export_format == 'jsonl':
+        return JsonLinesExporter(path)
+    if export_format == 'jsonl.gz':
+        return JsonLinesExporter(path, 'gzip')
+    if export_format == 'jsonl.zst':
+        return JsonLinesExporter(path, 'zstd')
+    if export_format == 'csv':
+        return CsvExporter(path)
+    if export_format in ('parquet', 'arrow'):
+        return ArrowExporter(path, export_format)
+    if export_format == 'packed':
+        return PackedExporter(path)
+    raise ValueError("%s is not a supported export format" % export_format)
+
+
+def read_packed(infile):
+    """Read links from a binary file in the packed format, block by block"""
+    if infile.read(len(PACKED_MAGIC)) != PACKED_MAGIC:
+        raise ValueError("Not a packed link export")
+
+    while True:
+        header = infile.read(BLOCK_LENGTH.size)
+        if not header:
+            return
+        if len(header) < BLOCK_LENGTH.size:
+            raise ValueError("Truncated packed link export")
+
+        length, = BLOCK_LENGTH.unpack(header)
+        block = infile.read(length)
+        if len(block) < length:
+            raise ValueError("Truncated packed link export")
+
+        columns = json.loads(zlib.decompress(block).decode('utf-8'))
+        fields = list(columns)
+        for values in zip(*(columns[field] for field in fields)):
+            yield dict(zip(fields, values))
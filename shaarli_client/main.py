@@ -1,15 +1,252 @@
 """shaarli-client main CLI entrypoint"""
+import io
+import json
 import logging
 import sys
 from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from copy import copy
 
-from .client import ShaarliV1Client
-from .config import InvalidConfiguration, get_credentials
-from .utils import format_response, generate_all_endpoints_parsers, write_output
+from .client import (DiskResponseCache, Instrumentation, MetricsExporter,
+                     RateLimiter, RetryPolicy, ShaarliV1Client)
+from .client.cache import default_cache_path
+from .client.deadline import DEFAULT_TIMEOUT, DeadlineExceeded
+from .client.metrics import EXPORT_FORMATS, format_metrics
+from .client.v1 import check_positive_integer
+from .commands import COMMANDS, get_deadline, get_mirror_path
+from .config import (InvalidConfiguration, get_credentials, get_instances,
+                     get_setting, get_settings)
+from .mirror import LinkMirror
+from .utils import (OUTPUT_FORMATS, LazyArgumentParser, format_items,
+                    format_json, format_response_stream,
+                    generate_all_commands_parsers,
+                    generate_all_endpoints_parsers, write_stream)
 
 
-def main():
-    """Main CLI entrypoint"""
+def generate_output(client, args):
+    """Run the selected command, and generate its output chunk by chunk"""
+    if args.endpoint_name in COMMANDS:
+        return COMMANDS[args.endpoint_name]['function'](client, args)
+
+    deadline = get_deadline(args)
+
+    if getattr(args, 'paginate', False) or getattr(args, 'parallel', 1) > 1:
+        params = {
+            param: getattr(args, param)
+            for param in client.endpoints['get-links']['params']
+        }
+        return format_items(
+            args.format,
+            client.iter_links(params,
+                              page_size=args.page_size,
+                              parallel=args.parallel,
+                              deadline=deadline)
+        )
+
+    # measured responses are downloaded at once, to time the download
+    return format_response_stream(
+        args.format,
+        client.request(args, stream=not getattr(args, 'timings', False),
+                       deadline=deadline)
+    )
+
+
+def generate_local_output(mirror, args):
+    """Answer a read-only request from a local mirror, chunk by chunk"""
+    if args.endpoint_name in COMMANDS:
+        command = COMMANDS[args.endpoint_name]
+        if not command.get('local') and not command.get('mirror'):
+            raise ValueError(
+                "%s is not available for local mirrors" % args.endpoint_name
+            )
+        return command['function'](mirror, args)
+
+    data = mirror.request(args)
+
+    if isinstance(data, dict):
+        return [format_json(args.format, data)]
+    return format_items(args.format, data)
+
+
+def get_retry_policy(args, settings):
+    """Build the retry policy from CLI arguments and the configuration"""
+    return RetryPolicy(
+        max_attempts=get_setting(args, settings, 'max_attempts', int, 3),
+        backoff=get_setting(args, settings, 'backoff', float, 0.5),
+        max_backoff=get_setting(args, settings, 'max_backoff', float, 30),
+    )
+
+
+def get_rate_limiter(args, settings):
+    """Build the rate limiter from CLI arguments and the configuration"""
+    return RateLimiter(
+        max_rps=get_setting(args, settings, 'max_rps', float),
+        max_concurrency=get_setting(args, settings, 'max_concurrency', int),
+    )
+
+
+def get_timeout(args, settings):
+    """Get the (connect, read) timeout from CLI arguments and configuration"""
+    return (
+        get_setting(args, settings, 'connect_timeout', float,
+                    DEFAULT_TIMEOUT[0]),
+        get_setting(args, settings, 'read_timeout', float,
+                    DEFAULT_TIMEOUT[1]),
+    )
+
+
+def print_timings(metrics):
+    """Print the measures of a request to the standard error"""
+    print(format_metrics(metrics), file=sys.stderr)
+
+
+def check_metrics_format(value):
+    """Ensure a value is a supported metrics format"""
+    if value not in EXPORT_FORMATS:
+        raise ValueError("%s is not a supported metrics format" % value)
+    return value
+
+
+def get_metrics_exporter(args, settings):
+    """Build the metrics exporter from CLI arguments and the configuration"""
+    path = get_setting(args, settings, 'metrics_file', str)
+    if path is None:
+        return None
+
+    return MetricsExporter(
+        path,
+        get_setting(args, settings, 'metrics_format', check_metrics_format,
+                    'prometheus')
+    )
+
+
+def create_client(credentials, args, settings, cache=None, hooks=()):
+    """Build the client of an instance, with its own session"""
+    url, secret = credentials
+    parallel = getattr(args, 'parallel', 1)
+    concurrency = getattr(args, 'concurrency', 1)
+
+    return ShaarliV1Client(url, secret,
+                           pool_maxsize=max(10, parallel, concurrency),
+                           verify_certs=not args.insecure,
+                           cache=cache,
+                           retry_policy=get_retry_policy(args, settings),
+                           rate_limiter=get_rate_limiter(args, settings),
+                           timeout=get_timeout(args, settings),
+                           instrumentation=Instrumentation(
+                               post_request=hooks
+                           ) if hooks else None)
+
+
+def decode_output(output):
+    """Decode the JSON, or JSON Lines, output of a request
+
+    Other outputs, e.g. CSV, are returned as text.
+    """
+    try:
+        return json.loads(output)
+    except ValueError:
+        pass
+
+    try:
+        return [json.loads(line) for line in output.splitlines()
+                if line.strip()]
+    except ValueError:
+        return output
+
+
+def run_instance(args, cache=None, hooks=()):
+    """Run the selected request against an instance, decoding its output"""
+    if args.local or COMMANDS.get(args.endpoint_name, {}).get('local'):
+        with LinkMirror(get_mirror_path(args)) as mirror:
+            return decode_output(''.join(generate_local_output(mirror, args)))
+
+    credentials = get_credentials(args)
+    settings = get_settings(args)
+    # read by commands to start their deadline
+    args.deadline = get_setting(args, settings, 'deadline', float)
+
+    with create_client(credentials, args, settings, cache,
+                       hooks) as client:
+        return decode_output(''.join(generate_output(client, args)))
+
+
+def fan_out(args, instances, cache=None, hooks=()):
+    """Run the selected request against several instances concurrently
+
+    Each instance is requested with its own credentials, settings and
+    connection pool. Errors are reported per instance, so that an instance
+    being down does not prevent getting the results of the others.
+
+    Returns the result of each instance, in order, tagged by alias.
+    """
+    command = COMMANDS.get(args.endpoint_name, {})
+    if command.get('single_instance'):
+        raise ValueError(
+            "%s cannot be used with --instances and --all-instances"
+            % args.endpoint_name
+        )
+    if args.url or args.secret:
+        raise ValueError("--url and --secret cannot be used with --instances"
+                         " and --all-instances")
+    if args.mirror:
+        raise ValueError("--mirror cannot be used with --instances and"
+                         " --all-instances")
+    if getattr(args, 'journal', None):
+        # journal entries do not tell which instance they were applied to
+        raise ValueError("--journal cannot be used with --instances and"
+                         " --all-instances")
+
+    # input files are read once, and replayed to each instance
+    infile = getattr(args, 'infile', None)
+    data = infile.read() if hasattr(infile, 'read') else None
+
+    def run(instance):
+        instance_args = copy(args)
+        instance_args.instance = instance
+        # outputs are decoded, then merged in the selected format
+        instance_args.format = 'json'
+        if data is not None:
+            instance_args.infile = io.StringIO(data)
+
+        try:
+            output = run_instance(instance_args, cache, hooks)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.error("%s: %s", instance, exc)
+            return {'instance': instance, 'output': None, 'error': str(exc)}
+        return {'instance': instance, 'output': output, 'error': None}
+
+    with ThreadPoolExecutor(max_workers=len(instances)) as executor:
+        return list(executor.map(run, instances))
+
+
+def add_pagination_arguments(parser):
+    """Add link pagination arguments to the get-links subparser"""
+    parser.add_argument(
+        '--paginate',
+        action='store_true',
+        help="Retrieve links page by page, writing them as they arrive"
+    )
+    parser.add_argument(
+        '--page-size',
+        type=check_positive_integer,
+        default=100,
+        help="Number of links to retrieve per page when paginating"
+    )
+    parser.add_argument(
+        '--parallel',
+        type=check_positive_integer,
+        default=1,
+        help="Number of pages to retrieve concurrently (implies --paginate)"
+    )
+
+
+def generate_parser():
+    """Generate the CLI argument parser
+
+    The arguments of endpoint and command subparsers are only added when the
+    matching endpoint or command is selected.
+    """
     parser = ArgumentParser()
     parser.add_argument(
         '-c',
@@ -21,6 +258,16 @@ def main():
         '--instance',
         help="Shaarli instance (configuration alias)"
     )
+    parser.add_argument(
+        '--instances',
+        help="Comma-separated Shaarli instances (configuration aliases) to"
+             " run the request against concurrently"
+    )
+    parser.add_argument(
+        '--all-instances',
+        action='store_true',
+        help="Run the request against all configured instances concurrently"
+    )
     parser.add_argument(
         '-u',
         '--url',
@@ -34,7 +281,7 @@ def main():
     parser.add_argument(
         '-f',
         '--format',
-        choices=['json', 'pprint', 'text'],
+        choices=OUTPUT_FORMATS,
         default='pprint',
         help="Output formatting"
     )
@@ -48,19 +295,155 @@ def main():
         action='store_true',
         help="Bypass API SSL/TLS certificate verification"
     )
+    parser.add_argument(
+        '--local',
+        action='store_true',
+        help="Answer read-only requests from the local mirror (see: sync)"
+    )
+    parser.add_argument(
+        '--mirror',
+        help="Local mirror database file"
+    )
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help="Cache responses to GET requests between invocations"
+    )
+    parser.add_argument(
+        '--cache-ttl',
+        type=check_positive_integer,
+        default=60,
+        help="Number of seconds during which cached responses are used"
+    )
+    parser.add_argument(
+        '--cache-file',
+        help="Response cache database file"
+    )
+    parser.add_argument(
+        '--max-attempts',
+        type=int,
+        help="Number of times a request is sent before giving up"
+             " (default: 3)"
+    )
+    parser.add_argument(
+        '--backoff',
+        type=float,
+        help="Base delay between attempts, in seconds (default: 0.5)"
+    )
+    parser.add_argument(
+        '--max-backoff',
+        type=float,
+        help="Maximum delay between attempts, in seconds (default: 30)"
+    )
+    parser.add_argument(
+        '--max-rps',
+        type=float,
+        help="Maximum number of requests per second (default: unlimited)"
+    )
+    parser.add_argument(
+        '--max-concurrency',
+        type=int,
+        help="Maximum number of concurrent requests (default: unlimited)"
+    )
+    parser.add_argument(
+        '--connect-timeout',
+        type=float,
+        help="Number of seconds to wait for a connection to the instance"
+             " (default: %g)" % DEFAULT_TIMEOUT[0]
+    )
+    parser.add_argument(
+        '--read-timeout',
+        type=float,
+        help="Number of seconds to wait for data from the instance"
+             " (default: %g)" % DEFAULT_TIMEOUT[1]
+    )
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        help="Number of seconds after which the command is cancelled,"
+             " reporting partial results (default: none)"
+    )
+    parser.add_argument(
+        '--timings',
+        action='store_true',
+        help="Print the timings of every request to the standard error"
+    )
+    parser.add_argument(
+        '--metrics-file',
+        help="File to export request metrics to"
+    )
+    parser.add_argument(
+        '--metrics-format',
+        choices=EXPORT_FORMATS,
+        help="Format of exported metrics (default: prometheus)"
+    )
 
     subparsers = parser.add_subparsers(
         dest='endpoint_name',
-        help="REST API endpoint"
+        help="REST API endpoint",
+        parser_class=LazyArgumentParser
+    )
+
+    endpoints_parsers = generate_all_endpoints_parsers(
+        subparsers,
+        ShaarliV1Client.endpoints
     )
+    endpoints_parsers['get-links'].defer(add_pagination_arguments)
+
+    generate_all_commands_parsers(subparsers, COMMANDS)
 
-    generate_all_endpoints_parsers(subparsers, ShaarliV1Client.endpoints)
+    return parser
 
+
+def main():
+    """Main CLI entrypoint"""
+    parser = generate_parser()
     args = parser.parse_args()
 
     try:
-        url, secret = get_credentials(args)
-        response = ShaarliV1Client(url, secret).request(args)
+        instances = get_instances(args)
+        if not instances and (args.local or COMMANDS.get(
+                args.endpoint_name, {}).get('local')):
+            with LinkMirror(get_mirror_path(args)) as mirror:
+                write_stream(args.outfile, generate_local_output(mirror, args))
+            return
+
+        # credentials are checked before any file is opened
+        credentials = None if instances else get_credentials(args)
+        settings = get_settings(args)
+        exporter = cache = None
+
+        try:
+            exporter = get_metrics_exporter(args, settings)
+            hooks = [hook
+                     for hook in (print_timings if args.timings else None,
+                                  exporter)
+                     if hook is not None]
+            if args.cache:
+                cache = DiskResponseCache(
+                    args.cache_file or default_cache_path(),
+                    ttl=args.cache_ttl
+                )
+
+            if instances:
+                write_stream(args.outfile, format_items(
+                    args.format, fan_out(args, instances, cache, hooks)
+                ))
+                return
+
+            # read by commands to start their deadline
+            args.deadline = get_setting(args, settings, 'deadline', float)
+            with create_client(credentials, args, settings, cache,
+                               hooks) as client:
+                write_stream(args.outfile, generate_output(client, args))
+        finally:
+            if cache is not None:
+                cache.close()
+            if exporter is not None:
+                exporter.close()
+    except DeadlineExceeded as exc:
+        logging.error(exc)
+        sys.exit(1)
     except InvalidConfiguration as exc:
         logging.error(exc)
         parser.print_help()
@@ -70,12 +453,6 @@ def main():
         parser.print_help()
         sys.exit(1)
 
-    output = format_response(args.format, response)
-    if not args.outfile:
-        print(output)
-    else:
-        write_output(args.outfile, output)
-
 
 if __name__ == "__main__":
     sys.exit(main())
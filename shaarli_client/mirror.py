@@ -0,0 +1,558 @@
+"""Local mirror of a Shaarli instance's links and tags"""
+import json
+import math
+import os
+from itertools import islice
+from pathlib import Path
+
+from .client.deadline import DeadlineExceeded
+from .search import LinkFilter, score_link, tokenize
+from .utils import parse_datetime
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY,
+    url TEXT,
+    private INTEGER NOT NULL DEFAULT 0,
+    created REAL,
+    updated TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS links_created ON links (created DESC, id DESC);
+
+CREATE TABLE IF NOT EXISTS link_tags (
+    link_id INTEGER NOT NULL,
+    tag TEXT NOT NULL,
+    tag_lower TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS link_tags_link ON link_tags (link_id);
+CREATE INDEX IF NOT EXISTS link_tags_tag ON link_tags (tag);
+CREATE INDEX IF NOT EXISTS link_tags_tag_lower ON link_tags (tag_lower);
+
+CREATE TABLE IF NOT EXISTS metadata (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT PRIMARY KEY
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS search_postings (
+    term TEXT NOT NULL,
+    link_id INTEGER NOT NULL,
+    PRIMARY KEY (term, link_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS search_postings_link ON search_postings (link_id);
+
+CREATE TEMP TABLE IF NOT EXISTS search_candidates (
+    link_id INTEGER PRIMARY KEY
+);
+'''
+
+SEARCH_INDEX_VERSION = '1'
+
+# words of the index matching a search term, beyond which the index is not
+# used to narrow the search down
+MAX_EXPANDED_TERMS = 1000
+
+READ_ONLY_ENDPOINTS = ('get-info', 'get-links', 'get-tags', 'get-tag')
+
+
+def default_mirror_path(instance=None):
+    """Get the default location of the mirror of an instance
+
+    Mirrors are stored in the user's data directory, one file per configured
+    instance.
+    """
+    data_home = os.environ.get('XDG_DATA_HOME') \
+        or os.path.join(os.path.expanduser('~'), '.local', 'share')
+
+    return Path(data_home) / 'shaarli' / (
+        'mirror-%s.sqlite' % instance if instance else 'mirror.sqlite'
+    )
+
+
+def _visibility_clause(visibility):
+    """Build an SQL condition restricting links to a given visibility"""
+    if visibility in (None, 'all'):
+        return ('1', [])
+    if visibility == 'private':
+        return ('links.private = ?', [1])
+    if visibility == 'public':
+        return ('links.private = ?', [0])
+    raise ValueError("Invalid visibility: %s" % visibility)
+
+
+class LinkMirror:
+    """Local SQLite mirror of a Shaarli instance's links and tags
+
+    The mirror is populated from the REST API with ``sync``, and answers
+    read-only queries with the same parameters as the matching endpoints.
+    """
+
+    def __init__(self, path):
+        """Open, and create if needed, a mirror database"""
+        self.path = str(path)
+
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+
+        import sqlite3  # pylint: disable=import-outside-toplevel
+
+        self.connection = sqlite3.connect(self.path)
+        self.connection.executescript(SCHEMA)
+
+        if self.get_metadata('search_index') != SEARCH_INDEX_VERSION:
+            self.rebuild_index()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the mirror database"""
+        self.connection.close()
+
+    def get_metadata(self, key, default=None):
+        """Get a metadata value"""
+        row = self.connection.execute(
+            'SELECT value FROM metadata WHERE key = ?', (key,)
+        ).fetchone()
+        return default if row is None else row[0]
+
+    def set_metadata(self, key, value):
+        """Set a metadata value"""
+        self.connection.execute(
+            'INSERT OR REPLACE INTO metadata (key, value) VALUES (?, ?)',
+            (key, value)
+        )
+
+    def store_link(self, link):
+        """Insert or update a link
+
+        Returns 'added', 'updated' or 'unchanged'.
+        """
+        row = self.connection.execute(
+            'SELECT updated FROM links WHERE id = ?', (link['id'],)
+        ).fetchone()
+
+        updated = link.get('updated') or ''
+        if row is not None and row[0] == updated:
+            return 'unchanged'
+
+        created = parse_datetime(link.get('created'))
+
+        self.connection.execute(
+            'INSERT OR REPLACE INTO links'
+            ' (id, url, private, created, updated, data)'
+            ' VALUES (?, ?, ?, ?, ?, ?)',
+            (
+                link['id'],
+                link.get('url'),
+                1 if link.get('private') else 0,
+                created.timestamp() if created else None,
+                updated,
+                json.dumps(link),
+            )
+        )
+        self.connection.execute(
+            'DELETE FROM link_tags WHERE link_id = ?', (link['id'],)
+        )
+        self.connection.executemany(
+            'INSERT INTO link_tags (link_id, tag, tag_lower) VALUES (?, ?, ?)',
+            [
+                (link['id'], tag, tag.lower())
+                for tag in set(link.get('tags') or [])
+            ]
+        )
+        self._index_link(link)
+
+        return 'added' if row is None else 'updated'
+
+    def load_links(self, links):
+        """Insert or update links, e.g. read from a get-links dump
+
+        Returns a dict counting added, updated and unchanged links.
+        """
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0}
+
+        for count, link in enumerate(links, 1):
+            stats[self.store_link(link)] += 1
+            if count % 1000 == 0:
+                self.connection.commit()
+
+        self.connection.commit()
+        return stats
+
+    def _index_link(self, link):
+        """Update the search index entries of a link"""
+        terms = set(tokenize(LinkFilter.link_content(link)))
+
+        self.connection.execute(
+            'DELETE FROM search_postings WHERE link_id = ?', (link['id'],)
+        )
+        self.connection.executemany(
+            'INSERT OR IGNORE INTO search_terms (term) VALUES (?)',
+            [(term,) for term in terms]
+        )
+        self.connection.executemany(
+            'INSERT INTO search_postings (term, link_id) VALUES (?, ?)',
+            [(term, link['id']) for term in terms]
+        )
+
+    def rebuild_index(self):
+        """Index all links of the mirror for full-text search"""
+        self.connection.execute('DELETE FROM search_postings')
+        self.connection.execute('DELETE FROM search_terms')
+
+        cursor = self.connection.execute('SELECT data FROM links')
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for data, in rows:
+                self._index_link(json.loads(data))
+
+        self.set_metadata('search_index', SEARCH_INDEX_VERSION)
+        self.connection.commit()
+
+    def delete_links(self, link_ids):
+        """Delete links from the mirror"""
+        self.connection.executemany(
+            'DELETE FROM links WHERE id = ?', [(i,) for i in link_ids]
+        )
+        self.connection.executemany(
+            'DELETE FROM link_tags WHERE link_id = ?', [(i,) for i in link_ids]
+        )
+        self.connection.executemany(
+            'DELETE FROM search_postings WHERE link_id = ?',
+            [(i,) for i in link_ids]
+        )
+
+    def links_by_id(self, link_ids):
+        """Get links by ID
+
+        Returns a dict mapping the IDs of the links found to the links.
+        """
+        links = {}
+        for link_id in link_ids:
+            row = self.connection.execute(
+                'SELECT data FROM links WHERE id = ?', (link_id,)
+            ).fetchone()
+            if row is not None:
+                links[link_id] = json.loads(row[0])
+        return links
+
+    def _delete_unseen(self, seen):
+        """Delete the links not in ``seen``, returning their count"""
+        deleted = [
+            link_id
+            for link_id, in self.connection.execute('SELECT id FROM links')
+            if link_id not in seen
+        ]
+        self.delete_links(deleted)
+        return len(deleted)
+
+    def sync(self, client, full=False, page_size=100, parallel=1,
+             deadline=None):
+        """Synchronize the mirror with a Shaarli instance
+
+        The first synchronization retrieves all links. Subsequent ones are
+        incremental: links are retrieved from the newest to the oldest, and
+        retrieval stops after a full page of links whose ``updated`` date is
+        already known. As they only see recent links, incremental updates do
+        not detect deleted links, nor changes to old links beyond that page;
+        a ``full`` synchronization does.
+
+        Returns a dict counting added, updated, unchanged and deleted links.
+
+        When ``deadline`` (a ``Deadline``) is over, the links retrieved so far
+        are kept, and ``DeadlineExceeded`` is raised with the partial
+        statistics in its ``stats`` attribute.
+        """
+        # pylint: disable=too-many-arguments
+        known_uri = self.get_metadata('uri')
+        if known_uri is not None and known_uri != client.uri:
+            raise ValueError(
+                "%s is a mirror of another instance: %s"
+                % (self.path, known_uri)
+            )
+
+        response = client.get_info()
+        response.raise_for_status()
+
+        full = full or self.get_metadata('synced') is None
+        stats = {'added': 0, 'updated': 0, 'unchanged': 0, 'deleted': 0}
+        seen = set()
+        consecutive_unchanged = 0
+
+        links = client.iter_links(
+            {},
+            page_size=page_size,
+            parallel=parallel if full else 1,
+            deadline=deadline
+        )
+
+        try:
+            for link in links:
+                status = self.store_link(link)
+                stats[status] += 1
+                seen.add(link['id'])
+
+                if len(seen) % page_size == 0:
+                    self.connection.commit()
+
+                if status != 'unchanged':
+                    consecutive_unchanged = 0
+                    continue
+
+                consecutive_unchanged += 1
+                if not full and consecutive_unchanged >= page_size:
+                    break
+        except DeadlineExceeded as exc:
+            self.connection.commit()
+            exc.stats = stats
+            raise
+        finally:
+            links.close()
+
+        if full:
+            stats['deleted'] = self._delete_unseen(seen)
+
+        self.set_metadata('uri', client.uri)
+        self.set_metadata('info', response.text)
+        self.set_metadata('synced', 'yes')
+        self.connection.commit()
+
+        return stats
+
+    def get_info(self):
+        """Get information about the mirrored instance
+
+        This is the information retrieved during the last synchronization.
+        """
+        info = self.get_metadata('info')
+        if info is None:
+            raise ValueError("%s has not been synchronized" % self.path)
+        return json.loads(info)
+
+    def _term_candidates(self, term, vocabulary):
+        """Find the links that may contain a search term, using the index
+
+        Every word of the search term is contained in a word of the links
+        that contain the term; the links are then checked by the caller.
+
+        Returns a set of link IDs, or None if the index cannot narrow the
+        search down.
+        """
+        candidates = None
+
+        for token in sorted(set(tokenize(term)), key=len, reverse=True):
+            words = [word for word in vocabulary if token in word]
+            if len(words) > MAX_EXPANDED_TERMS:
+                continue
+
+            links = set()
+            for start in range(0, len(words), 500):
+                chunk = words[start:start + 500]
+                links.update(
+                    link_id for link_id, in self.connection.execute(
+                        'SELECT link_id FROM search_postings'
+                        ' WHERE term IN (%s)' % ', '.join('?' * len(chunk)),
+                        chunk
+                    )
+                )
+
+            candidates = links if candidates is None else candidates & links
+            if not candidates:
+                break
+
+        return candidates
+
+    def _search_candidates(self, link_filter):
+        """Find the links that may match search terms, using the index
+
+        Returns a set of link IDs (or None if the index cannot narrow the
+        search down), and the inverse document frequency of each term.
+        """
+        total, = self.connection.execute(
+            'SELECT COUNT(*) FROM links'
+        ).fetchone()
+        vocabulary = [
+            term for term, in self.connection.execute(
+                'SELECT term FROM search_terms'
+            )
+        ]
+
+        candidates = None
+        weights = {}
+
+        for term in link_filter.terms:
+            term_candidates = self._term_candidates(term, vocabulary)
+            frequency = total if term_candidates is None \
+                else len(term_candidates)
+            weights[term] = math.log(1 + total / max(frequency, 1))
+
+            if term_candidates is not None:
+                candidates = term_candidates if candidates is None \
+                    else candidates & term_candidates
+
+        return (candidates, weights)
+
+    def _filtered_links(self, link_filter, visibility, weights=None):
+        """Iterate over links matching a filter, ordered by creation date
+
+        If ``weights`` is a dict, it is filled with the weight of each search
+        term.
+        """
+        condition, values = _visibility_clause(visibility)
+
+        # narrow the query down with plain tags and the search index,
+        # before checking links one by one
+        for tag in link_filter.tag_terms:
+            if '*' not in tag:
+                condition += ' AND links.id IN (SELECT link_id FROM' \
+                             ' link_tags WHERE tag_lower = ?)'
+                values.append(tag)
+
+        if link_filter.terms:
+            candidates, term_weights = self._search_candidates(link_filter)
+            if weights is not None:
+                weights.update(term_weights)
+
+            if candidates is not None:
+                self.connection.execute('DELETE FROM search_candidates')
+                self.connection.executemany(
+                    'INSERT INTO search_candidates (link_id) VALUES (?)',
+                    [(link_id,) for link_id in candidates]
+                )
+                condition += ' AND links.id IN' \
+                             ' (SELECT link_id FROM search_candidates)'
+
+        rows = self.connection.execute(
+            'SELECT data FROM links WHERE %s'
+            ' ORDER BY created DESC, id DESC' % condition,
+            values
+        )
+
+        for data, in rows:
+            link = json.loads(data)
+            if link_filter.match(link):
+                yield link
+
+    def iter_links(self, params=None):
+        """Iterate over a collection of links ordered by creation date
+
+        Accepts the same parameters as the ``get-links`` endpoint.
+        """
+        params = params or {}
+        link_filter = LinkFilter(params.get('searchterm'),
+                                 params.get('searchtags'))
+        offset = int(params.get('offset') or 0)
+        limit = params.get('limit') or 20
+        limit = None if limit == 'all' else int(limit)
+
+        if not link_filter:
+            condition, values = _visibility_clause(params.get('visibility'))
+            rows = self.connection.execute(
+                'SELECT data FROM links WHERE %s'
+                ' ORDER BY created DESC, id DESC LIMIT ? OFFSET ?' % condition,
+                values + [-1 if limit is None else limit, offset]
+            )
+            return (json.loads(data) for data, in rows)
+
+        return islice(
+            self._filtered_links(link_filter, params.get('visibility')),
+            offset,
+            None if limit is None else offset + limit
+        )
+
+    def search(self, params=None):
+        """Search links, ranked by relevance
+
+        Accepts the same parameters as the ``get-links`` endpoint; matching
+        links are ordered by decreasing relevance to the search terms, then
+        by creation date.
+        """
+        params = params or {}
+        link_filter = LinkFilter(params.get('searchterm'),
+                                 params.get('searchtags'))
+        offset = int(params.get('offset') or 0)
+        limit = params.get('limit') or 20
+        limit = None if limit == 'all' else int(limit)
+
+        weights = {}
+        links = list(self._filtered_links(link_filter,
+                                          params.get('visibility'),
+                                          weights))
+
+        scores = [
+            -score_link(link, link_filter.terms, weights)
+            for link in links
+        ]
+        ranking = sorted(range(len(links)), key=scores.__getitem__)
+
+        return [
+            links[index]
+            for index in ranking[offset:None if limit is None
+                                 else offset + limit]
+        ]
+
+    def get_tags(self, params=None):
+        """Get tags and their number of occurrences
+
+        Accepts the same parameters as the ``get-tags`` endpoint.
+        """
+        params = params or {}
+        offset = int(params.get('offset') or 0)
+        limit = params.get('limit') or 'all'
+        condition, values = _visibility_clause(params.get('visibility'))
+
+        rows = self.connection.execute(
+            'SELECT tag, COUNT(*) AS occurrences FROM link_tags'
+            ' JOIN links ON links.id = link_tags.link_id'
+            ' WHERE %s GROUP BY tag'
+            ' ORDER BY occurrences DESC, tag_lower ASC, tag ASC'
+            ' LIMIT ? OFFSET ?' % condition,
+            values + [-1 if limit == 'all' else int(limit), offset]
+        )
+        return [{'name': name, 'occurrences': count} for name, count in rows]
+
+    def get_tag(self, name):
+        """Get a single tag and its number of occurrences"""
+        count, = self.connection.execute(
+            'SELECT COUNT(*) FROM link_tags WHERE tag = ?', (name,)
+        ).fetchone()
+
+        if not count:
+            raise ValueError("Tag not found: %s" % name)
+
+        return {'name': name, 'occurrences': count}
+
+    def request(self, args):
+        """Answer a read-only request from an Argparse Namespace
+
+        Returns a dict, or an iterator of dicts for collections.
+        """
+        if args.endpoint_name not in READ_ONLY_ENDPOINTS:
+            raise ValueError(
+                "%s is not available for local mirrors" % args.endpoint_name
+            )
+
+        if args.endpoint_name == 'get-info':
+            return self.get_info()
+        if args.endpoint_name == 'get-tag':
+            return self.get_tag(args.resource)
+
+        params = {
+            param: getattr(args, param, None)
+            for param in ('offset', 'limit', 'searchterm', 'searchtags',
+                          'visibility')
+        }
+
+        if args.endpoint_name == 'get-tags':
+            return iter(self.get_tags(params))
+        return self.iter_links(params)
@@ -0,0 +1,219 @@
+"""Compact models of links and tags, as returned by the REST API"""
+import sys
+
+from .utils import parse_datetime
+
+LINK_FIELDS = ('id', 'url', 'shorturl', 'title', 'description', 'tags',
+               'private', 'created', 'updated')
+
+
+class Tag:
+    """A tag, and its number of occurrences"""
+
+    __slots__ = ('name', 'occurrences')
+
+    def __init__(self, name, occurrences=0):
+        """Tag constructor"""
+        self.name = sys.intern(name)
+        self.occurrences = occurrences
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a tag from its REST API representation"""
+        return cls(data['name'], data.get('occurrences', 0))
+
+    def to_dict(self):
+        """Get the REST API representation of the tag"""
+        return {'name': self.name, 'occurrences': self.occurrences}
+
+    def __eq__(self, other):
+        if not isinstance(other, Tag):
+            return NotImplemented
+        return (self.name, self.occurrences) == \
+            (other.name, other.occurrences)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Tag(%r, %r)' % (self.name, self.occurrences)
+
+
+class Link:
+    """A link or note
+
+    Links are meant to be held by the hundred thousands: attributes are
+    stored in slots, tag names are interned so that links share them, and
+    dates are only parsed when read.
+    """
+
+    # pylint: disable=too-many-instance-attributes
+
+    __slots__ = ('id', 'url', 'shorturl', 'title', 'description', 'tags',
+                 'private', '_created', '_updated')
+
+    def __init__(self, id,  # pylint: disable=redefined-builtin,invalid-name
+                 url, shorturl=None, title=None, description=None, tags=(),
+                 private=False, created=None, updated=None):
+        """Link constructor
+
+        ``created`` and ``updated`` are either ISO 8601 strings, as returned
+        by the REST API, or datetimes.
+        """
+        # pylint: disable=too-many-arguments
+        self.id = id  # pylint: disable=invalid-name
+        self.url = url
+        self.shorturl = shorturl
+        self.title = title
+        self.description = description
+        self.tags = tuple(sys.intern(tag) for tag in tags or ())
+        self.private = bool(private)
+        self._created = created or None
+        self._updated = updated or None
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a link from its REST API representation"""
+        return cls(**{
+            field: data[field] for field in LINK_FIELDS if field in data
+        })
+
+    def to_dict(self):
+        """Get the REST API representation of the link"""
+        data = {}
+        for field in LINK_FIELDS:
+            if field in ('created', 'updated'):
+                value = getattr(self, '_' + field)
+                if value is not None and not isinstance(value, str):
+                    value = value.isoformat()
+            else:
+                value = getattr(self, field)
+            data[field] = list(value) if field == 'tags' else value
+        return data
+
+    @property
+    def created(self):
+        """Creation date, as a datetime, or None"""
+        if isinstance(self._created, str):
+            self._created = parse_datetime(self._created)
+        return self._created
+
+    @property
+    def updated(self):
+        """Last update date, as a datetime, or None"""
+        if isinstance(self._updated, str):
+            self._updated = parse_datetime(self._updated)
+        return self._updated
+
+    def __eq__(self, other):
+        if not isinstance(other, Link):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'Link(%r, %r)' % (self.id, self.url)
+
+
+class LinkCollection:
+    """A set of links, indexed by ID, URL and tag
+
+    Links are kept in insertion order; adding a link with the ID of a link
+    already in the collection replaces it.
+    """
+
+    def __init__(self, links=()):
+        """Collection constructor, from ``Link`` objects"""
+        self._links = {}
+        # URLs are mostly unique: a list is only used for duplicates
+        self._by_url = {}
+        self._by_tag = {}
+        self.extend(links)
+
+    @classmethod
+    def from_dicts(cls, links):
+        """Build a collection from REST API representations of links
+
+        ``links`` can be any iterable, e.g. ``ShaarliV1Client.iter_links()``;
+        it is consumed one link at a time.
+        """
+        return cls(Link.from_dict(link) for link in links)
+
+    def __len__(self):
+        return len(self._links)
+
+    def __iter__(self):
+        return iter(self._links.values())
+
+    def __contains__(self, link_id):
+        return link_id in self._links
+
+    def __getitem__(self, link_id):
+        return self._links[link_id]
+
+    def get(self, link_id, default=None):
+        """Get a link by ID"""
+        return self._links.get(link_id, default)
+
+    def add(self, link):
+        """Add a link, or replace the link with the same ID"""
+        if link.id in self._links:
+            self.remove(link.id)
+
+        self._links[link.id] = link
+        same_url = self._by_url.setdefault(link.url, link)
+        if same_url is not link:
+            if isinstance(same_url, Link):
+                same_url = self._by_url[link.url] = [same_url]
+            same_url.append(link)
+        for tag in set(link.tags):
+            self._by_tag.setdefault(tag, []).append(link)
+
+    def extend(self, links):
+        """Add several links"""
+        for link in links:
+            self.add(link)
+
+    def remove(self, link_id):
+        """Remove a link by ID, returning it"""
+        link = self._links.pop(link_id)
+
+        same_url = self._by_url[link.url]
+        if isinstance(same_url, Link):
+            del self._by_url[link.url]
+        else:
+            self._unindex(self._by_url, link.url, link)
+        for tag in set(link.tags):
+            self._unindex(self._by_tag, tag, link)
+
+        return link
+
+    @staticmethod
+    def _unindex(index, key, link):
+        """Remove a link from an index entry"""
+        links = index[key]
+        # compare identities, as equal links may be distinct objects
+        del links[next(
+            position for position, item in enumerate(links) if item is link
+        )]
+        if not links:
+            del index[key]
+
+    def by_url(self, url):
+        """Get the links with a given URL"""
+        same_url = self._by_url.get(url, ())
+        return [same_url] if isinstance(same_url, Link) else list(same_url)
+
+    def by_tag(self, tag):
+        """Get the links with a given tag (case-sensitive)"""
+        return list(self._by_tag.get(tag, ()))
+
+    def tags(self):
+        """Get the tags of the collection, as ``get-tags`` does
+
+        Tags are ordered by decreasing number of occurrences, then by name.
+        """
+        return sorted(
+            (Tag(name, len(links)) for name, links in self._by_tag.items()),
+            key=lambda tag: (-tag.occurrences, tag.name)
+        )
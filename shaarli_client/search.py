@@ -0,0 +1,132 @@
+"""Local link search, following Shaarli's search semantics"""
+import re
+
+SEARCH_TOKEN = re.compile(r'(-?)"([^"]*)"|(\S+)')
+
+
+def split_search(search):
+    """Split a search string into included and excluded terms
+
+    Terms are separated by spaces, unless they are enclosed in double quotes,
+    and are excluded when they start with a dash. Terms are lower-cased, as
+    searches are case-insensitive.
+    """
+    included, excluded = [], []
+
+    for match in SEARCH_TOKEN.finditer(search or ''):
+        negated, phrase, word = match.groups()
+
+        if word is not None:
+            negated = word.startswith('-')
+            term = word[1:] if negated else word
+        else:
+            term = phrase
+
+        term = term.lower()
+        if not term:
+            continue
+
+        if negated:
+            excluded.append(term)
+        else:
+            included.append(term)
+
+    return (included, excluded)
+
+
+def _tag_pattern(tag):
+    """Compile a tag search term, where '*' matches any sequence"""
+    return re.compile(
+        '^%s$' % '.*'.join(re.escape(part) for part in tag.split('*'))
+    )
+
+
+class LinkFilter:
+    """Filter links with ``searchterm`` and ``searchtags`` parameters
+
+    ``searchterm`` looks for terms in the title, description, URL and tags of
+    a link, and ``searchtags`` for tags; all included terms and tags must be
+    found, and no excluded one.
+    """
+
+    def __init__(self, searchterm=None, searchtags=None):
+        """Filter constructor"""
+        self.terms, self.excluded_terms = split_search(searchterm)
+        self.tag_terms, excluded_tags = split_search(searchtags)
+        self.tags = [_tag_pattern(tag) for tag in self.tag_terms]
+        self.excluded_tags = [_tag_pattern(tag) for tag in excluded_tags]
+
+    def __bool__(self):
+        return bool(self.terms or self.excluded_terms
+                    or self.tags or self.excluded_tags)
+
+    @staticmethod
+    def link_content(link):
+        """Lower-cased searchable content of a link"""
+        return '\n'.join([
+            link.get('title') or '',
+            link.get('description') or '',
+            link.get('url') or '',
+            ' '.join(link.get('tags') or []),
+        ]).lower()
+
+    def match(self, link):
+        """Whether a link (as a dict) matches this filter"""
+        if self.tags or self.excluded_tags:
+            tags = [tag.lower() for tag in link.get('tags') or []]
+
+            for pattern in self.tags:
+                if not any(pattern.match(tag) for tag in tags):
+                    return False
+            for pattern in self.excluded_tags:
+                if any(pattern.match(tag) for tag in tags):
+                    return False
+
+        if self.terms or self.excluded_terms:
+            content = self.link_content(link)
+
+            for term in self.terms:
+                if term not in content:
+                    return False
+            for term in self.excluded_terms:
+                if term in content:
+                    return False
+
+        return True
+
+
+TOKEN = re.compile(r'\w+')
+
+# relative weight of the link fields, to rank search results
+FIELD_WEIGHTS = (
+    ('title', 3),
+    ('tags', 2),
+    ('url', 1),
+    ('description', 1),
+)
+
+
+def tokenize(text):
+    """Split a text into lower-cased words"""
+    return TOKEN.findall(text.lower())
+
+
+def score_link(link, terms, weights):
+    """Rank a link matching search terms
+
+    Each occurrence of a term counts according to the weight of the field
+    it appears in, multiplied by the weight of the term, e.g. its inverse
+    document frequency.
+    """
+    score = 0.0
+
+    for field, field_weight in FIELD_WEIGHTS:
+        value = link.get(field) or ''
+        if field == 'tags':
+            value = ' '.join(value)
+        value = value.lower()
+
+        for term in terms:
+            score += field_weight * weights.get(term, 1.0) * value.count(term)
+
+    return score
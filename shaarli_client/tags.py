@@ -0,0 +1,182 @@
+"""Bulk tag renames, merges and deletions"""
+import json
+from collections import namedtuple
+
+from .client.bulk import BulkResult, bulk_map
+
+
+class InvalidTagMapping(ValueError):
+    """Raised when a tag mapping cannot be applied"""
+
+
+class DependencyFailed(Exception):
+    """Raised when an operation depends on another one, which failed"""
+
+    def __init__(self, operation):
+        """Custom exception message"""
+        super(DependencyFailed, self).__init__(
+            "Not applied, as %s of tag '%s' failed"
+            % (operation.action, operation.tag)
+        )
+
+
+class TagOperation(namedtuple('TagOperation', ['tag', 'name', 'action'])):
+    """Rename, merge or deletion of a tag
+
+    ``tag`` is renamed to ``name``, or merged into it when it already
+    exists; it is deleted when ``name`` is None.
+    """
+
+    __slots__ = ()
+
+    def describe(self):
+        """Describe the operation, for reports"""
+        return {'action': self.action, 'tag': self.tag, 'name': self.name}
+
+    def apply(self, client):
+        """Send the request performing this operation"""
+        if self.name is None:
+            return client.delete_tag(self.tag, {})
+        return client.put_tag(self.tag, {'name': self.name})
+
+
+def read_tag_mapping(lines):
+    """Read a tag mapping, one operation per line
+
+    Each line holds a tag followed by its new name, to rename or merge it,
+    or a tag alone, to delete it; blank lines and '#' comments are skipped.
+
+    Returns a dict mapping tags to their new name, or to None.
+    """
+    mapping = {}
+
+    for number, line in enumerate(lines, start=1):
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) > 2:
+            raise InvalidTagMapping(
+                "Line %d: expected a tag and its new name, got: %s"
+                % (number, line.strip())
+            )
+
+        tag, name = fields[0], fields[1] if len(fields) == 2 else None
+        if mapping.get(tag, name) != name:
+            raise InvalidTagMapping(
+                "Line %d: conflicting operations for tag '%s'"
+                % (number, tag)
+            )
+        mapping[tag] = name
+
+    return mapping
+
+
+def read_journal(lines):
+    """Read the operations applied by previous runs from a journal"""
+    done = set()
+
+    for line in lines:
+        if line.strip():
+            entry = json.loads(line)
+            done.add((entry['tag'], entry['name']))
+
+    return done
+
+
+def plan_tag_operations(mapping, tags, done=()):
+    """Validate a tag mapping against existing tags, and order operations
+
+    ``tags`` are the names of existing tags, and ``done`` the (tag, name)
+    pairs applied by previous runs. The mapping is applied as a whole: when
+    a tag is renamed to a tag which is itself renamed or deleted, the latter
+    operation is performed first, so that renames are not chained.
+
+    Returns the operations to perform, as a list of stages which can each
+    run concurrently, and the dropped operations, as a list of
+    (operation, reason) pairs.
+    """
+    tags = set(tags)
+    operations = {}
+    dropped = []
+
+    for tag, name in mapping.items():
+        if name is None:
+            action = 'delete'
+        elif name in tags:
+            action = 'merge'
+        else:
+            action = 'rename'
+        operation = TagOperation(tag, name, action)
+
+        if (tag, name) in done:
+            dropped.append((operation, 'done'))
+        elif tag == name:
+            dropped.append((operation, 'unchanged'))
+        elif tag not in tags:
+            dropped.append((operation, 'missing'))
+        else:
+            operations[tag] = operation
+
+    stages = {}
+
+    def stage(operation, chain):
+        """Number of operations to perform before this one"""
+        if operation.tag in stages:
+            return stages[operation.tag]
+
+        dependency = operations.get(operation.name)
+        if dependency is None:
+            stages[operation.tag] = 0
+            return 0
+        if dependency.tag in chain:
+            raise InvalidTagMapping(
+                "Circular renames: %s"
+                % ' -> '.join(chain + [dependency.tag])
+            )
+
+        stages[operation.tag] = stage(dependency, chain + [dependency.tag]) \
+            + 1
+        return stages[operation.tag]
+
+    plan = []
+    for operation in operations.values():
+        index = stage(operation, [operation.tag])
+        while len(plan) <= index:
+            plan.append([])
+        plan[index].append(operation)
+
+    return (plan, dropped)
+
+
+def apply_tag_plan(client, plan, concurrency=4, journal=None, deadline=None):
+    """Apply planned tag operations, stage by stage
+
+    Yields a ``BulkResult`` for each operation, whose ``params`` is the
+    ``TagOperation``; operations depending on a failed one are not applied.
+
+    Applied operations are appended to ``journal``, if set, so that an
+    interrupted run can be resumed (see: ``read_journal``).
+    """
+    failed = set()
+    index = 0
+
+    def apply(operation):
+        if operation.name in failed:
+            raise DependencyFailed(operations[operation.name])
+        return operation.apply(client)
+
+    operations = {}
+    for stage in plan:
+        operations.update((operation.tag, operation) for operation in stage)
+
+        for result in bulk_map(apply, stage, concurrency, deadline):
+            if not result.ok:
+                failed.add(result.params.tag)
+            elif journal is not None:
+                journal.write(json.dumps({'tag': result.params.tag,
+                                          'name': result.params.name})
+                              + '\n')
+                journal.flush()
+
+            yield BulkResult(index, *result[1:])
+            index += 1
@@ -1,45 +1,468 @@
 """Utilities"""
+import codecs
+import csv
+import itertools
 import json
+import re
+import sys
+from argparse import ArgumentParser
+from datetime import datetime
 
+from .client.deadline import DeadlineExceeded
 
-def generate_endpoint_parser(subparsers, ep_name, ep_metadata):
-    """Generate a subparser and arguments from an endpoint dictionary"""
-    ep_parser = subparsers.add_parser(ep_name, help=ep_metadata['help'])
 
+class LazyArgumentParser(ArgumentParser):
+    """Argument parser whose arguments are added on first use
+
+    Functions registered with ``defer`` are called with the parser, to add
+    its arguments, right before it parses arguments or formats its help; the
+    subparsers of the commands that are not run are thus never populated.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Parser constructor"""
+        super(LazyArgumentParser, self).__init__(*args, **kwargs)
+        self._deferred = []
+
+    def defer(self, function, *args):
+        """Register a function adding arguments to this parser"""
+        self._deferred.append((function, args))
+
+    def populate(self):
+        """Add the deferred arguments to this parser"""
+        while self._deferred:
+            function, args = self._deferred.pop(0)
+            function(self, *args)
+
+    def parse_known_args(self, args=None, namespace=None):
+        """Populate this parser, then parse arguments"""
+        self.populate()
+        return super(LazyArgumentParser, self).parse_known_args(args,
+                                                                namespace)
+
+    def format_usage(self):
+        """Populate this parser, then format its usage"""
+        self.populate()
+        return super(LazyArgumentParser, self).format_usage()
+
+    def format_help(self):
+        """Populate this parser, then format its help"""
+        self.populate()
+        return super(LazyArgumentParser, self).format_help()
+
+
+def _add_arguments(parser, add_arguments, metadata):
+    """Add arguments to a parser, deferring it when the parser is lazy"""
+    if isinstance(parser, LazyArgumentParser):
+        parser.defer(add_arguments, metadata)
+    else:
+        add_arguments(parser, metadata)
+
+
+def add_endpoint_arguments(ep_parser, ep_metadata):
+    """Add the arguments of an endpoint to its subparser"""
     if ep_metadata.get('resource'):
         ep_parser.add_argument('resource', **ep_metadata.get('resource'))
 
     if not ep_metadata.get('params'):
-        return ep_parser
+        return
 
     for param, attributes in sorted(ep_metadata['params'].items()):
         ep_parser.add_argument('--%s' % param, **attributes)
 
+
+def generate_endpoint_parser(subparsers, ep_name, ep_metadata):
+    """Generate a subparser and arguments from an endpoint dictionary"""
+    ep_parser = subparsers.add_parser(ep_name, help=ep_metadata['help'])
+    _add_arguments(ep_parser, add_endpoint_arguments, ep_metadata)
     return ep_parser
 
 
 def generate_all_endpoints_parsers(subparsers, endpoints):
-    """Generate all endpoints' subparsers from an endpoints dict"""
-    for ep_name, ep_metadata in endpoints.items():
-        generate_endpoint_parser(subparsers, ep_name, ep_metadata)
+    """Generate all endpoints' subparsers from an endpoints dict
+
+    Returns a dict mapping endpoint names to their subparser.
+    """
+    return {
+        ep_name: generate_endpoint_parser(subparsers, ep_name, ep_metadata)
+        for ep_name, ep_metadata in endpoints.items()
+    }
+
+
+def add_command_arguments(cmd_parser, cmd_metadata):
+    """Add the arguments of a command to its subparser"""
+    for argument, attributes in cmd_metadata.get('arguments', {}).items():
+        cmd_parser.add_argument(argument, **attributes)
+
+
+def generate_command_parser(subparsers, cmd_name, cmd_metadata):
+    """Generate a subparser and arguments from a command dictionary"""
+    cmd_parser = subparsers.add_parser(cmd_name, help=cmd_metadata['help'])
+    _add_arguments(cmd_parser, add_command_arguments, cmd_metadata)
+    return cmd_parser
+
+
+def generate_all_commands_parsers(subparsers, commands):
+    """Generate all commands' subparsers from a commands dict
+
+    Returns a dict mapping command names to their subparser.
+    """
+    return {
+        cmd_name: generate_command_parser(subparsers, cmd_name, cmd_metadata)
+        for cmd_name, cmd_metadata in commands.items()
+    }
+
+
+OUTPUT_FORMATS = ['json', 'jsonl', 'pprint', 'text']
+
+# choices of the command arguments, kept apart from the modules implementing
+# these commands so that listing them does not import them
+
+EXPORT_FORMATS = ['jsonl', 'jsonl.gz', 'jsonl.zst', 'csv', 'parquet',
+                  'arrow', 'packed']
+
+# ISO 8601 date prefixes: periods are read from dates without parsing them
+GROWTH_PERIODS = {'year': 4, 'month': 7, 'day': 10}
+
+STATS_TABLES = ['tags', 'cooccurrence', 'growth']
+
+JSON_WHITESPACE = re.compile(r'[ \t\n\r]*')
+JSON_DELIMITERS = ' \t\n\r,]'
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 date, as returned by the REST API
+
+    Returns None for empty values.
+    """
+    if not value:
+        return None
+
+    # Python < 3.7 does not support colons in UTC offsets
+    if len(value) > 6 and value[-3] == ':' and value[-6] in '+-':
+        value = value[:-3] + value[-2:]
+
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z')
+
+
+def format_json(output_format, data):
+    """Format decoded JSON data to the desired output format"""
+    if output_format == 'text':
+        return json.dumps(data, separators=(',', ':'))
+    if output_format == 'json':
+        return json.dumps(data)
+    if output_format == 'jsonl':
+        if isinstance(data, list):
+            return '\n'.join(json.dumps(item) for item in data)
+        return json.dumps(data)
+    if output_format == 'pprint':
+        return json.dumps(data, sort_keys=True, indent=4)
+    raise ValueError("%s is not a supported format." % output_format)
 
 
 def format_response(output_format, response):
     """Format the API response to the desired output format"""
     if not response.content:
         formatted = ''
-    elif output_format == 'json':
-        formatted = json.dumps(response.json())
-    elif output_format == 'pprint':
-        formatted = json.dumps(response.json(), sort_keys=True, indent=4)
     elif output_format == 'text':
         formatted = response.text
     else:
-        raise ValueError("%s is not a supported format." % output_format)
+        formatted = format_json(output_format, response.json())
 
     return formatted
 
 
+def format_items(output_format, items):
+    """Format a stream of JSON items to the desired output format
+
+    The output is yielded chunk by chunk as items are consumed, and matches
+    what ``format_response`` returns for a response holding the same array.
+    Once a deadline is over, the array is closed before ``DeadlineExceeded``
+    is raised, so that partial output remains valid.
+    """
+    if output_format == 'json':
+        separator, prefix, suffix, empty = ', ', '[', ']', '[]'
+    elif output_format == 'jsonl':
+        separator, prefix, suffix, empty = '\n', '', '', ''
+    elif output_format == 'pprint':
+        separator, prefix, suffix, empty = ',\n', '[\n', '\n]', '[]'
+    elif output_format == 'text':
+        separator, prefix, suffix, empty = ',', '[', ']', '[]'
+    else:
+        raise ValueError("%s is not a supported format." % output_format)
+
+    first = True
+
+    try:
+        for item in items:
+            if output_format in ('json', 'jsonl'):
+                formatted = json.dumps(item)
+            elif output_format == 'pprint':
+                formatted = '\n'.join(
+                    '    %s' % line
+                    for line in json.dumps(item, sort_keys=True,
+                                           indent=4).splitlines()
+                )
+            else:
+                formatted = json.dumps(item, separators=(',', ':'))
+
+            if first:
+                yield prefix + formatted
+                first = False
+            else:
+                yield separator + formatted
+    except DeadlineExceeded:
+        yield empty if first else suffix
+        raise
+
+    yield empty if first else suffix
+
+
+def _scan_json_array(buffer, position, started, empty, expect_item):
+    """Skip whitespace, and read the bracket or delimiter that follows
+
+    Returns the position of the next token, and either '[', ']' or ',' when
+    this token is an array bracket or delimiter, or None for an item or the
+    end of the buffer.
+    """
+    position = JSON_WHITESPACE.match(buffer, position).end()
+    if position >= len(buffer):
+        return (position, None)
+
+    char = buffer[position]
+    if not started:
+        if char != '[':
+            raise ValueError("Expecting a JSON array")
+        return (position, char)
+    if char == ']' and (empty or not expect_item):
+        return (position, char)
+    if not expect_item:
+        if char != ',':
+            raise ValueError("Expecting ',' delimiter in JSON array")
+        return (position, char)
+    return (position, None)
+
+
+def iter_json_array(chunks):
+    """Incrementally decode the items of a JSON array from chunks of text
+
+    Items are yielded as soon as they have been fully received, so that
+    only the item being decoded is held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    empty = True
+    expect_item = True
+    exhausted = False
+    chunks = iter(chunks)
+
+    while True:
+        position, token = _scan_json_array(buffer, position, started, empty,
+                                           expect_item)
+        if token == ']':
+            return
+        if token is not None:
+            # opening bracket, or delimiter: an item is expected next
+            started = expect_item = True
+            position += 1
+            continue
+
+        if position < len(buffer):
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if exhausted:
+                    raise
+            else:
+                # a number may have been truncated at the end of a chunk,
+                # so items must be followed by a delimiter to be complete
+                if exhausted or (end < len(buffer)
+                                 and buffer[end] in JSON_DELIMITERS):
+                    yield item
+                    position = end
+                    empty = False
+                    expect_item = False
+                    continue
+
+        if exhausted:
+            raise ValueError("Truncated JSON array")
+
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += next(chunks)
+        except StopIteration:
+            exhausted = True
+
+
+def iter_response_text(response, chunk_size=65536):
+    """Iterate over the body of a streamed response, as chunks of text"""
+    decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(
+        errors='replace'
+    )
+
+    for chunk in response.iter_content(chunk_size=chunk_size):
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+def format_response_stream(output_format, response):
+    """Format a streamed API response to the desired output format
+
+    The output is yielded chunk by chunk as the response body is received;
+    JSON arrays are decoded and formatted one item at a time, so that large
+    collections can be formatted with a constant memory footprint.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError("%s is not a supported format." % output_format)
+
+    chunks = iter_response_text(response)
+
+    if output_format == 'text':
+        yield from chunks
+        return
+
+    head = ''
+    for chunk in chunks:
+        head += chunk
+        if head.strip():
+            break
+
+    if not head.strip():
+        return
+
+    if head.lstrip()[0] == '[':
+        yield from format_items(
+            output_format,
+            iter_json_array(itertools.chain([head], chunks))
+        )
+        return
+
+    yield format_json(output_format, json.loads(head + ''.join(chunks)))
+
+
+def _parse_boolean(value):
+    """Parse a boolean value from a text field"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def _normalize_link(link):
+    """Convert link fields read from a file to REST API parameters"""
+    if not isinstance(link, dict):
+        raise ValueError("%r is not a link object" % link)
+
+    link = {
+        field: value
+        for field, value in link.items()
+        if value is not None and value != ''
+    }
+
+    if isinstance(link.get('tags'), str):
+        link['tags'] = link['tags'].split()
+    if 'private' in link:
+        link['private'] = _parse_boolean(link['private'])
+
+    return link
+
+
+class InvalidLink(ValueError):
+    """Raised when a link read from a file is invalid"""
+
+    def __init__(self, line_number, reason):
+        """Custom exception message"""
+        super(InvalidLink, self).__init__(
+            "Invalid link on line %d: %s" % (line_number, reason)
+        )
+        self.line_number = line_number
+
+
+def read_links(infile, input_format, report_errors=False):
+    """Read link parameters from a JSON Lines or CSV file
+
+    JSON Lines files hold one link object per line, while CSV files have a
+    header naming the link fields. Tags can be given as a space-separated
+    string. Links are yielded one at a time, as the file is read.
+
+    Invalid links raise ``InvalidLink``, or, with ``report_errors``, are
+    yielded as ``InvalidLink`` exceptions, so that the following links can
+    still be read.
+    """
+    def invalid(line_number, exc):
+        error = InvalidLink(line_number, exc)
+        if not report_errors:
+            raise error
+        return error
+
+    if input_format == 'jsonl':
+        for line_number, line in enumerate(infile, 1):
+            if not line.strip():
+                continue
+            try:
+                yield _normalize_link(json.loads(line))
+            except ValueError as exc:
+                yield invalid(line_number, exc)
+    elif input_format == 'csv':
+        reader = csv.DictReader(infile)
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as exc:
+                yield invalid(reader.line_num, exc)
+                continue
+            try:
+                yield _normalize_link(row)
+            except ValueError as exc:
+                yield invalid(reader.line_num, exc)
+    else:
+        raise ValueError("%s is not a supported input format." % input_format)
+
+
+def format_bulk_results(results, describe=None):
+    """Format the outcome of bulk operations as JSON Lines
+
+    Results are formatted one at a time, as they are consumed; ``describe``
+    can return additional report fields from the parameters of a result.
+    """
+    separator = ''
+
+    for result in results:
+        report = {
+            'index': result.index,
+            'ok': result.ok,
+            'status': None,
+            'response': None,
+            'error': None,
+            'retries': getattr(result.response if result.error is None
+                               else result.error, 'retries', 0),
+        }
+
+        if result.response is not None:
+            report['status'] = result.response.status_code
+            if result.response.content:
+                try:
+                    report['response'] = result.response.json()
+                except ValueError:
+                    report['response'] = result.response.text
+        if result.error is not None:
+            report['error'] = str(result.error)
+        if describe is not None:
+            report.update(describe(result.params))
+
+        yield separator + json.dumps(report, sort_keys=True)
+        separator = '\n'
+
+
 def write_output(filename, output):
     """Write the program output to a file"""
     try:
@@ -47,3 +470,22 @@ def write_output(filename, output):
             outfile_handler.write(output)
     except OSError:
         raise OSError("Unable to write output file %s" % filename)
+
+
+def write_stream(filename, chunks):
+    """Write chunks of program output as they are produced
+
+    Output is sent to stdout if no filename is provided.
+    """
+    if not filename:
+        for chunk in chunks:
+            sys.stdout.write(chunk)
+        sys.stdout.write('\n')
+        return
+
+    try:
+        with open(filename, 'w') as outfile_handler:
+            for chunk in chunks:
+                outfile_handler.write(chunk)
+    except OSError:
+        raise OSError("Unable to write output file %s" % filename)
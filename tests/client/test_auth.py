@@ -0,0 +1,68 @@
+"""Tests for Shaarli REST API authentication"""
+# pylint: disable=invalid-name,protected-access
+import time
+from unittest import mock
+
+import jwt
+import pytest
+
+from shaarli_client.client.auth import JWT_IAT_TOLERANCE, JWTTokenCache
+
+SHAARLI_SECRET = 's3kr37!'
+
+
+def test_token_payload():
+    """Tokens are signed with the secret, and hold their issue time"""
+    token, cached = JWTTokenCache(SHAARLI_SECRET).get()
+    payload = jwt.decode(token, SHAARLI_SECRET, algorithms=['HS512'])
+    assert not cached
+    assert abs(payload['iat'] - time.time()) < 5
+
+
+def test_token_reused():
+    """A signed token is reused until it expires"""
+    cache = JWTTokenCache(SHAARLI_SECRET, ttl=30)
+
+    first, _ = cache.get()
+    second, cached = cache.get()
+
+    assert second == first
+    assert cached
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_token_expired():
+    """A new token is signed once the cached one has expired"""
+    cache = JWTTokenCache(SHAARLI_SECRET, ttl=30)
+    cache.get()
+
+    with mock.patch('time.monotonic', return_value=time.monotonic() + 31):
+        _, cached = cache.get()
+
+    assert not cached
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_token_cache_disabled():
+    """Tokens are signed for every request when the TTL is 0"""
+    cache = JWTTokenCache(SHAARLI_SECRET, ttl=0)
+    cache.get()
+    cache.get()
+    assert (cache.hits, cache.misses) == (0, 2)
+
+
+def test_token_invalidate():
+    """An invalidated token is not reused"""
+    cache = JWTTokenCache(SHAARLI_SECRET)
+    cache.get()
+    cache.invalidate()
+    _, cached = cache.get()
+    assert not cached
+
+
+@pytest.mark.parametrize('ttl', [-1, JWT_IAT_TOLERANCE])
+def test_token_ttl_out_of_bounds(ttl):
+    """Tokens cannot be reused beyond Shaarli's tolerance"""
+    with pytest.raises(ValueError) as exc:
+        JWTTokenCache(SHAARLI_SECRET, ttl)
+    assert "Token TTL must be between 0 and" in str(exc.value)
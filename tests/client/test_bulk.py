@@ -0,0 +1,112 @@
+"""Tests for bulk operation helpers"""
+# pylint: disable=invalid-name
+import random
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client.bulk import BulkResult, bulk_map
+from shaarli_client.client.deadline import DeadlineExceeded
+
+
+class SlowEcho:
+    """Echo items after a random delay, tracking concurrent calls"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def __call__(self, item):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.uniform(0, 0.01))
+        with self.lock:
+            self.in_flight -= 1
+        if item < 0:
+            raise ValueError("negative item: %d" % item)
+        return mock.Mock(ok=True, item=item)
+
+
+@pytest.mark.parametrize('concurrency', [1, 3, 8])
+def test_bulk_map_order(concurrency):
+    """Results are yielded in input order, with bounded concurrency"""
+    function = SlowEcho()
+
+    results = list(bulk_map(function, iter(range(20)), concurrency))
+
+    assert [result.index for result in results] == list(range(20))
+    assert [result.response.item for result in results] == list(range(20))
+    assert all(result.ok for result in results)
+    assert function.max_in_flight <= concurrency
+
+
+def test_bulk_map_errors():
+    """Errors are reported without interrupting other operations"""
+    results = list(bulk_map(SlowEcho(), [1, -2, 3], concurrency=2))
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].params == -2
+    assert results[1].response is None
+    assert "negative item" in str(results[1].error)
+
+
+def test_bulk_map_lazy():
+    """Items are not consumed far ahead of the results"""
+    consumed = []
+
+    def items():
+        for item in range(100):
+            consumed.append(item)
+            yield item
+
+    results = bulk_map(SlowEcho(), items(), concurrency=4)
+    next(results)
+    results.close()
+
+    assert len(consumed) <= 5
+
+
+@pytest.mark.parametrize('concurrency', [1, 3])
+def test_bulk_map_deadline(concurrency):
+    """Started operations are reported before the deadline is raised"""
+    deadline = mock.Mock(expired=False)
+    deadline.check.side_effect = [None] * 5 + [DeadlineExceeded(
+        mock.Mock(seconds=1)
+    )]
+    consumed = []
+
+    def items():
+        for item in range(100):
+            consumed.append(item)
+            yield item
+
+    results = bulk_map(SlowEcho(), items(), concurrency, deadline)
+    reported = []
+    with pytest.raises(DeadlineExceeded):
+        for result in results:
+            reported.append(result.index)
+
+    assert reported == consumed == [0, 1, 2, 3, 4]
+
+
+def test_bulk_map_invalid_concurrency():
+    """Concurrency must be a strictly positive integer"""
+    with pytest.raises(ValueError):
+        list(bulk_map(SlowEcho(), [1], concurrency=0))
+
+
+def test_bulk_result_failed_response():
+    """An error response is not a success"""
+    result = BulkResult(0, {}, mock.Mock(ok=False), None)
+    assert not result.ok
+
+
+def test_bulk_result_no_request():
+    """An operation which sent no request is a success"""
+    assert BulkResult(0, {}, None, None).ok
@@ -0,0 +1,131 @@
+"""Tests for response caches"""
+# pylint: disable=invalid-name,redefined-outer-name
+import time
+from unittest import mock
+
+import pytest
+import requests
+
+from shaarli_client.client.cache import (CachedResponse, DiskResponseCache,
+                                         ResponseCache)
+
+URI = 'http://domain.tld/shaarli/api/v1/tags'
+
+
+def make_response(body=b'[]', headers=None):
+    """Build a successful response"""
+    # pylint: disable=protected-access
+    response = requests.Response()
+    response.status_code = 200
+    response.url = URI
+    response.headers.update(headers or {})
+    response._content = body
+    return response
+
+
+@pytest.fixture(params=['memory', 'disk'])
+def cache(request):
+    """An in-memory or on-disk response cache"""
+    if request.param == 'memory':
+        yield ResponseCache(maxsize=2, ttl=30)
+    else:
+        with DiskResponseCache(':memory:', maxsize=2, ttl=30) as disk_cache:
+            yield disk_cache
+
+
+def test_key():
+    """Unset parameters and parameter order do not matter"""
+    assert ResponseCache.key(URI, {'limit': 2, 'offset': None}) == \
+        ResponseCache.key(URI, {'limit': 2})
+    assert ResponseCache.key(URI, {'a': 1, 'b': 2}) == \
+        ResponseCache.key(URI, {'b': 2, 'a': 1})
+    assert ResponseCache.key(URI, {'limit': 2}) != ResponseCache.key(URI, {})
+
+
+def test_lookup(cache):
+    """Cached responses are served until they expire"""
+    assert cache.lookup('key') == (None, False)
+
+    cache.store('key', make_response(b'[1]', {'Content-Length': '3'}))
+    entry, fresh = cache.lookup('key')
+
+    assert fresh
+    assert entry.to_response().json() == [1]
+    assert 'Content-Length' not in entry.headers
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_lookup_expired(cache):
+    """Expired responses without validators are dropped"""
+    cache.store('key', make_response())
+
+    with mock.patch('time.time', return_value=time.time() + 31):
+        assert cache.lookup('key') == (None, False)
+    assert cache.lookup('key') == (None, False)
+
+
+def test_lookup_revalidate(cache):
+    """Expired responses with validators are kept for revalidation"""
+    cache.store('key', make_response(headers={'ETag': '"v1"'}))
+
+    with mock.patch('time.time', return_value=time.time() + 31):
+        entry, fresh = cache.lookup('key')
+        assert not fresh
+        assert entry.validators() == {'If-None-Match': '"v1"'}
+        cache.revalidate('key', entry)
+        assert cache.lookup('key')[1]
+
+    assert cache.revalidations == 1
+
+
+def test_store_no_store(cache):
+    """Responses the server forbids to store are not cached"""
+    assert cache.store(
+        'key', make_response(headers={'Cache-Control': 'no-store'})
+    ) is None
+    assert cache.lookup('key') == (None, False)
+
+
+def test_lru_eviction(cache):
+    """The least recently used responses are evicted first"""
+    for key in ('a', 'b'):
+        cache.store(key, make_response())
+    cache.lookup('a')
+    cache.store('c', make_response())
+
+    assert cache.lookup('a')[1]
+    assert cache.lookup('b') == (None, False)
+    assert cache.lookup('c')[1]
+
+
+def test_invalidate(cache):
+    """Responses are invalidated by URI prefix"""
+    cache.store('http://a.tld/api/v1/info {}', make_response())
+    cache.store('http://b.tld/api/v1/info {}', make_response())
+
+    cache.invalidate('http://a.tld/')
+
+    assert cache.lookup('http://a.tld/api/v1/info {}') == (None, False)
+    assert cache.lookup('http://b.tld/api/v1/info {}')[1]
+
+
+def test_disk_cache_shared(tmpdir):
+    """On-disk caches are shared between processes"""
+    path = tmpdir / 'cache' / 'responses.sqlite'
+    with DiskResponseCache(path) as disk_cache:
+        disk_cache.store('key', make_response(b'{"a": 1}'))
+
+    with DiskResponseCache(path) as disk_cache:
+        entry, fresh = disk_cache.lookup('key')
+
+    assert fresh
+    assert isinstance(entry, CachedResponse)
+    assert entry.to_response().json() == {'a': 1}
+
+
+def test_invalid_parameters():
+    """Sizes must be strictly positive"""
+    with pytest.raises(ValueError):
+        ResponseCache(maxsize=0)
+    with pytest.raises(ValueError):
+        ResponseCache(ttl=-1)
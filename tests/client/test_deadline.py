@@ -0,0 +1,54 @@
+"""Tests for request timeouts and deadlines"""
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client.deadline import Deadline, DeadlineExceeded
+
+
+@mock.patch('time.monotonic', return_value=100.0)
+def test_remaining(monotonic):
+    """A deadline counts down from its creation"""
+    deadline = Deadline(30)
+
+    monotonic.return_value = 110.0
+    assert deadline.remaining() == 20
+    assert not deadline.expired
+
+    monotonic.return_value = 131.0
+    assert deadline.remaining() == 0
+    assert deadline.expired
+
+
+@pytest.mark.parametrize('timeout, expected', [
+    (None, 5),
+    (3, 3),
+    (60, 5),
+    ((2, 60), (2, 5)),
+    ((None, 1), (5, 1)),
+])
+def test_clamp(timeout, expected):
+    """Timeouts are shortened to the time left before the deadline"""
+    with mock.patch('time.monotonic', return_value=100.0):
+        deadline = Deadline(5)
+        assert deadline.clamp(timeout) == expected
+
+
+def test_expired():
+    """Nothing can be started once the deadline is over"""
+    with mock.patch('time.monotonic', return_value=100.0):
+        deadline = Deadline(5)
+
+    with mock.patch('time.monotonic', return_value=105.0):
+        with pytest.raises(DeadlineExceeded) as exc:
+            deadline.check()
+        with pytest.raises(DeadlineExceeded):
+            deadline.clamp(10)
+
+    assert str(exc.value) == "Deadline of 5 seconds exceeded"
+
+
+def test_invalid_deadline():
+    """A deadline must leave some time"""
+    with pytest.raises(ValueError):
+        Deadline(0)
@@ -0,0 +1,153 @@
+"""Tests for request instrumentation"""
+# pylint: disable=protected-access
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client.metrics import (Instrumentation, MetricsExporter,
+                                           RequestMetrics, format_metrics,
+                                           measure)
+
+
+def _metrics(status=200, size=1536, retries=0, phases=None, duration=0.05):
+    """Build the measures of a completed request"""
+    metrics = RequestMetrics('GET', 'http://shaarli/api/v1/links',
+                             'get-links')
+    metrics.status = status
+    metrics.size = size
+    metrics.retries = retries
+    metrics.duration = duration
+    for phase, seconds in (phases or {'wait': 0.04}).items():
+        metrics.add(phase, seconds)
+    return metrics
+
+
+def test_phases_accumulate():
+    """Time spent in a phase is accumulated, e.g. over retries"""
+    metrics = RequestMetrics('GET', 'http://shaarli/api/v1/info', 'get-info')
+
+    metrics.add('wait', 0.25)
+    metrics.add('wait', 0.5)
+    with mock.patch('time.perf_counter', side_effect=[1.0, 1.125]):
+        with metrics.measure('sign'):
+            pass
+
+    assert metrics.phases == {'wait': 0.75, 'sign': 0.125}
+
+
+def test_measure_without_metrics():
+    """Requests that are not instrumented are not measured"""
+    with measure(None, 'sign') as metrics:
+        assert metrics is None
+
+
+def test_finish_response():
+    """The status, size and retries of a response are recorded"""
+    response = mock.Mock(status_code=201, headers={'Content-Length': '42'},
+                         retries=2)
+    metrics = RequestMetrics('POST', 'http://shaarli/api/v1/links',
+                             'post-link')
+
+    metrics.finish(response)
+
+    assert (metrics.status, metrics.size, metrics.retries) == (201, 42, 2)
+    assert metrics.duration >= 0
+
+
+def test_finish_error():
+    """Failed requests record their error and retries"""
+    error = ConnectionError("refused")
+    error.retries = 3
+    metrics = RequestMetrics('GET', 'http://shaarli/api/v1/info', 'get-info')
+
+    metrics.finish(error=error)
+
+    assert metrics.status is None
+    assert metrics.error is error
+    assert metrics.retries == 3
+
+
+def test_instrumentation_hooks():
+    """Pre and post-request hooks are called with the request measures"""
+    calls = []
+    instrumentation = Instrumentation(
+        pre_request=[lambda metrics: calls.append(('pre', metrics.status))],
+        post_request=[lambda metrics: calls.append(('post', metrics.status))],
+    )
+
+    metrics = instrumentation.start('GET', 'http://shaarli/api/v1/info',
+                                    'get-info')
+    instrumentation.finish(metrics, mock.Mock(
+        status_code=200, headers={'Content-Length': '2'}, retries=0
+    ))
+
+    assert calls == [('pre', None), ('post', 200)]
+
+
+def test_format_metrics():
+    """Request measures are formatted on a single line"""
+    metrics = _metrics(phases={'sign': 0.0002, 'wait': 0.0401},
+                       duration=0.0425)
+
+    assert format_metrics(metrics) == \
+        'GET get-links 200 1.5KiB retries=0 sign=0.2ms wait=40.1ms' \
+        ' total=42.5ms'
+
+
+def test_format_metrics_error():
+    """Failed requests are reported as such"""
+    metrics = _metrics(status=None, size=None, retries=2)
+    metrics.error = ConnectionError("refused")
+
+    assert format_metrics(metrics) == \
+        "GET get-links error - retries=2 wait=40.0ms total=50.0ms" \
+        " error='refused'"
+
+
+def test_export_prometheus(tmpdir):
+    """Metrics are aggregated and written in the Prometheus text format"""
+    path = tmpdir.join('shaarli.prom')
+    exporter = MetricsExporter(path)
+
+    exporter(_metrics())
+    exporter(_metrics(retries=1))
+    exporter(_metrics(status=404, size=2))
+    exporter.close()
+
+    lines = path.read().splitlines()
+    assert '# TYPE shaarli_client_requests_total counter' in lines
+    assert 'shaarli_client_requests_total{endpoint="get-links",' \
+        'method="GET",status="200"} 2' in lines
+    assert 'shaarli_client_requests_total{endpoint="get-links",' \
+        'method="GET",status="404"} 1' in lines
+    assert 'shaarli_client_retries_total{endpoint="get-links"} 1' in lines
+    assert 'shaarli_client_response_bytes_total{endpoint="get-links"} 3074' \
+        in lines
+    assert 'shaarli_client_phase_seconds_count{endpoint="get-links",' \
+        'phase="wait"} 3' in lines
+    assert tmpdir.listdir() == [path]
+
+
+def test_export_statsd(tmpdir):
+    """StatsD lines are appended as requests complete"""
+    path = tmpdir.join('shaarli.statsd')
+    exporter = MetricsExporter(path, 'statsd')
+
+    exporter(_metrics(retries=1))
+    exporter.close()
+
+    tags = '#endpoint:get-links,method:GET,status:200'
+    assert path.read().splitlines() == [
+        'shaarli_client.requests:1|c|%s' % tags,
+        'shaarli_client.request:50.000|ms|%s' % tags,
+        'shaarli_client.retries:1|c|%s' % tags,
+        'shaarli_client.response_bytes:1536|h|%s' % tags,
+        'shaarli_client.phase.wait:40.000|ms|%s' % tags,
+    ]
+
+
+def test_export_invalid_format(tmpdir):
+    """Only supported metrics formats can be exported"""
+    with pytest.raises(ValueError) as exc:
+        MetricsExporter(tmpdir.join('shaarli.txt'), 'graphite')
+    assert 'not a supported metrics format' in str(exc.value)
@@ -0,0 +1,115 @@
+"""Tests for client-side rate limits"""
+# pylint: disable=invalid-name,protected-access
+import asyncio
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client.ratelimit import RateLimiter
+
+
+def test_unlimited():
+    """Requests are admitted right away by default"""
+    limiter = RateLimiter()
+
+    with mock.patch('time.sleep') as sleep:
+        for _ in range(100):
+            with limiter:
+                pass
+
+    sleep.assert_not_called()
+    assert limiter.wait_time == 0
+
+
+def test_token_bucket():
+    """Requests beyond the burst are spaced out to the maximum rate"""
+    limiter = RateLimiter(max_rps=10, burst=2)
+
+    with mock.patch('time.monotonic', return_value=100.0):
+        limiter._updated_at = 100.0
+        delays = [limiter._reserve() for _ in range(4)]
+
+    assert delays == pytest.approx([0, 0, 0.1, 0.2])
+    assert limiter.wait_time == pytest.approx(0.3)
+
+
+def test_token_bucket_refill():
+    """Tokens are refilled over time, up to the burst size"""
+    limiter = RateLimiter(max_rps=10, burst=2)
+
+    with mock.patch('time.monotonic', return_value=100.0):
+        limiter._updated_at = 100.0
+        for _ in range(3):
+            limiter._reserve()
+
+    with mock.patch('time.monotonic', return_value=200.0):
+        assert limiter._reserve() == 0
+        assert limiter._reserve() == 0
+        assert limiter._reserve() > 0
+
+
+def test_max_concurrency():
+    """No more than max_concurrency requests are in flight"""
+    limiter = RateLimiter(max_concurrency=2)
+    lock = threading.Lock()
+    in_flight = []
+    peak = []
+
+    def send():
+        with limiter:
+            with lock:
+                in_flight.append(1)
+                peak.append(len(in_flight))
+            time.sleep(0.01)
+            with lock:
+                in_flight.pop()
+
+    threads = [threading.Thread(target=send) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+
+
+def test_max_concurrency_async():
+    """Coroutines share the concurrency limit without blocking the loop"""
+    limiter = RateLimiter(max_concurrency=1)
+    order = []
+
+    async def send(name):
+        async with limiter:
+            order.append('start %s' % name)
+            await asyncio.sleep(0.01)
+            order.append('end %s' % name)
+
+    async def send_all():
+        await asyncio.gather(send('a'), send('b'))
+
+    asyncio.run(send_all())
+
+    assert order == ['start a', 'end a', 'start b', 'end b']
+
+
+def test_release_on_interruption():
+    """The concurrency slot is released if waiting is interrupted"""
+    limiter = RateLimiter(max_rps=1, max_concurrency=1, burst=1)
+    limiter.acquire()
+    limiter.release()
+
+    with mock.patch('time.sleep', side_effect=KeyboardInterrupt):
+        with pytest.raises(KeyboardInterrupt):
+            limiter.acquire()
+
+    assert limiter._semaphore.acquire(blocking=False)
+
+
+def test_invalid_parameters():
+    """Limits must be strictly positive"""
+    with pytest.raises(ValueError):
+        RateLimiter(max_rps=0)
+    with pytest.raises(ValueError):
+        RateLimiter(max_concurrency=0)
@@ -0,0 +1,147 @@
+"""Tests for the retry policy"""
+# pylint: disable=invalid-name,redefined-builtin
+from email.utils import formatdate
+from unittest import mock
+
+import pytest
+from requests.exceptions import (ConnectionError, ConnectTimeout, InvalidURL,
+                                 ReadTimeout)
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+from shaarli_client.client.retry import RetryPolicy, parse_retry_after
+
+
+def response(status_code, headers=None):
+    """Build a mocked response"""
+    return mock.Mock(status_code=status_code, headers=headers or {})
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, None),
+    ('', None),
+    ('12', 12),
+    ('-3', 0),
+    ('soon', None),
+])
+def test_parse_retry_after(value, expected):
+    """Parse Retry-After headers holding a number of seconds"""
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_date():
+    """Parse Retry-After headers holding a date"""
+    with mock.patch('time.time', return_value=1000):
+        assert parse_retry_after(formatdate(1030, usegmt=True)) == 30
+        assert parse_retry_after(formatdate(900, usegmt=True)) == 0
+
+
+@pytest.mark.parametrize('method, status_code, expected', [
+    ('GET', 200, False),
+    ('GET', 404, False),
+    ('GET', 502, True),
+    ('PUT', 500, True),
+    ('DELETE', 429, True),
+    ('POST', 500, False),
+    ('POST', 502, False),
+    ('POST', 503, True),
+    ('POST', 429, True),
+])
+def test_should_retry_status(method, status_code, expected):
+    """Only requests that can safely be sent again are retried"""
+    assert RetryPolicy().should_retry(
+        method, 1, response=response(status_code)
+    ) == expected
+
+
+@pytest.mark.parametrize('method, error, expected', [
+    ('GET', ConnectionError(), True),
+    ('GET', ReadTimeout(), True),
+    ('GET', InvalidURL(), False),
+    ('POST', ConnectionError(), False),
+    ('POST', ReadTimeout(), False),
+    ('POST', ConnectTimeout(), True),
+    ('POST', ConnectionError(MaxRetryError(
+        None, '/api/v1/links', NewConnectionError(None, "Refused")
+    )), True),
+    ('POST', ConnectionError(ProtocolError("Connection aborted")), False),
+])
+def test_should_retry_error(method, error, expected):
+    """Requests that certainly were not processed can be retried"""
+    assert RetryPolicy().should_retry(method, 1, error=error) == expected
+
+
+def test_should_retry_max_attempts():
+    """Requests are not retried once all attempts are made"""
+    policy = RetryPolicy(max_attempts=2)
+    assert policy.should_retry('GET', 1, response=response(503))
+    assert not policy.should_retry('GET', 2, response=response(503))
+
+
+def test_delay():
+    """Delays grow exponentially, with jitter, up to a maximum"""
+    policy = RetryPolicy(backoff=1, max_backoff=5)
+
+    with mock.patch('random.uniform', side_effect=lambda a, b: b):
+        assert [policy.delay(attempt) for attempt in range(1, 5)] == \
+            [1, 2, 4, 5]
+
+    assert 0 <= policy.delay(2) <= 2
+
+
+def test_delay_retry_after():
+    """The delay requested by the server is honored, up to a maximum"""
+    policy = RetryPolicy(max_backoff=10)
+    assert policy.delay(1, response(503, {'Retry-After': '7'})) == 7
+    assert policy.delay(1, response(503, {'Retry-After': '60'})) == 10
+
+
+@mock.patch('time.sleep')
+def test_call(sleep):
+    """Send a request until it succeeds, recording retries"""
+    policy = RetryPolicy(max_attempts=3)
+    failed, succeeded = response(503), response(200)
+
+    result = policy.call('GET', mock.Mock(side_effect=[failed, succeeded]))
+
+    assert result is succeeded
+    assert result.retries == 1
+    assert policy.retries == 1
+    failed.close.assert_called_once_with()
+    sleep.assert_called_once()
+
+
+@mock.patch('time.sleep')
+def test_call_gives_up(sleep):
+    """The last error is raised once all attempts are made"""
+    policy = RetryPolicy(max_attempts=2)
+    send = mock.Mock(side_effect=ConnectionError("Reset"))
+
+    with pytest.raises(ConnectionError) as exc:
+        policy.call('GET', send)
+
+    assert exc.value.retries == 1
+    assert send.call_count == 2
+    sleep.assert_called_once()
+
+
+@mock.patch('time.sleep')
+def test_call_deadline(sleep):
+    """Requests are not retried past a deadline"""
+    policy = RetryPolicy(max_attempts=3)
+    failed = response(503, {'Retry-After': '10'})
+    deadline = mock.Mock()
+    deadline.remaining.return_value = 5
+
+    result = policy.call('GET', mock.Mock(return_value=failed), deadline)
+
+    assert result is failed
+    assert result.retries == 0
+    sleep.assert_not_called()
+
+
+def test_invalid_parameters():
+    """At least one attempt is made, after positive delays"""
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    with pytest.raises(ValueError):
+        RetryPolicy(backoff=-1)
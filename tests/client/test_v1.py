@@ -1,11 +1,21 @@
 """Tests for Shaarli REST API v1 client"""
 # pylint: disable=invalid-name,protected-access
+import datetime
+import json
+import threading
+import time
 from argparse import ArgumentTypeError, Namespace
 from unittest import mock
 
 import pytest
+import requests
 from requests.exceptions import InvalidSchema, InvalidURL, MissingSchema
 
+from shaarli_client.client.cache import ResponseCache
+from shaarli_client.client.deadline import (DEFAULT_TIMEOUT, Deadline,
+                                            DeadlineExceeded)
+from shaarli_client.client.metrics import Instrumentation
+from shaarli_client.client.retry import RetryPolicy
 from shaarli_client.client.v1 import (InvalidEndpointParameters,
                                       ShaarliV1Client, check_positive_integer)
 
@@ -70,6 +80,45 @@ def test_constructor_strip_uri(test_uri):
     assert client.uri == SHAARLI_URL
 
 
+def test_constructor_session_pool():
+    """The client owns a pooled HTTP session"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, pool_maxsize=32)
+    adapter = client.session.get_adapter(SHAARLI_URL)
+    assert isinstance(client.session, requests.Session)
+    assert adapter._pool_maxsize == 32
+
+
+@mock.patch('requests.Session.close')
+def test_context_manager_closes_session(close):
+    """Leaving the context closes the client's own session"""
+    with ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET) as client:
+        assert isinstance(client, ShaarliV1Client)
+    close.assert_called_once_with()
+
+
+def test_close_external_session():
+    """A session passed by the caller is not closed by the client"""
+    session = mock.Mock()
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session=session)
+    client.close()
+    session.close.assert_not_called()
+
+
+def test_external_session_used():
+    """Requests are sent through the session passed by the caller"""
+    session = mock.Mock()
+    ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session=session).get_info()
+    session.request.assert_called_once_with(
+        'GET',
+        '%s/api/v1/info' % SHAARLI_URL,
+        headers=mock.ANY,
+        verify=True,
+        params={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
+    )
+
+
 def test_check_endpoint_params_none():
     """Check parameters - none passed"""
     ShaarliV1Client._check_endpoint_params('get-info', None)
@@ -112,7 +161,7 @@ def test_check_endpoint_params_nok_mixed():
     assert 'preset' in str(exc.value)
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_get_info_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).get_info()
@@ -121,10 +170,52 @@ def test_get_info_uri(request):
         '%s/api/v1/info' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        params={}
+        params={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
+@mock.patch('requests.Session.request')
+def test_token_reused_across_requests(request):
+    """The signed authentication token is reused for subsequent requests"""
+    request.return_value.status_code = 200
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    client.get_info()
+    client.get_tags({})
+
+    headers = [call[1]['headers'] for call in request.call_args_list]
+    assert headers[0] == headers[1]
+    assert (client.token_cache.hits, client.token_cache.misses) == (1, 1)
+
+
+@mock.patch('requests.Session.request')
+def test_renew_rejected_cached_token(request):
+    """Send the request again with a new token if the cached one is rejected"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    request.return_value.status_code = 200
+    client.get_info()
+
+    rejected, accepted = mock.Mock(status_code=401), mock.Mock(status_code=200)
+    request.side_effect = [rejected, accepted]
+
+    assert client.get_info() is accepted
+    rejected.close.assert_called_once_with()
+    assert request.call_count == 3
+    assert (client.token_cache.hits, client.token_cache.misses) == (1, 2)
+
+
+@mock.patch('requests.Session.request')
+def test_rejected_fresh_token(request):
+    """A request is not sent again if a fresh token is rejected"""
+    request.return_value.status_code = 401
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    assert client.get_info().status_code == 401
+    request.assert_called_once()
+
+
 @pytest.mark.parametrize('uri, klass, msg', [
     ('shaarli', MissingSchema, "No scheme supplied"),
     ('http:/shaarli', InvalidURL, "No host supplied"),
@@ -138,7 +229,7 @@ def test_get_info_invalid_uri(uri, klass, msg):
     assert msg in str(exc.value)
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_get_links_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).get_links({})
@@ -147,10 +238,139 @@ def test_get_links_uri(request):
         '%s/api/v1/links' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        params={}
+        params={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
+def _links_response(links):
+    """Build a decoded API response holding a list of links"""
+    return links
+
+
+def _links_call(params):
+    """Expected request for a page of links"""
+    return mock.call('GET', 'links', params, decode=True, deadline=None)
+
+
+@mock.patch.object(ShaarliV1Client, '_request')
+def test_iter_links_pages(get_links):
+    """Walk the link collection page by page until a short page"""
+    get_links.side_effect = [
+        _links_response([{'id': 5}, {'id': 4}]),
+        _links_response([{'id': 3}, {'id': 2}]),
+        _links_response([{'id': 1}]),
+    ]
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    links = client.iter_links({'searchtags': 'hero'}, page_size=2)
+
+    assert [link['id'] for link in links] == [5, 4, 3, 2, 1]
+    get_links.assert_has_calls([
+        _links_call({'searchtags': 'hero', 'offset': 0, 'limit': 2}),
+        _links_call({'searchtags': 'hero', 'offset': 2, 'limit': 2}),
+        _links_call({'searchtags': 'hero', 'offset': 4, 'limit': 2}),
+    ])
+
+
+@mock.patch.object(ShaarliV1Client, '_request')
+def test_iter_links_limit_offset(get_links):
+    """Honor the initial offset and the maximum number of links"""
+    get_links.side_effect = [
+        _links_response([{'id': 8}, {'id': 7}]),
+        _links_response([{'id': 6}]),
+    ]
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    links = list(client.iter_links(
+        {'offset': 10, 'limit': '3', 'visibility': None},
+        page_size=2
+    ))
+
+    assert len(links) == 3
+    get_links.assert_has_calls([
+        _links_call({'offset': 10, 'limit': 2}),
+        _links_call({'offset': 12, 'limit': 1}),
+    ])
+
+
+@mock.patch.object(ShaarliV1Client, '_request')
+def test_iter_links_empty(get_links):
+    """An empty collection yields nothing"""
+    get_links.return_value = _links_response([])
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    assert list(client.iter_links()) == []
+    get_links.assert_called_once_with('GET', 'links',
+                                      {'offset': 0, 'limit': 100},
+                                      decode=True, deadline=None)
+
+
+class FakeLinkCollection:
+    """Serve pages of a fake link collection, tracking concurrent calls"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, size):
+        self.links = [{'id': link_id} for link_id in range(size, 0, -1)]
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.calls = []
+
+    def __call__(self, method, endpoint, params, decode=False,
+                 deadline=None):
+        # pylint: disable=unused-argument,too-many-arguments
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            self.calls.append((params['offset'], params['limit']))
+        time.sleep(0.01)
+        with self.lock:
+            self.in_flight -= 1
+        offset = params['offset']
+        return _links_response(self.links[offset:offset + params['limit']])
+
+
+@pytest.mark.parametrize('size', [0, 1, 9, 10, 57])
+def test_iter_links_parallel(size):
+    """Fetch pages concurrently and yield links in offset order"""
+    collection = FakeLinkCollection(size)
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    with mock.patch.object(client, '_request', collection):
+        links = list(client.iter_links({}, page_size=5, parallel=3))
+
+    assert links == collection.links
+    assert collection.max_in_flight <= 3
+    assert len(collection.calls) <= size // 5 + 3
+
+
+def test_iter_links_parallel_limit():
+    """Stop requesting pages once the limit is reached"""
+    collection = FakeLinkCollection(100)
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    with mock.patch.object(client, '_request', collection):
+        links = list(client.iter_links(
+            {'offset': 3, 'limit': 12}, page_size=5, parallel=4
+        ))
+
+    assert links == collection.links[3:15]
+    assert sorted(collection.calls) == [(3, 5), (8, 5), (13, 2)]
+
+
+def test_iter_links_invalid_params():
+    """Invalid parameters are rejected before any request is sent"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    with pytest.raises(InvalidEndpointParameters):
+        list(client.iter_links({'name': 'tag'}))
+    with pytest.raises(ValueError):
+        list(client.iter_links({}, page_size=0))
+    with pytest.raises(ValueError):
+        list(client.iter_links({}, parallel=0))
+
+
 def test_retrieve_http_params_get_info():
     """Retrieve REST parameters from an Argparse Namespace - GET /info"""
     args = Namespace(endpoint_name='get-info')
@@ -180,7 +400,7 @@ def test_retrieve_http_params_get_links_searchterm():
         ('GET', 'links', {'searchterm': 'gimme+some+results'})
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_post_links_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).post_link({})
@@ -189,10 +409,51 @@ def test_post_links_uri(request):
         '%s/api/v1/links' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        json={}
+        json={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
+@mock.patch.object(ShaarliV1Client, 'post_link')
+def test_post_links(post_link):
+    """Create links in bulk, reporting results in input order"""
+    post_link.side_effect = lambda params: mock.Mock(url=params['url'])
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    links = [{'url': 'https://domain%d.tld' % i} for i in range(10)]
+
+    results = list(client.post_links(iter(links), concurrency=3))
+
+    assert [result.params for result in results] == links
+    assert [result.response.url for result in results] == \
+        [link['url'] for link in links]
+    assert post_link.call_count == 10
+
+
+def test_post_links_invalid_params():
+    """Invalid link parameters are reported as failures"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    result, = client.post_links([{'name': 'nope'}])
+
+    assert not result.ok
+    assert isinstance(result.error, InvalidEndpointParameters)
+
+
+def test_post_links_unreadable():
+    """Links that could not be read are reported as failures, not sent"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    client.post_link = mock.Mock(return_value=mock.Mock(ok=True))
+    error = ValueError("Invalid link on line 2")
+
+    results = list(client.post_links([{'url': 'https://a.tld'}, error,
+                                      {'url': 'https://b.tld'}]))
+
+    assert [result.ok for result in results] == [True, False, True]
+    assert results[1].error is error
+    assert client.post_link.call_count == 2
+
+
 def test_retrieve_http_params_post_link():
     """Retrieve REST parameters from an Argparse Namespace - POST /links"""
     args = Namespace(
@@ -223,7 +484,7 @@ def test_retrieve_http_params_post_empty_link():
     assert ShaarliV1Client._retrieve_http_params(args) == ('POST', 'links', {})
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_put_links_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).put_link(12, {})
@@ -232,10 +493,90 @@ def test_put_links_uri(request):
         '%s/api/v1/links/12' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        json={}
+        json={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
+CURRENT_LINK = {
+    'id': 12,
+    'url': 'https://domain.tld',
+    'shorturl': 'abc12',
+    'title': "Domain",
+    'description': "",
+    'tags': ['web', 'dev'],
+    'private': False,
+    'created': '2020-01-12T10:00:00+00:00',
+    'updated': '2020-01-12T10:00:00+00:00',
+}
+
+
+@pytest.mark.parametrize('changes, changed', [
+    ({'tags': ['dev', 'web'], 'private': 0, 'description': None}, {}),
+    ({'title': "Domain", 'tags': ['web']}, {'tags': ['web']}),
+    ({'private': True, 'description': "New"},
+     {'private': True, 'description': "New"}),
+])
+def test_diff_link(changes, changed):
+    """Only actually modified fields are changed"""
+    assert ShaarliV1Client.diff_link(CURRENT_LINK, changes) == changed
+
+
+def test_diff_link_invalid_params():
+    """Only put-link parameters can be changed"""
+    with pytest.raises(InvalidEndpointParameters):
+        ShaarliV1Client.diff_link(CURRENT_LINK, {'shorturl': 'nope'})
+
+
+@mock.patch('requests.Session.request')
+def test_patch_link(request):
+    """Changed fields are sent along the current state of the link"""
+    ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).patch_link(
+        12, {'title': "Domain", 'tags': ['web']}, CURRENT_LINK
+    )
+    request.assert_called_once_with(
+        'PUT',
+        '%s/api/v1/links/12' % SHAARLI_URL,
+        headers=mock.ANY,
+        verify=True,
+        json={
+            'url': 'https://domain.tld',
+            'title': "Domain",
+            'description': "",
+            'tags': ['web'],
+            'private': False,
+        },
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
+    )
+
+
+@mock.patch('requests.Session.request')
+def test_patch_link_unchanged(request):
+    """No request is sent when nothing changed"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    assert client.patch_link(12, {'private': False}, CURRENT_LINK) is None
+    request.assert_not_called()
+
+
+@mock.patch.object(ShaarliV1Client, '_request')
+def test_patch_links(_request):
+    """Update links in bulk, skipping unchanged and unknown links"""
+    _request.return_value = mock.Mock(ok=True)
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    patches = [(12, {'private': True}), (12, {'private': False}),
+               (13, {'private': True})]
+
+    results = list(client.patch_links(patches, {12: CURRENT_LINK},
+                                      concurrency=2))
+
+    assert [result.ok for result in results] == [True, True, False]
+    assert results[1].response is None
+    assert str(results[2].error) == "Link 13 not found"
+    assert _request.call_count == 1
+
+
 def test_retrieve_http_params_put_link():
     """Retrieve REST parameters from an Argparse Namespace - PUT /links"""
     args = Namespace(
@@ -283,7 +624,7 @@ def test_retrieve_http_params_get_tags():
         ('GET', 'tags', {'offset': 42, 'limit': 'all', 'visibility': 'public'})
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_get_tags_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).get_tags({})
@@ -292,11 +633,13 @@ def test_get_tags_uri(request):
         '%s/api/v1/tags' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        params={}
+        params={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_put_tags_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).put_tag('some-tag', {})
@@ -305,7 +648,9 @@ def test_put_tags_uri(request):
         '%s/api/v1/tags/some-tag' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        json={}
+        json={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
@@ -336,7 +681,7 @@ def test_retrieve_http_params_put_empty_tag():
         ('PUT', 'tags/some-tag', {})
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_delete_tags_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).delete_tag('some-tag', {})
@@ -345,11 +690,13 @@ def test_delete_tags_uri(request):
         '%s/api/v1/tags/some-tag' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        json={}
+        json={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
-@mock.patch('requests.request')
+@mock.patch('requests.Session.request')
 def test_delete_link_uri(request):
     """Ensure the proper endpoint URI is accessed"""
     ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).delete_link(1234, {})
@@ -358,7 +705,9 @@ def test_delete_link_uri(request):
         '%s/api/v1/links/1234' % SHAARLI_URL,
         headers=mock.ANY,
         verify=True,
-        json={}
+        json={},
+        stream=False,
+        timeout=DEFAULT_TIMEOUT
     )
 
 
@@ -384,3 +733,235 @@ def test_retrieve_http_params_delete_empty_tag():
     )
     assert ShaarliV1Client._retrieve_http_params(args) == \
         ('DELETE', 'tags/some-tag', {})
+
+
+def _json_response(data, headers=None):
+    """Build a successful API response holding JSON data"""
+    # pylint: disable=protected-access
+    response = requests.Response()
+    response.status_code = 200
+    response.headers.update(headers or {})
+    response._content = json.dumps(data).encode()
+    return response
+
+
+@mock.patch('requests.Session.request')
+def test_cached_get(request):
+    """Responses to GET requests are served from the cache"""
+    request.return_value = _json_response({'global_counter': 3})
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                             cache=ResponseCache())
+
+    assert client.get_info().json() == {'global_counter': 3}
+    assert client.get_info().json() == {'global_counter': 3}
+    request.assert_called_once()
+
+
+@mock.patch('requests.Session.request')
+def test_cached_get_revalidated(request):
+    """Stale responses are revalidated with a conditional request"""
+    request.return_value = _json_response([], {'ETag': '"v1"'})
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                             cache=ResponseCache(ttl=0))
+    client.get_tags({})
+
+    request.return_value = mock.Mock(status_code=304)
+    assert client.get_tags({}).json() == []
+
+    assert request.call_args[1]['headers']['If-None-Match'] == '"v1"'
+    assert client.cache.revalidations == 1
+
+
+@mock.patch('requests.Session.request')
+def test_cache_invalidated_by_writes(request):
+    """Write requests invalidate the cached responses of the instance"""
+    request.return_value = _json_response([])
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                             cache=ResponseCache())
+
+    client.get_tags({})
+    client.put_tag('some-tag', {'name': 'other-tag'})
+    client.get_tags({})
+
+    assert request.call_count == 3
+
+
+@mock.patch('time.sleep')
+@mock.patch('requests.Session.request')
+def test_retry_transient_failures(request, sleep):
+    """Requests are sent again after transient failures"""
+    request.side_effect = [
+        mock.Mock(status_code=502, headers={'Retry-After': '2'}),
+        _json_response({'global_counter': 3}),
+    ]
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                             retry_policy=RetryPolicy(max_attempts=3))
+
+    response = client.get_info()
+
+    assert response.json() == {'global_counter': 3}
+    assert response.retries == 1
+    sleep.assert_called_once_with(2)
+
+
+@mock.patch('requests.Session.request')
+def test_no_retry_by_default(request):
+    """Requests are sent once by default"""
+    request.return_value = mock.Mock(status_code=502)
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    assert client.get_info().retries == 0
+    request.assert_called_once()
+
+
+@mock.patch('requests.Session.request', mock.Mock())
+def test_rate_limiter():
+    """Requests are admitted by the rate limiter"""
+    limiter = mock.MagicMock()
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                             rate_limiter=limiter)
+
+    client.get_info()
+
+    limiter.__enter__.assert_called_once_with()
+    limiter.__exit__.assert_called_once()
+
+
+@mock.patch('requests.Session.request')
+def test_instrumentation(request):
+    """Requests are measured and reported to post-request hooks"""
+    response = _json_response([{'id': 1}], {'Content-Length': '9'})
+    response.elapsed = datetime.timedelta(0)
+    request.return_value = response
+    reported = []
+    client = ShaarliV1Client(
+        SHAARLI_URL, SHAARLI_SECRET,
+        instrumentation=Instrumentation(post_request=[reported.append])
+    )
+
+    assert list(client.iter_links({'searchtags': 'hero'})) == [{'id': 1}]
+
+    assert len(reported) == 1
+    metrics = reported[0]
+    assert (metrics.method, metrics.endpoint_name) == ('GET', 'get-links')
+    assert (metrics.status, metrics.size, metrics.retries) == (200, 9, 0)
+    assert list(metrics.phases) == \
+        ['sign', 'throttle', 'wait', 'download', 'decode']
+
+
+@mock.patch('requests.Session.request')
+def test_instrumentation_cached(request):
+    """Responses served from the cache are reported as such"""
+    response = _json_response({'global_counter': 3})
+    response.elapsed = datetime.timedelta(0)
+    request.return_value = response
+    reported = []
+    client = ShaarliV1Client(
+        SHAARLI_URL, SHAARLI_SECRET,
+        cache=ResponseCache(),
+        instrumentation=Instrumentation(post_request=[reported.append])
+    )
+
+    client.get_info()
+    assert client.get_info().metrics is reported[1]
+
+    assert [metrics.cached for metrics in reported] == [False, True]
+    assert reported[1].phases == {}
+
+
+@mock.patch('requests.Session.request')
+def test_instrumentation_error(request):
+    """Failed requests are reported to post-request hooks"""
+    request.side_effect = requests.exceptions.ConnectionError("refused")
+    reported = []
+    client = ShaarliV1Client(
+        SHAARLI_URL, SHAARLI_SECRET,
+        instrumentation=Instrumentation(post_request=[reported.append])
+    )
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        client.delete_tag('some-tag', {})
+
+    assert reported[0].endpoint_name == 'delete-tag'
+    assert reported[0].status is None
+    assert isinstance(reported[0].error, requests.exceptions.ConnectionError)
+
+
+@mock.patch('requests.Session.request')
+def test_timeouts(request):
+    """Client timeouts can be overridden for a single call"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, timeout=(2, 5))
+
+    client.get_info()
+    assert request.call_args[1]['timeout'] == (2, 5)
+
+    client.get_tags({}, timeout=30)
+    assert request.call_args[1]['timeout'] == 30
+
+
+@mock.patch('requests.Session.request')
+def test_deadline_clamps_timeouts(request):
+    """Timeouts are shortened to the time left before the deadline"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+
+    with mock.patch('time.monotonic', return_value=100.0):
+        deadline = Deadline(4)
+        client.post_link({'url': 'https://domain.tld'}, deadline=deadline)
+
+    assert request.call_args[1]['timeout'] == (4, 4)
+
+
+@mock.patch('requests.Session.request')
+def test_deadline_exceeded(request):
+    """No request is sent once the deadline is over"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    deadline = mock.Mock()
+    deadline.check.side_effect = DeadlineExceeded(mock.Mock(seconds=1))
+
+    with pytest.raises(DeadlineExceeded):
+        list(client.iter_links({}, deadline=deadline))
+
+    request.assert_not_called()
+
+
+@mock.patch('requests.Session.request')
+def test_deadline_timeout(request):
+    """Requests timing out past the deadline report it"""
+    client = ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET)
+    deadline = mock.Mock(expired=False, seconds=1)
+    deadline.clamp.return_value = 1
+
+    def expire(*args, **kwargs):
+        # pylint: disable=unused-argument
+        deadline.expired = True
+        raise requests.exceptions.ReadTimeout()
+
+    request.side_effect = expire
+
+    with pytest.raises(DeadlineExceeded):
+        client.request(Namespace(endpoint_name='get-info', insecure=False),
+                       deadline=deadline)
+
+
+@mock.patch('time.monotonic')
+@mock.patch.object(ShaarliV1Client, '_request')
+def test_iter_links_deadline(request, monotonic):
+    """Links received before the deadline are yielded"""
+    monotonic.return_value = 100.0
+    deadline = Deadline(10)
+
+    def get_page(method, endpoint, params, decode, deadline):
+        # pylint: disable=unused-argument
+        deadline.check()
+        monotonic.return_value += 6
+        return [{'id': params['offset']}, {'id': params['offset'] + 1}]
+
+    request.side_effect = get_page
+    links = []
+
+    with pytest.raises(DeadlineExceeded):
+        for link in ShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET).iter_links(
+                {}, page_size=2, deadline=deadline):
+            links.append(link['id'])
+
+    assert links == [0, 1, 2, 3]
@@ -0,0 +1,252 @@
+"""Tests for Shaarli REST API v1 asynchronous client"""
+# pylint: disable=invalid-name,protected-access
+import asyncio
+from argparse import Namespace
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client import (AsyncShaarliV1Client,
+                                   InvalidEndpointParameters, RateLimiter,
+                                   ShaarliV1Client)
+
+SHAARLI_URL = 'http://domain.tld/shaarli'
+SHAARLI_SECRET = 's3kr37!'
+
+
+def run(coroutine):
+    """Run a coroutine in a dedicated event loop"""
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class FakeResponse:
+    """Minimal stand-in for an aiohttp.ClientResponse"""
+
+    def __init__(self, body=None, status=200):
+        self.body = body
+        self.status = status
+        self.read_called = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        pass
+
+    async def read(self):
+        """Read the response body"""
+        self.read_called = True
+
+    async def json(self):
+        """Decode the response body"""
+        return self.body
+
+    @staticmethod
+    def raise_for_status():
+        """Successful responses do not raise"""
+
+
+class FakeSession:
+    """Minimal stand-in for an aiohttp.ClientSession"""
+
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, bodies=None):
+        self.bodies = list(bodies or [None])
+        self.request = mock.Mock(side_effect=self._respond)
+        self.close = mock.Mock()
+
+    def _respond(self, *args, **kwargs):
+        # pylint: disable=unused-argument
+        body = self.bodies.pop(0)
+        if isinstance(body, FakeResponse):
+            return body
+        return FakeResponse(body)
+
+
+def test_constructor_shares_endpoints():
+    """The asynchronous client uses the same endpoint metadata"""
+    client = AsyncShaarliV1Client('%s/' % SHAARLI_URL, SHAARLI_SECRET)
+    assert client.endpoints is ShaarliV1Client.endpoints
+    assert client.uri == SHAARLI_URL
+    assert client.session is None
+
+
+def test_constructor_no_secret():
+    """Missing authentication secret"""
+    with pytest.raises(TypeError) as exc:
+        AsyncShaarliV1Client(SHAARLI_URL, None)
+    assert "Missing Shaarli secret" in str(exc.value)
+
+
+def test_get_info_uri():
+    """Ensure the proper endpoint URI is accessed"""
+    session = FakeSession()
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    response = run(client.get_info())
+
+    assert response.read_called
+    session.request.assert_called_once_with(
+        'GET',
+        '%s/api/v1/info' % SHAARLI_URL,
+        headers=mock.ANY,
+        params={}
+    )
+
+
+def test_get_links_skip_unset_params():
+    """Unset query parameters are not sent"""
+    session = FakeSession()
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    run(client.get_links({'offset': 3, 'searchterm': None}))
+
+    session.request.assert_called_once_with(
+        'GET',
+        '%s/api/v1/links' % SHAARLI_URL,
+        headers=mock.ANY,
+        params={'offset': 3}
+    )
+
+
+def test_put_tag_uri_insecure():
+    """Ensure the proper endpoint URI is accessed, without TLS checks"""
+    session = FakeSession()
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session,
+                                  verify_certs=False)
+
+    run(client.put_tag('some-tag', {'name': 'other-tag'}))
+
+    session.request.assert_called_once_with(
+        'PUT',
+        '%s/api/v1/tags/some-tag' % SHAARLI_URL,
+        headers=mock.ANY,
+        json={'name': 'other-tag'},
+        ssl=False
+    )
+
+
+def test_request_from_args():
+    """Send a request from an Argparse Namespace"""
+    session = FakeSession()
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    run(client.request(Namespace(
+        endpoint_name='delete-link',
+        resource=12,
+        insecure=False
+    )))
+
+    session.request.assert_called_once_with(
+        'DELETE',
+        '%s/api/v1/links/12' % SHAARLI_URL,
+        headers=mock.ANY,
+        json={}
+    )
+
+
+def test_post_link_invalid_params():
+    """Invalid parameters are rejected before any request is sent"""
+    session = FakeSession()
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    with pytest.raises(InvalidEndpointParameters):
+        run(client.post_link({'name': 'nope'}))
+
+    session.request.assert_not_called()
+
+
+def test_iter_links():
+    """Walk the link collection page by page until a short page"""
+    session = FakeSession([[{'id': 3}, {'id': 2}], [{'id': 1}]])
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    async def collect():
+        return [link async for link in client.iter_links({}, page_size=2)]
+
+    assert [link['id'] for link in run(collect())] == [3, 2, 1]
+    session.request.assert_has_calls([
+        mock.call('GET', mock.ANY, headers=mock.ANY,
+                  params={'offset': 0, 'limit': 2}),
+        mock.call('GET', mock.ANY, headers=mock.ANY,
+                  params={'offset': 2, 'limit': 2}),
+    ])
+
+
+def test_renew_rejected_cached_token():
+    """Send the request again with a new token if the cached one is rejected"""
+    session = FakeSession([None, FakeResponse(status=401), None])
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session)
+
+    async def send_twice():
+        await client.get_info()
+        return await client.get_info()
+
+    assert run(send_twice()).status == 200
+    assert session.request.call_count == 3
+    assert client.token_cache.hits == 1
+    assert client.token_cache.misses == 2
+
+
+def test_close_external_session():
+    """A session passed by the caller is not closed by the client"""
+    session = FakeSession()
+
+    async def use_client():
+        async with AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                                        session):
+            pass
+
+    run(use_client())
+    session.close.assert_not_called()
+
+
+def test_own_session_pool():
+    """The client creates and closes its own pooled session"""
+    pytest.importorskip('aiohttp')
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, pool_limit=7)
+
+    async def use_session():
+        session = client._create_session()
+        client.session = session
+        limit = session.connector.limit
+        await client.close()
+        return (limit, session.closed)
+
+    assert run(use_session()) == (7, True)
+    assert client.session is None
+
+
+def test_rate_limiter():
+    """Requests are admitted by the rate limiter"""
+    session = FakeSession()
+    limiter = RateLimiter(max_concurrency=1)
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET, session,
+                                  rate_limiter=limiter)
+
+    with mock.patch.object(limiter, 'acquire_async',
+                           wraps=limiter.acquire_async) as acquire:
+        run(client.get_info())
+
+    acquire.assert_called_once_with()
+    assert limiter._semaphore.acquire(blocking=False)
+
+
+def test_session_timeout():
+    """The session created by the client applies its timeouts"""
+    pytest.importorskip('aiohttp')
+    client = AsyncShaarliV1Client(SHAARLI_URL, SHAARLI_SECRET,
+                                  timeout=(3, 20))
+
+    async def use_session():
+        session = client._create_session()
+        await session.close()
+        return session.timeout
+
+    timeout = run(use_session())
+    assert (timeout.sock_connect, timeout.sock_read) == (3, 20)
@@ -0,0 +1,94 @@
+"""Tests for tag analytics"""
+# pylint: disable=invalid-name,redefined-outer-name
+import pytest
+
+from shaarli_client.analytics import TagStats, format_csv
+
+LINKS = [
+    {'tags': ['python', 'web'], 'private': False,
+     'created': '2020-01-05T10:00:00+00:00'},
+    {'tags': ['python', 'web', 'web'], 'private': True,
+     'created': '2020-01-20T10:00:00+00:00'},
+    {'tags': ['python'], 'private': False,
+     'created': '2020-03-01T10:00:00+00:00'},
+    {'tags': [], 'private': False, 'created': '2020-04-01T10:00:00+00:00'},
+    {'tags': ['music'], 'private': True, 'created': None},
+]
+
+
+@pytest.fixture
+def stats():
+    """Statistics of a small link collection, in small batches"""
+    tag_stats = TagStats(batch_size=2)
+    tag_stats.add_links(iter(LINKS))
+    return tag_stats
+
+
+def test_tag_rows(stats):
+    """Tags are counted overall and per visibility, most used first"""
+    assert (stats.links, stats.private_links) == (5, 2)
+    assert stats.tag_rows() == [
+        {'name': 'python', 'count': 3, 'public': 2, 'private': 1,
+         'first_seen': '2020-01', 'last_seen': '2020-03'},
+        {'name': 'web', 'count': 2, 'public': 1, 'private': 1,
+         'first_seen': '2020-01', 'last_seen': '2020-01'},
+        {'name': 'music', 'count': 1, 'public': 0, 'private': 1,
+         'first_seen': None, 'last_seen': None},
+    ]
+    assert [row['name'] for row in stats.tag_rows(top=1)] == ['python']
+
+
+def test_cooccurrence_matrix(stats):
+    """Pairs of tags are counted once per link"""
+    assert stats.cooccurrence_matrix() == (
+        ['python', 'web', 'music'],
+        [[3, 2, 0],
+         [2, 2, 0],
+         [0, 0, 1]],
+    )
+
+
+def test_growth_series():
+    """Tags are counted per period of creation"""
+    stats = TagStats('year')
+    stats.add_links(LINKS[:3] + [{'tags': ['web'],
+                                  'created': '2021-06-01T10:00:00+00:00'}])
+
+    assert stats.growth_series() == (
+        ['2020', '2021'],
+        {'python': [3, 0], 'web': [2, 1]},
+    )
+
+
+def test_invalid_period():
+    """Growth is measured over supported periods only"""
+    with pytest.raises(ValueError):
+        TagStats('fortnight')
+
+
+def test_to_dict(stats):
+    """All statistics are gathered"""
+    data = stats.to_dict(top=2)
+
+    assert data['cooccurrence']['tags'] == ['python', 'web']
+    assert data['growth'] == {
+        'period': 'month',
+        'periods': ['2020-01', '2020-03'],
+        'series': {'python': [2, 1], 'web': [2, 0]},
+    }
+
+
+@pytest.mark.parametrize('table, expected', [
+    ('cooccurrence', 'tag,other,count\npython,web,2'),
+    ('growth', 'month,tag,count\n2020-01,python,2\n2020-03,python,1\n'
+               '2020-01,web,2'),
+])
+def test_format_csv(stats, table, expected):
+    """Tables are formatted as CSV, without empty cells"""
+    assert ''.join(format_csv(*stats.table_rows(table))) == expected
+
+
+def test_invalid_table(stats):
+    """Only supported tables can be output"""
+    with pytest.raises(ValueError):
+        stats.table_rows('nope')
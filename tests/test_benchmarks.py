@@ -0,0 +1,102 @@
+"""Smoke tests for the benchmark suite and its mock Shaarli server"""
+# pylint: disable=invalid-name,redefined-outer-name
+from argparse import Namespace
+
+import pytest
+
+from benchmarks.mock_server import start_server
+from benchmarks.suite import (SCENARIOS, SECRET, compare, percentile,
+                              run_isolated_scenario, run_scenario)
+from shaarli_client.client import RetryPolicy, ShaarliV1Client
+
+OPTIONS = Namespace(page_size=10, concurrency=2, posts=5, renames=3, tags=5,
+                    format_rounds=1)
+
+
+@pytest.fixture
+def server():
+    """A mock server seeded with a small link collection"""
+    mock_server = start_server(links=25, tags=5)
+    yield mock_server
+    mock_server.shutdown()
+    mock_server.server_close()
+
+
+def test_mock_server(server):
+    """The mock server follows the REST API semantics"""
+    with ShaarliV1Client(server.url, SECRET) as client:
+        assert client.get_info().json()['global_counter'] == 25
+        assert len(client.get_links({}).json()) == 20
+
+        link = client.post_link({'url': 'https://a.tld', 'tags': ['new']})
+        assert link.status_code == 201
+        assert client.get_tag('new', {}).json() == \
+            {'name': 'new', 'occurrences': 1}
+
+        assert client.put_tag('new', {'name': 'old'}).status_code == 200
+        assert client.delete_link(link.json()['id'], {}).status_code == 204
+        assert client.get_tag('old', {}).status_code == 404
+
+
+def test_mock_server_defaults(server):
+    """Posted links get the fields defaulted by Shaarli"""
+    with ShaarliV1Client(server.url, SECRET) as client:
+        link = client.post_link({'url': 'https://a.tld'}).json()
+        assert (link['title'], link['description'], link['private']) == \
+            ('https://a.tld', '', False)
+
+        assert client.get_info().json()['global_counter'] == 26
+        assert client.get_links({'visibility': 'public',
+                                 'limit': 'all'}).status_code == 200
+
+
+def test_mock_server_error(server):
+    """Unexpected errors are answered with a 500 status"""
+    with ShaarliV1Client(server.url, SECRET,
+                         retry_policy=RetryPolicy(max_attempts=1)) as client:
+        response = client.get_links({'offset': 'nope'})
+    assert response.status_code == 500
+
+
+@pytest.mark.parametrize('name', list(SCENARIOS))
+def test_run_scenario(server, name):
+    """Run every scenario, and measure it"""
+    result = run_scenario(server.url, name, OPTIONS)
+
+    assert result['items'] > 0
+    if name != 'format':
+        assert result['requests'] > 0
+        assert result['latency_ms']['p50'] <= result['latency_ms']['p99']
+
+
+def test_run_isolated_scenario(server):
+    """Run a scenario in its own process, measuring its memory usage"""
+    result = run_isolated_scenario(server.url, 'get-links', OPTIONS)
+
+    assert result['items'] == 25
+    if result['peak_rss_mb'] is not None:
+        assert 0 <= result['rss_growth_mb'] <= result['peak_rss_mb']
+
+
+def test_percentile():
+    """Nearest-rank percentiles"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([3], 95) == 3
+    assert percentile([], 50) is None
+
+
+def test_compare():
+    """Report throughput, latency and memory usage regressions"""
+    baseline = {'scenarios': {'get-links': {
+        'items_per_s': 1000, 'latency_ms': {'p95': 10}, 'peak_rss_mb': 40,
+    }}}
+    report = {'scenarios': {'get-links': {
+        'items_per_s': 800, 'latency_ms': {'p95': 10.5}, 'peak_rss_mb': 48,
+    }}}
+
+    regressions = compare(report, baseline, 10)
+    assert len(regressions) == 2
+    assert "peak memory usage 48.0 MiB" in regressions[1]
+    assert compare(report, baseline, 25) == []
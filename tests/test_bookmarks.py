@@ -0,0 +1,95 @@
+"""Tests for Netscape bookmark files"""
+# pylint: disable=invalid-name
+import io
+
+from shaarli_client.bookmarks import (format_bookmark, format_bookmarks,
+                                      read_bookmarks)
+
+FIREFOX_BOOKMARKS = '''<!DOCTYPE NETSCAPE-Bookmark-file-1>
+<META HTTP-EQUIV="Content-Type" CONTENT="text/html; charset=UTF-8">
+<TITLE>Bookmarks</TITLE>
+<H1>Bookmarks Menu</H1>
+
+<DL><p>
+    <DT><H3 ADD_DATE="1577872800">Python &amp; co</H3>
+    <DL><p>
+        <DT><A HREF="https://docs.python.org/3/" ADD_DATE="1577872800"
+               TAGS="python,docs">Python 3 documentation</A>
+        <DD>The <b>official</b> docs<br>and tutorials
+        <DT><A HREF="https://pypi.org/" PRIVATE="1">PyPI &#8212; packages</A>
+    </DL><p>
+    <DT><A HREF="">Empty</A>
+    <DT><A HREF="https://shaarli.readthedocs.io/" TAGS="shaarli php">Shaarli</A>
+</DL><p>
+'''
+
+
+def test_read_bookmarks():
+    """Bookmarks are read as post-link parameters"""
+    assert list(read_bookmarks(io.StringIO(FIREFOX_BOOKMARKS),
+                               chunk_size=16)) == [
+        {
+            'url': 'https://docs.python.org/3/',
+            'title': "Python 3 documentation",
+            'description': "The official docs\nand tutorials",
+            'tags': ['python', 'docs'],
+            'private': False,
+        },
+        {
+            'url': 'https://pypi.org/',
+            'title': "PyPI — packages",
+            'private': True,
+        },
+        {
+            'url': 'https://shaarli.readthedocs.io/',
+            'title': "Shaarli",
+            'tags': ['shaarli', 'php'],
+            'private': False,
+        },
+    ]
+
+
+def test_read_bookmarks_incremental():
+    """Bookmarks are yielded as the file is read"""
+    infile = io.StringIO(FIREFOX_BOOKMARKS)
+    bookmarks = read_bookmarks(infile, chunk_size=512)
+
+    assert next(bookmarks)['url'] == 'https://docs.python.org/3/'
+    assert infile.tell() < len(FIREFOX_BOOKMARKS)
+
+
+def test_format_bookmark():
+    """Links are formatted as bookmark entries, notes with absolute URLs"""
+    assert format_bookmark({
+        'url': '/shaare/abc',
+        'title': "A <note>",
+        'description': "Line 1\nLine 2",
+        'tags': ['a', 'b'],
+        'private': True,
+        'created': '2020-01-01T10:00:00+00:00',
+    }, 'https://shaarli.tld/') == (
+        '<DT><A HREF="https://shaarli.tld/shaare/abc" ADD_DATE="1577872800"'
+        ' PRIVATE="1" TAGS="a,b">A &lt;note&gt;</A>\n'
+        '<DD>Line 1\nLine 2'
+    )
+
+
+def test_bookmarks_round_trip():
+    """Exported bookmarks are imported back"""
+    links = [
+        {'url': 'https://a.tld/?q="x"&y', 'title': "A & B", 'tags': ['a'],
+         'private': False, 'created': '2020-01-01T10:00:00+01:00',
+         'updated': None},
+        {'url': 'https://b.tld', 'title': "B", 'description': "x < y",
+         'tags': [], 'private': True, 'created': None, 'updated': None},
+    ]
+
+    output = ''.join(format_bookmarks(links))
+
+    assert output.startswith('<!DOCTYPE NETSCAPE-Bookmark-file-1>')
+    assert list(read_bookmarks(io.StringIO(output))) == [
+        {'url': 'https://a.tld/?q="x"&y', 'title': "A & B", 'tags': ['a'],
+         'private': False},
+        {'url': 'https://b.tld', 'title': "B", 'description': "x < y",
+         'private': True},
+    ]
@@ -0,0 +1,405 @@
+"""Tests for CLI commands"""
+# pylint: disable=invalid-name,protected-access
+import io
+import json
+from argparse import Namespace
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client import ShaarliV1Client
+from shaarli_client.commands import (InvalidCommandLine, batch, bulk_post,
+                                     dedupe, export, export_html, find_links,
+                                     generate_batch_parser, import_html,
+                                     parse_batch, patch_links, read_dump,
+                                     read_link_patches, tags_apply, tags_stats)
+from shaarli_client.mirror import LinkMirror
+
+BATCH = '''
+# rename a tag, then check it
+put-tag old --name "new tag"
+get-tag "new tag"
+
+delete-link nope
+'''
+
+
+def test_batch_parser():
+    """Parse command lines with the endpoint subparsers"""
+    args = generate_batch_parser().parse_args(
+        ['get-links', '--searchterm', 'super', 'hero', '--limit', '3']
+    )
+    assert args.endpoint_name == 'get-links'
+    assert args.searchterm == 'super hero'
+    assert args.limit == '3'
+
+
+@pytest.mark.parametrize('arguments, message', [
+    ([], "required"),
+    (['get-stuff'], "invalid choice"),
+    (['get-tag'], "required"),
+    (['get-info', '--help'], "unrecognized arguments: --help"),
+])
+def test_batch_parser_errors(arguments, message):
+    """Parsing errors are raised instead of exiting"""
+    with pytest.raises(InvalidCommandLine) as exc:
+        generate_batch_parser().parse_args(arguments)
+    assert message in str(exc.value)
+
+
+def test_parse_batch():
+    """Skip blank lines and comments, and report parsing errors"""
+    commands = list(parse_batch(generate_batch_parser(),
+                                io.StringIO(BATCH + 'get-tag "oops\n')))
+
+    assert [(number, line) for number, line, _, _ in commands] == [
+        (3, 'put-tag old --name "new tag"'),
+        (4, 'get-tag "new tag"'),
+        (6, 'delete-link nope'),
+        (7, 'get-tag "oops'),
+    ]
+    assert commands[0][2].name == 'new tag'
+    assert commands[1][2].resource == 'new tag'
+    assert isinstance(commands[2][3], InvalidCommandLine)
+    assert isinstance(commands[3][3], ValueError)
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_batch(concurrency):
+    """Send one request per command line, and report their outcome"""
+    client = mock.Mock()
+    client.request.return_value.status_code = 200
+    client.request.return_value.content = b'{"name": "new tag"}'
+    client.request.return_value.json.return_value = {'name': 'new tag'}
+    client.request.return_value.retries = 0
+    client.request.return_value.ok = True
+
+    output = ''.join(batch(client, Namespace(
+        infile=io.StringIO(BATCH),
+        concurrency=concurrency,
+        insecure=True,
+    )))
+    reports = [json.loads(line) for line in output.split('\n')]
+
+    assert [(report['index'], report['line'], report['command'])
+            for report in reports] == [
+                (0, 3, 'put-tag old --name "new tag"'),
+                (1, 4, 'get-tag "new tag"'),
+                (2, 6, 'delete-link nope'),
+            ]
+    assert [report['status'] for report in reports] == [200, 200, None]
+    assert "not a positive integer" in reports[2]['error']
+    assert [call[0][0].endpoint_name
+            for call in client.request.call_args_list] == \
+        ['put-tag', 'get-tag']
+    assert all(call[0][0].insecure
+               for call in client.request.call_args_list)
+
+
+def test_bulk_post_invalid_line():
+    """Report invalid lines, and keep creating the links that follow"""
+    client = ShaarliV1Client('http://domain.tld', 's3kr37')
+    client._request = mock.Mock(return_value=mock.Mock(
+        ok=True, status_code=201, content=b'', retries=0
+    ))
+
+    output = ''.join(bulk_post(client, Namespace(
+        infile=io.StringIO('{"url": "https://a.tld"}\n'
+                           'not json\n'
+                           '{"url": "https://b.tld"}\n'),
+        input_format='jsonl',
+        concurrency=2,
+        deadline=None,
+    )))
+    reports = [json.loads(line) for line in output.splitlines()]
+
+    assert [(report['index'], report['ok'], report['status'])
+            for report in reports] == \
+        [(0, True, 201), (1, False, None), (2, True, 201)]
+    assert "Invalid link on line 2" in reports[1]['error']
+    assert client._request.call_count == 2
+
+
+def test_tags_apply(tmpdir):
+    """Apply a tag mapping, resuming from the journal"""
+    journal = tmpdir.join('journal.jsonl')
+    journal.write(json.dumps({'tag': 'b', 'name': 'c'}) + '\n')
+    client = mock.Mock()
+    client.get_tags.return_value.json.return_value = [
+        {'name': 'a', 'occurrences': 3},
+        {'name': 'c', 'occurrences': 1},
+    ]
+    client.put_tag.return_value = mock.Mock(
+        ok=True, status_code=200, content=b'', retries=0
+    )
+
+    output = ''.join(tags_apply(client, Namespace(
+        infile=io.StringIO('a b\nb c\nmissing other\n'),
+        concurrency=2,
+        journal=str(journal),
+        deadline=None,
+    )))
+
+    assert json.loads(output) == {
+        'action': 'rename', 'tag': 'a', 'name': 'b', 'index': 0, 'ok': True,
+        'status': 200, 'response': None, 'error': None, 'retries': 0,
+    }
+    client.get_tags.assert_called_once_with({'limit': 'all',
+                                             'visibility': 'all'})
+    client.put_tag.assert_called_once_with('a', {'name': 'b'})
+    assert journal.readlines()[-1] == '{"tag": "a", "name": "b"}\n'
+
+
+def test_read_link_patches():
+    """Read link IDs and changes"""
+    assert list(read_link_patches(
+        io.StringIO('id,tags,title\n12,a b,\n'), 'csv'
+    )) == [(12, {'tags': ['a', 'b']})]
+
+
+def test_read_link_patches_missing_id():
+    """Changes must name the link to update"""
+    with pytest.raises(ValueError) as exc:
+        list(read_link_patches(io.StringIO('{"title": "nope"}'), 'jsonl'))
+    assert str(exc.value) == "Link 1: missing or invalid ID"
+
+
+def test_find_links():
+    """Stop retrieving links once all are found"""
+    client = mock.Mock()
+    client.iter_links.return_value = iter(
+        [{'id': 5}, {'id': 4}, {'id': 3}, {'id': 2}]
+    )
+
+    assert find_links(client, [3, 5]) == {5: {'id': 5}, 3: {'id': 3}}
+    assert next(client.iter_links.return_value) == {'id': 2}
+
+
+def test_find_links_missing(caplog):
+    """Stop retrieving links a page past the oldest requested ID"""
+    client = mock.Mock()
+    client.iter_links.return_value = iter(
+        [{'id': link_id} for link_id in range(100, 0, -1)]
+    )
+
+    assert find_links(client, [90, 95, 1000], page_size=10) == {
+        95: {'id': 95}, 90: {'id': 90}
+    }
+    assert next(client.iter_links.return_value) == {'id': 79}
+    assert "Links not found: 1000" in caplog.text
+
+
+def test_patch_links():
+    """Update changed links, using their current state"""
+    client = ShaarliV1Client('http://domain.tld', 's3kr37')
+    client.iter_links = mock.Mock(return_value=iter([
+        {'id': 2, 'url': 'https://a.tld', 'tags': ['a'], 'private': False},
+        {'id': 1, 'url': 'https://b.tld', 'tags': ['b'], 'private': False},
+    ]))
+    client._request = mock.Mock(return_value=mock.Mock(
+        ok=True, status_code=200, content=b'', retries=0
+    ))
+
+    output = ''.join(patch_links(client, Namespace(
+        infile=io.StringIO('{"id": 1, "tags": ["c"]}\n'
+                           '{"id": 2, "tags": ["a"]}\n'),
+        input_format='jsonl',
+        concurrency=2,
+        from_mirror=False,
+        page_size=100,
+        deadline=None,
+    )))
+
+    assert [json.loads(line) for line in output.splitlines()] == [
+        {'id': 1, 'changed': ['tags'], 'index': 0, 'ok': True, 'status': 200,
+         'response': None, 'error': None, 'retries': 0},
+        {'id': 2, 'changed': [], 'index': 1, 'ok': True, 'status': None,
+         'response': None, 'error': None, 'retries': 0},
+    ]
+    client._request.assert_called_once_with(
+        'PUT', 'links/1',
+        {'url': 'https://b.tld', 'tags': ['c'], 'private': False},
+        timeout=None, deadline=None
+    )
+
+
+def test_patch_links_invalid_field():
+    """Report links with unknown fields, and keep updating the others"""
+    client = ShaarliV1Client('http://domain.tld', 's3kr37')
+    client.iter_links = mock.Mock(return_value=iter([
+        {'id': 6, 'url': 'https://a.tld', 'title': 'A'},
+        {'id': 5, 'url': 'https://b.tld', 'title': 'B'},
+    ]))
+    client._request = mock.Mock(return_value=mock.Mock(
+        ok=True, status_code=200, content=b'', retries=0
+    ))
+
+    output = ''.join(patch_links(client, Namespace(
+        infile=io.StringIO('{"id": 5, "title": "new"}\n'
+                           '{"id": 6, "foo": "bar"}\n'),
+        input_format='jsonl',
+        concurrency=2,
+        from_mirror=False,
+        page_size=100,
+        deadline=None,
+    )))
+    reports = [json.loads(line) for line in output.splitlines()]
+
+    assert [(report['id'], report['changed'], report['ok'])
+            for report in reports] == [(5, ['title'], True), (6, None, False)]
+    assert "foo" in reports[1]['error']
+    client._request.assert_called_once_with(
+        'PUT', 'links/5', {'url': 'https://b.tld', 'title': 'new'},
+        timeout=None, deadline=None
+    )
+
+
+def _stats_args(**kwargs):
+    """Build the arguments of the tags-stats command"""
+    args = Namespace(period='month', top='50', output_format='json',
+                     table='tags', page_size=100, parallel=1, deadline=None)
+    for name, value in kwargs.items():
+        setattr(args, name, value)
+    return args
+
+
+def test_tags_stats():
+    """Compute tag statistics from all links of the instance"""
+    client = mock.Mock()
+    client.iter_links.return_value = iter([
+        {'tags': ['a', 'b'], 'private': False, 'created': '2020-01-01'},
+        {'tags': ['a'], 'private': True, 'created': '2020-02-01'},
+    ])
+
+    output = ''.join(tags_stats(client, _stats_args(top='1')))
+
+    assert json.loads(output)['tags'] == [{
+        'name': 'a', 'count': 2, 'public': 1, 'private': 1,
+        'first_seen': '2020-01', 'last_seen': '2020-02',
+    }]
+    client.iter_links.assert_called_once_with(
+        {'limit': 'all', 'visibility': 'all'},
+        page_size=100, parallel=1, deadline=None
+    )
+
+
+def test_tags_stats_local():
+    """Compute tag statistics from the local mirror, as CSV"""
+    with LinkMirror(':memory:') as mirror:
+        mirror.load_links([
+            {'id': 1, 'tags': ['a', 'b'], 'private': False,
+             'created': '2020-01-01T10:00:00+00:00'},
+        ])
+        output = ''.join(tags_stats(mirror, _stats_args(
+            output_format='csv', table='cooccurrence', top='all'
+        )))
+
+    assert output == 'tag,other,count\na,b,1'
+
+
+def _dedupe_args(**kwargs):
+    """Build the arguments of the dedupe command"""
+    args = Namespace(exact=False, merge_tags=False, delete=False,
+                     concurrency=4, page_size=100, parallel=1, deadline=None)
+    for name, value in kwargs.items():
+        setattr(args, name, value)
+    return args
+
+
+def test_dedupe_report():
+    """Report duplicate groups, without modifying links"""
+    client = mock.Mock()
+    client.iter_links.return_value = iter([
+        {'id': 2, 'url': 'https://a.tld/', 'tags': ['x']},
+        {'id': 1, 'url': 'http://a.tld', 'tags': []},
+    ])
+
+    output = ''.join(dedupe(client, _dedupe_args()))
+
+    assert json.loads(output) == {'url': 'a.tld', 'exact': False, 'keep': 1,
+                                  'duplicates': [2], 'tags': ['x']}
+    client.delete_link.assert_not_called()
+
+
+def test_dedupe_local_read_only():
+    """Links of the local mirror are not modified"""
+    with LinkMirror(':memory:') as mirror:
+        with pytest.raises(ValueError):
+            dedupe(mirror, _dedupe_args(delete=True))
+
+
+def test_export(tmpdir):
+    """Export all links, page by page"""
+    path = str(tmpdir.join('links.jsonl.gz'))
+    client = mock.Mock()
+    client.iter_links.return_value = iter([{'id': 2}, {'id': 1}])
+
+    output = ''.join(export(client, Namespace(
+        path=path, export_format=None, page_size=50, parallel=2,
+        deadline=None,
+    )))
+
+    assert json.loads(output) == {'links': 2, 'path': path}
+    client.iter_links.assert_called_once_with(
+        {'limit': 'all', 'visibility': 'all'},
+        page_size=50, parallel=2, deadline=None
+    )
+
+
+BOOKMARKS = '''<DL><p>
+<DT><A HREF="http://www.a.tld/">Known</A>
+<DT><A HREF="https://b.tld">New</A>
+<DT><A HREF="https://b.tld/">Repeated</A>
+</DL><p>
+'''
+
+
+def test_import_html():
+    """Import bookmarks, skipping URLs already used"""
+    client = mock.Mock()
+    client.iter_links.return_value = iter([{'url': 'https://a.tld'}])
+    client.post_link.return_value = mock.Mock(
+        ok=True, status_code=201, content=b'', retries=0
+    )
+
+    output = ''.join(import_html(client, Namespace(
+        infile=io.StringIO(BOOKMARKS), allow_duplicates=False,
+        concurrency=2, page_size=100, parallel=1, deadline=None,
+    )))
+
+    assert [(report['url'], report['skipped'], report['status'])
+            for report in map(json.loads, output.splitlines())] == [
+        ('http://www.a.tld/', True, None),
+        ('https://b.tld', False, 201),
+        ('https://b.tld/', True, None),
+    ]
+    client.post_link.assert_called_once_with(
+        {'url': 'https://b.tld', 'title': "New", 'private': False},
+        deadline=None
+    )
+
+
+def test_export_html():
+    """Export links as bookmarks, page by page"""
+    client = mock.Mock(uri='https://shaarli.tld')
+    client.iter_links.return_value = iter([{'url': '/shaare/x'}])
+
+    output = ''.join(export_html(client, Namespace(
+        visibility='public', page_size=100, parallel=1, deadline=None,
+    )))
+
+    assert '<DT><A HREF="https://shaarli.tld/shaare/x"' in output
+    client.iter_links.assert_called_once_with(
+        {'limit': 'all', 'visibility': 'public'},
+        page_size=100, parallel=1, deadline=None
+    )
+
+
+@pytest.mark.parametrize('dump', [
+    '[{"id": 1}, {"id": 2}]',
+    '\n{"id": 1}\n{"id": 2}\n',
+])
+def test_read_dump(dump):
+    """Read links from a JSON array or JSON Lines"""
+    assert list(read_dump(io.StringIO(dump), chunk_size=4)) == \
+        [{'id': 1}, {'id': 2}]
@@ -5,7 +5,8 @@ from configparser import ConfigParser
 
 import pytest
 
-from shaarli_client.config import InvalidConfiguration, get_credentials
+from shaarli_client.config import (InvalidConfiguration, get_credentials,
+                                   get_instances, get_setting, get_settings)
 
 SHAARLI_URL = 'http://shaar.li'
 SHAARLI_SECRET = 's3kr37'
@@ -21,7 +22,9 @@ def shaarli_config(tmpdir_factory):
     }
     config['shaarli:shaaplin'] = {
         'url': SHAARLI_URL,
-        'secret': SHAARLI_SECRET
+        'secret': SHAARLI_SECRET,
+        'max_attempts': '5',
+        'backoff': 'fast',
     }
     config['shaarli:nourl'] = {
         'secret': SHAARLI_SECRET
@@ -124,3 +127,54 @@ def test_get_credentials_missing_attribute(shaarli_config, attribute):
             )
         )
     assert "Missing entry: '{}'".format(attribute) in str(exc.value)
+
+
+def test_get_settings(shaarli_config):
+    """Read the settings of an instance"""
+    args = Namespace(config=str(shaarli_config), instance='shaaplin')
+    assert get_settings(args)['max_attempts'] == '5'
+
+    args.instance = 'nonexistent'
+    assert get_settings(args) == {}
+
+
+def test_get_setting():
+    """CLI arguments take precedence over the configuration"""
+    settings = {'max_attempts': '5', 'backoff': 'fast'}
+
+    assert get_setting(Namespace(max_attempts=2), settings,
+                       'max_attempts', int) == 2
+    assert get_setting(Namespace(max_attempts=None), settings,
+                       'max_attempts', int) == 5
+    assert get_setting(Namespace(), {}, 'max_attempts', int, 3) == 3
+
+    with pytest.raises(InvalidConfiguration) as exc:
+        get_setting(Namespace(), settings, 'backoff', float)
+    assert "Invalid value for backoff: fast" in str(exc.value)
+
+
+def test_get_instances(shaarli_config):
+    """Select instances by alias, or all configured instances"""
+    args = Namespace(config=str(shaarli_config), instance=None,
+                     instances=' shaaplin,nourl,,shaaplin', all_instances=False)
+    assert get_instances(args) == ['shaaplin', 'nourl']
+
+    args.instances = None
+    assert get_instances(args) == []
+
+    args.all_instances = True
+    assert get_instances(args) == ['shaaplin', 'nourl', 'nosecret']
+
+
+def test_get_instances_none_selected(tmpdir):
+    """At least one instance must be selected"""
+    with pytest.raises(InvalidConfiguration) as exc:
+        get_instances(Namespace(instances=',', all_instances=False))
+    assert "No instance selected" in str(exc.value)
+
+    config_path = tmpdir.join('shaarli_client.ini')
+    config_path.write('[shaarli]\nurl = http://shaar.li\n')
+    with pytest.raises(InvalidConfiguration) as exc:
+        get_instances(Namespace(config=str(config_path), instance=None,
+                                instances=None, all_instances=True))
+    assert "No [shaarli:<alias>] section found" in str(exc.value)
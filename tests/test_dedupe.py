@@ -0,0 +1,121 @@
+"""Tests for duplicate link detection and removal"""
+# pylint: disable=invalid-name
+from unittest import mock
+
+import pytest
+
+from shaarli_client.dedupe import (DuplicateFinder, MergeFailed, apply_dedupe,
+                                   normalize_url)
+
+
+@pytest.mark.parametrize('url, normalized', [
+    ('https://example.org/a', 'example.org/a'),
+    ('HTTP://WWW.Example.org:80/a/', 'example.org/a'),
+    ('https://user@example.org/a#top', 'example.org/a'),
+    ('https://example.org/a?utm_source=feed&b=2&a=1&fbclid=x',
+     'example.org/a?a=1&b=2'),
+    ('https://example.org/?utm_medium=email', 'example.org'),
+    ('https://example.org:8443/A', 'example.org:8443/A'),
+    ('ftp://example.org/file', 'ftp://example.org/file'),
+    ('http://[::1]/', '[::1]'),
+    ('/shaare/abc123', None),
+    ('?abc123', None),
+    ('', None),
+])
+def test_normalize_url(url, normalized):
+    """Variants of a URL are normalized to the same value"""
+    assert normalize_url(url) == normalized
+
+
+def make_link(link_id, url, tags=(), created=None):
+    """Build the REST API representation of a link"""
+    return {
+        'id': link_id,
+        'url': url,
+        'tags': list(tags),
+        'created': created or '2020-01-%02dT10:00:00+00:00' % link_id,
+    }
+
+
+LINKS = [
+    make_link(1, 'https://example.org/a', ['a']),
+    make_link(2, 'https://example.org/b'),
+    make_link(3, 'http://www.example.org/a/', ['b', 'a']),
+    make_link(4, 'https://example.org/a', ['c'],
+              created='2019-12-31T10:00:00+00:00'),
+    make_link(5, '/shaare/abc'),
+    make_link(6, '/shaare/abc'),
+]
+
+
+def test_find_duplicates():
+    """Links are grouped by normalized URL, the oldest one first"""
+    finder = DuplicateFinder()
+    finder.add_links(LINKS)
+
+    assert [group.describe() for group in finder.groups()] == [{
+        'url': 'example.org/a',
+        'exact': False,
+        'keep': 4,
+        'duplicates': [1, 3],
+        'tags': ['c', 'a', 'b'],
+    }]
+
+
+def test_find_exact_duplicates():
+    """Only identical URLs are grouped in exact mode"""
+    finder = DuplicateFinder(exact=True)
+    finder.add_links(LINKS)
+
+    groups = list(finder.groups())
+    assert [[link.id for link in group.links] for group in groups] == \
+        [[4, 1], [5, 6]]
+    assert groups[0].exact
+
+
+def _groups(links):
+    """Find duplicate groups"""
+    finder = DuplicateFinder()
+    finder.add_links(links)
+    return list(finder.groups())
+
+
+def test_apply_dedupe():
+    """Tags are merged into kept links, then duplicates are deleted"""
+    client = mock.Mock()
+    client.patch_link.return_value = mock.Mock(ok=True)
+    client.delete_link.return_value = mock.Mock(ok=True)
+
+    results = list(apply_dedupe(client, _groups(LINKS), merge_tags=True,
+                                delete=True, concurrency=2))
+
+    assert [(result.index, result.params.action, result.params.link.id)
+            for result in results] == \
+        [(0, 'merge', 4), (1, 'delete', 1), (2, 'delete', 3)]
+    client.patch_link.assert_called_once_with(4, {'tags': ['c', 'a', 'b']},
+                                              mock.ANY)
+    assert client.patch_link.call_args[0][2]['url'] == 'https://example.org/a'
+
+
+def test_apply_dedupe_merge_failed():
+    """Duplicates are kept when their tags could not be merged"""
+    client = mock.Mock()
+    client.patch_link.return_value = mock.Mock(ok=False)
+
+    results = list(apply_dedupe(client, _groups(LINKS), merge_tags=True,
+                                delete=True))
+
+    assert [result.ok for result in results] == [False, False, False]
+    assert isinstance(results[1].error, MergeFailed)
+    client.delete_link.assert_not_called()
+
+
+def test_apply_dedupe_delete_only():
+    """Duplicates can be deleted without merging their tags"""
+    client = mock.Mock()
+
+    results = list(apply_dedupe(client, _groups(LINKS), delete=True))
+
+    assert [result.params.action for result in results] == \
+        ['delete', 'delete']
+    client.patch_link.assert_not_called()
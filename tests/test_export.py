@@ -0,0 +1,162 @@
+"""Tests for link exporters"""
+# pylint: disable=invalid-name
+import csv
+import gzip
+import io
+import json
+import sys
+from unittest import mock
+
+import pytest
+
+from shaarli_client.export import (PACKED_MAGIC, ColumnarExporter, LinkExporter,
+                                   PackedExporter, create_exporter,
+                                   guess_export_format, read_packed)
+from shaarli_client.utils import read_links
+
+LINKS = [
+    {
+        'id': link_id,
+        'url': 'https://domain%d.tld' % link_id,
+        'shorturl': 'abc%d' % link_id,
+        'title': "Link %d" % link_id,
+        'description': "Line 1\nLine 2, \"quoted\"",
+        'tags': ['a', 'b%d' % link_id],
+        'private': link_id % 2 == 0,
+        'created': '2020-01-%02dT10:00:00+00:00' % link_id,
+        'updated': None,
+    }
+    for link_id in range(1, 6)
+]
+
+
+@pytest.mark.parametrize('path, export_format', [
+    ('links.jsonl', 'jsonl'),
+    ('links.jsonl.gz', 'jsonl.gz'),
+    ('links.jsonl.zst', 'jsonl.zst'),
+    ('backup.csv', 'csv'),
+    ('backup.parquet', 'parquet'),
+    ('backup.packed', 'packed'),
+    ('backup', 'jsonl'),
+])
+def test_guess_export_format(path, export_format):
+    """Export formats are guessed from file extensions"""
+    assert guess_export_format(path) == export_format
+
+
+def _export(path, export_format=None):
+    """Export links to a file"""
+    with create_exporter(str(path), export_format) as exporter:
+        assert exporter.write_links(iter(LINKS)) == len(LINKS)
+
+
+def test_export_jsonl(tmpdir):
+    """Links are written one per line"""
+    path = tmpdir.join('links.jsonl')
+    _export(path)
+    assert [json.loads(line) for line in path.readlines()] == LINKS
+
+
+def test_export_jsonl_gzip(tmpdir):
+    """JSON Lines can be compressed with gzip"""
+    path = tmpdir.join('links.jsonl.gz')
+    _export(path)
+    with gzip.open(str(path), 'rt') as f_links:
+        assert [json.loads(line) for line in f_links] == LINKS
+
+
+def test_export_jsonl_zstd(tmpdir):
+    """JSON Lines can be compressed with Zstandard"""
+    zstandard = pytest.importorskip('zstandard')
+    path = tmpdir.join('links.jsonl.zst')
+    _export(path)
+    with zstandard.open(str(path), 'rt') as f_links:
+        assert [json.loads(line) for line in f_links] == LINKS
+
+
+def test_export_missing_dependency(tmpdir):
+    """Optional dependencies are required for some formats"""
+    with mock.patch.dict(sys.modules, {'zstandard': None}):
+        with pytest.raises(ImportError) as exc:
+            create_exporter(str(tmpdir.join('links.jsonl.zst')))
+    assert 'pip install shaarli-client[zstd]' in str(exc.value)
+
+
+def test_export_csv(tmpdir):
+    """CSV exports can be read back by bulk-post"""
+    path = tmpdir.join('links.csv')
+    _export(path)
+
+    with open(str(path), newline='') as f_links:
+        rows = list(csv.reader(f_links))
+    assert rows[0] == ['id', 'url', 'shorturl', 'title', 'description',
+                       'tags', 'private', 'created', 'updated']
+    with open(str(path), newline='') as f_links:
+        link = next(read_links(f_links, 'csv'))
+    assert link['tags'] == ['a', 'b1']
+    assert link['description'] == LINKS[0]['description']
+
+
+@pytest.mark.parametrize('export_format', ['parquet', 'arrow'])
+def test_export_arrow(tmpdir, export_format):
+    """Links can be exported to Arrow-based columnar formats"""
+    if export_format == 'parquet':
+        parquet = pytest.importorskip('pyarrow.parquet')
+    else:
+        ipc = pytest.importorskip('pyarrow.ipc')
+    path = tmpdir.join('links.%s' % export_format)
+    _export(path)
+
+    if export_format == 'parquet':
+        table = parquet.read_table(str(path))
+    else:
+        table = ipc.open_file(str(path)).read_all()
+    assert table.to_pylist() == LINKS
+
+
+def test_export_packed(tmpdir):
+    """Packed exports are read back, block by block"""
+    path = tmpdir.join('links.packed')
+    with PackedExporter(str(path), block_size=2) as exporter:
+        exporter.write_links(LINKS)
+
+    with open(str(path), 'rb') as f_links:
+        assert list(read_packed(f_links)) == LINKS
+
+
+@pytest.mark.parametrize('data', [
+    b'nope',
+    PACKED_MAGIC + b'\x10\x00',
+    PACKED_MAGIC + b'\x10\x00\x00\x00abc',
+])
+def test_read_packed_invalid(data):
+    """Invalid or truncated files are rejected"""
+    with pytest.raises(ValueError):
+        list(read_packed(io.BytesIO(data)))
+
+
+def test_incomplete_exporter(tmpdir):
+    """Exporters missing hooks cannot be created"""
+    # pylint: disable=abstract-class-instantiated,abstract-method
+
+    class IncompleteExporter(LinkExporter):
+        """Exporter without close"""
+
+        def write(self, link):
+            """Ignore a link"""
+
+    class IncompleteColumnarExporter(ColumnarExporter):
+        """Columnar exporter without _close"""
+
+        def _write_block(self, columns):
+            """Ignore a block of links"""
+
+    for exporter_class in (IncompleteExporter, IncompleteColumnarExporter):
+        with pytest.raises(TypeError):
+            exporter_class(str(tmpdir.join('links')))
+
+
+def test_export_invalid_format(tmpdir):
+    """Only supported formats can be exported"""
+    with pytest.raises(ValueError):
+        create_exporter(str(tmpdir.join('links')), 'xml')
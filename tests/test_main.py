@@ -0,0 +1,122 @@
+"""Tests for the CLI entrypoint"""
+import io
+import subprocess
+import sys
+from unittest import mock
+
+import pytest
+
+from shaarli_client.main import decode_output, fan_out, generate_parser, main
+
+HEAVY_MODULES = ('gzip', 'html.parser', 'jwt', 'requests',
+                 'shaarli_client.analytics', 'shaarli_client.bookmarks',
+                 'shaarli_client.dedupe', 'shaarli_client.export',
+                 'shaarli_client.tags', 'sqlite3')
+
+
+def test_parser_lazy_subparsers():
+    """Only the selected subparser is populated"""
+    # pylint: disable=protected-access
+    parser = generate_parser()
+    args = parser.parse_args(['get-links', '--limit', '3', '--paginate'])
+
+    assert args.limit == '3'
+    assert args.paginate
+
+    subparsers = parser._subparsers._group_actions[0].choices
+    assert subparsers['get-links']._actions[-1].dest == 'parallel'
+    assert [action.dest for action in subparsers['post-link']._actions] == \
+        ['help']
+
+
+@pytest.mark.parametrize('arguments', [
+    ['get-info'],
+    ['search', 'python'],
+    ['get-links', '--searchtags', 'python'],
+])
+def test_startup_imports(arguments):
+    """Heavy modules are not imported until a request is sent"""
+    output = subprocess.run(
+        [sys.executable, '-c',
+         'import sys;'
+         'from shaarli_client.main import generate_parser;'
+         'generate_parser().parse_known_args(%r);'
+         'print(sorted(set(sys.modules) & set(%r)))'
+         % (arguments, HEAVY_MODULES)],
+        stdout=subprocess.PIPE,
+        check=False,
+        universal_newlines=True,
+    ).stdout
+
+    assert output.strip() == '[]'
+
+
+@pytest.mark.parametrize('output, decoded', [
+    ('{"a": 1}', {'a': 1}),
+    ('[1, 2]', [1, 2]),
+    ('{"a": 1}\n{"a": 2}', [{'a': 1}, {'a': 2}]),
+    ('', []),
+    ('name,count\npython,2', 'name,count\npython,2'),
+])
+def test_decode_output(output, decoded):
+    """Decode JSON and JSON Lines outputs, or keep them as text"""
+    assert decode_output(output) == decoded
+
+
+def test_fan_out(monkeypatch):
+    """Run a request against each instance, isolating their errors"""
+    calls = []
+
+    def run_instance(args, *_, **__):
+        calls.append((args.instance, args.format, args.infile.read()))
+        if args.instance == 'down':
+            raise ConnectionError("Connection refused")
+        return {'instance': args.instance}
+
+    monkeypatch.setattr('shaarli_client.main.run_instance', run_instance)
+    args = generate_parser().parse_args(
+        ['--instances', 'one,down,two', 'bulk-post', '-'])
+    args.infile = io.StringIO('{"url": "https://example.com"}')
+
+    assert fan_out(args, ['one', 'down', 'two']) == [
+        {'instance': 'one', 'output': {'instance': 'one'}, 'error': None},
+        {'instance': 'down', 'output': None, 'error': "Connection refused"},
+        {'instance': 'two', 'output': {'instance': 'two'}, 'error': None},
+    ]
+    assert sorted(calls) == [
+        (instance, 'json', '{"url": "https://example.com"}')
+        for instance in ('down', 'one', 'two')
+    ]
+    assert args.instance is None
+    assert args.format == 'pprint'
+
+
+@pytest.mark.parametrize('arguments', [
+    ['--instances', 'one', 'export', 'links.jsonl'],
+    ['--instances', 'one', '--url', 'http://shaar.li', 'get-info'],
+    ['--instances', 'one', '--mirror', 'mirror.db', 'get-info'],
+    ['--instances', 'one', 'tags-apply', '-', '--journal',
+     'journal.jsonl'],
+])
+def test_fan_out_unsupported(arguments):
+    """Reject options that cannot apply to several instances"""
+    args = generate_parser().parse_args(arguments)
+    with pytest.raises(ValueError):
+        fan_out(args, ['one'])
+
+
+def test_main_closes_exporter(monkeypatch):
+    """The metrics exporter is closed when opening the cache fails"""
+    exporter = mock.Mock()
+    monkeypatch.setattr('shaarli_client.main.get_metrics_exporter',
+                        lambda args, settings: exporter)
+    monkeypatch.setattr('shaarli_client.main.DiskResponseCache',
+                        mock.Mock(side_effect=OSError("Read-only")))
+    monkeypatch.setattr('sys.argv', [
+        'shaarli', '-u', 'http://shaar.li', '-s', 's3kr37', '--cache',
+        'get-info'
+    ])
+
+    with pytest.raises(OSError):
+        main()
+    exporter.close.assert_called_once_with()
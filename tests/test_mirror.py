@@ -0,0 +1,261 @@
+"""Tests for the local mirror of a Shaarli instance"""
+# pylint: disable=invalid-name,redefined-outer-name
+from argparse import Namespace
+from unittest import mock
+
+import pytest
+
+from shaarli_client.client.deadline import DeadlineExceeded
+from shaarli_client.mirror import LinkMirror, default_mirror_path
+
+SHAARLI_URL = 'http://shaar.li'
+
+
+def make_link(link_id, tags=(), private=False, updated=''):
+    """Build a link, as returned by the REST API"""
+    return {
+        'id': link_id,
+        'url': 'https://domain.tld/%d' % link_id,
+        'title': "Link %d" % link_id,
+        'description': "",
+        'tags': list(tags),
+        'private': private,
+        'created': '2020-01-%02dT10:00:00+00:00' % link_id,
+        'updated': updated,
+        'shorturl': 'abc%d' % link_id,
+    }
+
+
+class FakeClient:
+    """Serve a fake link collection, newest links first"""
+
+    def __init__(self, links):
+        self.uri = SHAARLI_URL
+        self.links = links
+        self.served = 0
+
+    def get_info(self):
+        """Get information about this instance"""
+        return mock.Mock(text='{"global_counter": %d}' % len(self.links))
+
+    def iter_links(self, params, page_size, parallel, deadline=None):
+        """Iterate over links, until the deadline is over"""
+        # pylint: disable=unused-argument
+        for link in sorted(self.links, key=lambda link: -link['id']):
+            if deadline is not None:
+                deadline.check()
+            self.served += 1
+            yield link
+
+
+@pytest.fixture
+def links():
+    """A small link collection"""
+    return [
+        make_link(1, ['python', 'Code']),
+        make_link(2, ['shaarli', 'php'], private=True),
+        make_link(3, ['python', 'shaarli']),
+        make_link(4, ['music']),
+    ]
+
+
+@pytest.fixture
+def mirror(links):
+    """A mirror synchronized with a small link collection"""
+    with LinkMirror(':memory:') as link_mirror:
+        link_mirror.sync(FakeClient(links))
+        yield link_mirror
+
+
+def test_default_mirror_path(monkeypatch, tmpdir):
+    """Mirrors are stored in the user's data directory"""
+    monkeypatch.setenv('XDG_DATA_HOME', str(tmpdir))
+    assert default_mirror_path() == tmpdir / 'shaarli' / 'mirror.sqlite'
+    assert default_mirror_path('dev') == \
+        tmpdir / 'shaarli' / 'mirror-dev.sqlite'
+
+
+def test_sync_full(links):
+    """The first synchronization retrieves all links"""
+    with LinkMirror(':memory:') as link_mirror:
+        stats = link_mirror.sync(FakeClient(links))
+        assert stats == {'added': 4, 'updated': 0, 'unchanged': 0,
+                         'deleted': 0}
+        assert link_mirror.get_info() == {'global_counter': 4}
+
+
+def test_sync_incremental(mirror, links):
+    """Stop retrieving links after a page of known links"""
+    links[3]['updated'] = '2020-02-01T10:00:00+00:00'
+    links.append(make_link(5, ['new']))
+    client = FakeClient(links)
+
+    stats = mirror.sync(client, page_size=2)
+
+    assert stats == {'added': 1, 'updated': 1, 'unchanged': 2, 'deleted': 0}
+    assert client.served == 4
+
+
+def test_sync_full_deletions(mirror, links):
+    """A full synchronization detects deleted links"""
+    stats = mirror.sync(FakeClient(links[1:]), full=True)
+
+    assert stats['deleted'] == 1
+    assert [link['id'] for link in mirror.iter_links()] == [4, 3, 2]
+    assert mirror.get_tag('python') == {'name': 'python', 'occurrences': 1}
+
+
+def test_sync_deadline(links, tmpdir):
+    """Links retrieved before the deadline are kept"""
+    deadline = mock.Mock()
+    deadline.check.side_effect = [None, None, DeadlineExceeded(
+        mock.Mock(seconds=1)
+    )]
+
+    with LinkMirror(str(tmpdir.join('mirror.sqlite'))) as link_mirror:
+        with pytest.raises(DeadlineExceeded) as exc:
+            link_mirror.sync(FakeClient(links), deadline=deadline)
+
+    assert exc.value.stats == {'added': 2, 'updated': 0, 'unchanged': 0,
+                               'deleted': 0}
+    with LinkMirror(str(tmpdir.join('mirror.sqlite'))) as link_mirror:
+        assert [link['id'] for link in link_mirror.iter_links()] == [4, 3]
+        assert link_mirror.get_metadata('synced') is None
+
+
+def test_sync_other_instance(mirror, links):
+    """A mirror cannot be synchronized with another instance"""
+    client = FakeClient(links)
+    client.uri = 'https://other.tld'
+    with pytest.raises(ValueError) as exc:
+        mirror.sync(client)
+    assert "mirror of another instance" in str(exc.value)
+
+
+def test_get_info_not_synchronized():
+    """An empty mirror holds no information"""
+    with LinkMirror(':memory:') as link_mirror:
+        with pytest.raises(ValueError) as exc:
+            link_mirror.get_info()
+    assert "has not been synchronized" in str(exc.value)
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({}, [4, 3, 2, 1]),
+    ({'limit': 2}, [4, 3]),
+    ({'offset': 1, 'limit': 'all'}, [3, 2, 1]),
+    ({'visibility': 'private'}, [2]),
+    ({'visibility': 'public'}, [4, 3, 1]),
+    ({'searchtags': 'python'}, [3, 1]),
+    ({'searchtags': 'PYTHON -shaarli'}, [1]),
+    ({'searchtags': 'sh*'}, [3, 2]),
+    ({'searchtags': 'shaarli', 'offset': 1}, [2]),
+    ({'searchterm': 'link domain.tld/1'}, [1]),
+    ({'searchterm': 'code', 'visibility': 'public'}, [1]),
+])
+def test_iter_links(mirror, params, expected):
+    """Query links with get-links parameters"""
+    assert [link['id'] for link in mirror.iter_links(params)] == expected
+
+
+def test_get_tags(mirror):
+    """Count tag occurrences"""
+    assert mirror.get_tags({'limit': 3}) == [
+        {'name': 'python', 'occurrences': 2},
+        {'name': 'shaarli', 'occurrences': 2},
+        {'name': 'Code', 'occurrences': 1},
+    ]
+    assert mirror.get_tags({'visibility': 'private'}) == [
+        {'name': 'php', 'occurrences': 1},
+        {'name': 'shaarli', 'occurrences': 1},
+    ]
+
+
+def test_get_tag_not_found(mirror):
+    """Tag names are case-sensitive"""
+    with pytest.raises(ValueError) as exc:
+        mirror.get_tag('code')
+    assert "Tag not found" in str(exc.value)
+
+
+def test_request(mirror):
+    """Answer read-only requests from an Argparse Namespace"""
+    assert mirror.request(Namespace(endpoint_name='get-tag',
+                                    resource='music')) == \
+        {'name': 'music', 'occurrences': 1}
+    assert len(list(mirror.request(Namespace(endpoint_name='get-links',
+                                             limit='all')))) == 4
+
+
+def test_request_not_read_only(mirror):
+    """Write requests cannot be sent to a mirror"""
+    with pytest.raises(ValueError) as exc:
+        mirror.request(Namespace(endpoint_name='post-link'))
+    assert "not available for local mirrors" in str(exc.value)
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({'searchterm': 'python'}, [3, 1]),
+    ({'searchterm': 'link 1'}, [1]),
+    ({'searchterm': 'haarl'}, [3, 2]),
+    ({'searchterm': 'python -code'}, [3]),
+    ({'searchterm': 'python', 'searchtags': 'shaarli'}, [3]),
+    ({'searchterm': 'link', 'visibility': 'private'}, [2]),
+    ({'searchterm': 'link', 'offset': 1, 'limit': 2}, [3, 2]),
+    ({'searchterm': 'nowhere'}, []),
+])
+def test_search(mirror, params, expected):
+    """Search links with get-links parameters"""
+    assert [link['id'] for link in mirror.search(params)] == expected
+
+
+def test_search_ranking(mirror, links):
+    """Links with more relevant matches are listed first"""
+    links[0]['title'] = "Python, python and more python"
+    links[0]['updated'] = '2020-02-01T10:00:00+00:00'
+    mirror.store_link(links[0])
+
+    assert [link['id'] for link in mirror.search({'searchterm': 'python'})] \
+        == [1, 3]
+
+
+def test_search_index_updates(mirror, links):
+    """The search index follows link updates and deletions"""
+    links[3]['description'] = "Spiderman soundtrack"
+    links[3]['updated'] = '2020-02-01T10:00:00+00:00'
+    mirror.store_link(links[3])
+    assert [link['id'] for link in mirror.search({'searchterm': 'derma'})] \
+        == [4]
+
+    mirror.delete_links([4])
+    assert mirror.search({'searchterm': 'derma'}) == []
+
+
+def test_links_by_id(mirror, links):
+    """Get links by ID, ignoring unknown links"""
+    assert mirror.links_by_id([3, 1, 42]) == {1: links[0], 3: links[2]}
+
+
+def test_load_links(links):
+    """Links can be loaded from a dump, and searched right away"""
+    with LinkMirror(':memory:') as link_mirror:
+        assert link_mirror.load_links(links) == \
+            {'added': 4, 'updated': 0, 'unchanged': 0}
+        assert link_mirror.load_links(links[:1]) == \
+            {'added': 0, 'updated': 0, 'unchanged': 1}
+        assert [link['id'] for link in
+                link_mirror.search({'searchterm': 'music'})] == [4]
+
+
+def test_rebuild_index(links, tmpdir):
+    """The search index is rebuilt when its format changes"""
+    path = tmpdir / 'mirror.sqlite'
+    with LinkMirror(path) as link_mirror:
+        link_mirror.load_links(links)
+        link_mirror.connection.execute('DELETE FROM search_postings')
+        link_mirror.set_metadata('search_index', '0')
+        link_mirror.connection.commit()
+
+    with LinkMirror(path) as link_mirror:
+        assert [link['id'] for link in
+                link_mirror.search({'searchterm': 'music'})] == [4]
@@ -0,0 +1,97 @@
+"""Tests for link and tag models"""
+# pylint: disable=invalid-name,redefined-outer-name,protected-access
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from shaarli_client.models import Link, LinkCollection, Tag
+
+
+def make_link(link_id, url, tags=()):
+    """Build the REST API representation of a link"""
+    return {
+        'id': link_id,
+        'url': url,
+        'shorturl': 'abc%d' % link_id,
+        'title': "Link %d" % link_id,
+        'description': "",
+        'tags': list(tags),
+        'private': False,
+        'created': '2020-01-%02dT10:00:00+01:00' % link_id,
+        'updated': '',
+    }
+
+
+@pytest.fixture
+def collection():
+    """A small link collection"""
+    return LinkCollection.from_dicts([
+        make_link(1, 'https://a.tld', ['python', 'web']),
+        make_link(2, 'https://b.tld', ['python']),
+        make_link(3, 'https://a.tld', ['music']),
+    ])
+
+
+def test_link_round_trip():
+    """Links are converted back to their REST API representation"""
+    data = make_link(1, 'https://a.tld', ['python'])
+    data['updated'] = None
+    assert Link.from_dict(data).to_dict() == data
+
+
+def test_link_lazy_dates():
+    """Dates are parsed when read"""
+    link = Link.from_dict(make_link(4, 'https://a.tld'))
+    assert link._created == '2020-01-04T10:00:00+01:00'
+
+    assert link.created == datetime(2020, 1, 4, 10,
+                                    tzinfo=timezone(timedelta(hours=1)))
+    assert link.updated is None
+    assert link.to_dict()['created'] == '2020-01-04T10:00:00+01:00'
+
+
+def test_link_interned_tags():
+    """Links share tag strings"""
+    first = Link(1, 'https://a.tld', tags=[''.join(['py', 'thon'])])
+    second = Link(2, 'https://b.tld', tags=[''.join(['pyt', 'hon'])])
+    assert first.tags[0] is second.tags[0]
+
+
+def test_link_slots():
+    """Links have no per-instance dict"""
+    link = Link(1, 'https://a.tld')
+    with pytest.raises(AttributeError):
+        setattr(link, 'extra', True)
+
+
+def test_collection_lookups(collection):
+    """Links are looked up by ID, URL and tag"""
+    assert len(collection) == 3
+    assert 2 in collection
+    assert collection[2].url == 'https://b.tld'
+    assert collection.get(42) is None
+    assert [link.id for link in collection.by_url('https://a.tld')] == [1, 3]
+    assert [link.id for link in collection.by_tag('python')] == [1, 2]
+    assert collection.by_tag('Python') == []
+
+
+def test_collection_replace(collection):
+    """Adding a link with a known ID replaces it, and its index entries"""
+    collection.add(Link(1, 'https://c.tld', tags=['web']))
+
+    assert [link.id for link in collection] == [2, 3, 1]
+    assert [link.id for link in collection.by_url('https://a.tld')] == [3]
+    assert [link.id for link in collection.by_tag('python')] == [2]
+
+
+def test_collection_remove(collection):
+    """Removed links are no longer indexed"""
+    assert collection.remove(2).url == 'https://b.tld'
+    assert collection.by_url('https://b.tld') == []
+    assert 2 not in collection
+
+
+def test_collection_tags(collection):
+    """Tags are counted, most used first"""
+    assert collection.tags() == [Tag('python', 2), Tag('music', 1),
+                                 Tag('web', 1)]
@@ -0,0 +1,72 @@
+"""Tests for local link search"""
+import pytest
+
+from shaarli_client.search import LinkFilter, score_link, split_search, tokenize
+
+LINK = {
+    'id': 486,
+    'title': "Italian Spiderman",
+    'description': "A parody, with a super hero",
+    'url': 'https://vimeo.com/42254051',
+    'tags': ['wtf', 'Kitsch', 'super-hero', 'parody'],
+}
+
+
+def test_split_search():
+    """Split search strings into included and excluded terms"""
+    assert split_search('Super "Italian spider" -man -"bat man"') == \
+        (['super', 'italian spider'], ['man', 'bat man'])
+    assert split_search(None) == ([], [])
+    assert split_search('  -  ""') == ([], [])
+
+
+@pytest.mark.parametrize('searchterm, matches', [
+    (None, True),
+    ('spiderman', True),
+    ('ITALIAN vimeo.com', True),
+    ('"italian spiderman"', True),
+    ('"spiderman italian"', False),
+    ('kitsch', True),
+    ('spiderman -parody', False),
+    ('batman', False),
+])
+def test_filter_searchterm(searchterm, matches):
+    """Search terms in titles, descriptions, URLs and tags"""
+    assert LinkFilter(searchterm=searchterm).match(LINK) is matches
+
+
+@pytest.mark.parametrize('searchtags, matches', [
+    ('wtf', True),
+    ('WTF kitsch', True),
+    ('wtf batman', False),
+    ('super', False),
+    ('super*', True),
+    ('*hero', True),
+    ('wtf -parody', False),
+    ('-batman', True),
+    ('-*hero', False),
+])
+def test_filter_searchtags(searchtags, matches):
+    """Search tags, with exclusions and wildcards"""
+    assert LinkFilter(searchtags=searchtags).match(LINK) is matches
+
+
+def test_filter_empty():
+    """An empty filter matches everything"""
+    assert not LinkFilter()
+    assert LinkFilter(searchtags='wtf')
+    assert LinkFilter().match({})
+
+
+def test_tokenize():
+    """Split text into lower-cased words"""
+    assert tokenize("Italian Spiderman, super-hero") == \
+        ['italian', 'spiderman', 'super', 'hero']
+
+
+def test_score_link():
+    """Title matches rank higher than description matches"""
+    assert score_link(LINK, ['spider'], {}) == 3
+    assert score_link(LINK, ['parody'], {}) == 3
+    assert score_link(LINK, ['parody'], {'parody': 2}) == 6
+    assert score_link(LINK, ['nowhere'], {}) == 0
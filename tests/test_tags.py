@@ -0,0 +1,138 @@
+"""Tests for bulk tag operations"""
+# pylint: disable=invalid-name
+import io
+import json
+from unittest import mock
+
+import pytest
+
+from shaarli_client.tags import (DependencyFailed, InvalidTagMapping,
+                                 TagOperation, apply_tag_plan,
+                                 plan_tag_operations, read_journal,
+                                 read_tag_mapping)
+
+MAPPING = '''
+# merge spelling variants
+py python
+python3 python   # trailing comment
+
+obsolete
+'''
+
+
+def test_read_tag_mapping():
+    """Read renames, merges and deletions"""
+    assert read_tag_mapping(io.StringIO(MAPPING)) == {
+        'py': 'python',
+        'python3': 'python',
+        'obsolete': None,
+    }
+
+
+@pytest.mark.parametrize('mapping, message', [
+    ('a b c', "Line 1: expected a tag and its new name"),
+    ('a b\n\na c', "Line 3: conflicting operations for tag 'a'"),
+    ('a b\na', "Line 2: conflicting operations for tag 'a'"),
+])
+def test_read_tag_mapping_errors(mapping, message):
+    """Invalid or conflicting lines are rejected"""
+    with pytest.raises(InvalidTagMapping) as exc:
+        read_tag_mapping(io.StringIO(mapping))
+    assert message in str(exc.value)
+
+
+def test_read_tag_mapping_duplicates():
+    """Repeated operations are applied once"""
+    assert read_tag_mapping(['a b', 'a b']) == {'a': 'b'}
+
+
+def test_plan_drops_noops():
+    """Missing tags, unchanged tags and applied operations are dropped"""
+    plan, dropped = plan_tag_operations(
+        {'py': 'python', 'perl': 'raku', 'same': 'same', 'done': 'over',
+         'gone': None},
+        ['py', 'python', 'same', 'done', 'gone'],
+        {('done', 'over')}
+    )
+
+    assert plan == [[TagOperation('py', 'python', 'merge'),
+                     TagOperation('gone', None, 'delete')]]
+    assert [(operation.tag, reason) for operation, reason in dropped] == \
+        [('perl', 'missing'), ('same', 'unchanged'), ('done', 'done')]
+
+
+def test_plan_chained_renames():
+    """Renames to a renamed or deleted tag are performed last"""
+    plan, _ = plan_tag_operations(
+        {'a': 'b', 'b': 'c', 'c': None, 'd': 'e'},
+        ['a', 'b', 'c', 'd']
+    )
+
+    assert [[operation.tag for operation in stage] for stage in plan] == \
+        [['c', 'd'], ['b'], ['a']]
+
+
+def test_plan_circular_renames():
+    """Circular renames are rejected"""
+    with pytest.raises(InvalidTagMapping) as exc:
+        plan_tag_operations({'a': 'b', 'b': 'c', 'c': 'a'}, ['a', 'b', 'c'])
+    assert "Circular renames: " in str(exc.value)
+
+
+class FakeClient:
+    """Record tag operations, failing for some tags"""
+
+    def __init__(self, failing=()):
+        self.failing = failing
+        self.calls = []
+
+    def put_tag(self, resource, params):
+        """Rename a tag"""
+        self.calls.append((resource, params['name']))
+        return mock.Mock(ok=resource not in self.failing)
+
+    def delete_tag(self, resource, params):
+        """Delete a tag"""
+        # pylint: disable=unused-argument
+        self.calls.append((resource, None))
+        return mock.Mock(ok=resource not in self.failing)
+
+
+@pytest.mark.parametrize('concurrency', [1, 4])
+def test_apply_tag_plan(concurrency):
+    """Operations are applied stage by stage, and journaled"""
+    client = FakeClient()
+    journal = io.StringIO()
+    plan, _ = plan_tag_operations({'a': 'b', 'b': 'c', 'd': None},
+                                  ['a', 'b', 'd'])
+
+    results = list(apply_tag_plan(client, plan, concurrency, journal))
+
+    assert [result.index for result in results] == [0, 1, 2]
+    assert all(result.ok for result in results)
+    assert client.calls[-1] == ('a', 'b')
+    assert read_journal(io.StringIO(journal.getvalue())) == \
+        {('a', 'b'), ('b', 'c'), ('d', None)}
+
+
+def test_apply_tag_plan_dependency_failed():
+    """Operations depending on a failed one are not applied"""
+    client = FakeClient(failing=['b'])
+    journal = io.StringIO()
+    plan, _ = plan_tag_operations({'a': 'b', 'b': 'c', 'z': 'a'},
+                                  ['a', 'b', 'z'])
+
+    results = list(apply_tag_plan(client, plan, journal=journal))
+
+    assert [result.ok for result in results] == [False, False, False]
+    assert isinstance(results[1].error, DependencyFailed)
+    assert str(results[2].error) == "Not applied, as merge of tag 'a' failed"
+    assert client.calls == [('b', 'c')]
+    assert journal.getvalue() == ''
+
+
+def test_read_journal():
+    """Applied operations are read back from the journal"""
+    lines = [json.dumps({'tag': 'a', 'name': 'b'}), '',
+             json.dumps({'tag': 'c', 'name': None})]
+    assert read_journal(lines) == {('a', 'b'), ('c', None)}
@@ -1,5 +1,6 @@
 """Tests for Shaarli client utilities"""
 # pylint: disable=invalid-name
+import io
 import json
 from argparse import ArgumentParser
 from unittest import mock
@@ -7,7 +8,15 @@ from unittest import mock
 import pytest
 from requests import Response
 
-from shaarli_client.utils import format_response, generate_endpoint_parser
+from shaarli_client.client.bulk import BulkResult
+from shaarli_client.client.deadline import Deadline, DeadlineExceeded
+from shaarli_client.utils import (InvalidLink, LazyArgumentParser,
+                                  format_bulk_results, format_items,
+                                  format_response, format_response_stream,
+                                  generate_all_commands_parsers,
+                                  generate_all_endpoints_parsers,
+                                  generate_endpoint_parser, iter_json_array,
+                                  parse_datetime, read_links)
 
 
 @mock.patch('argparse.ArgumentParser.add_argument')
@@ -145,6 +154,43 @@ def test_generate_endpoint_parser_resource(addargument):
     ])
 
 
+def test_generate_all_endpoints_parsers():
+    """Generate subparsers for all endpoints and return them by name"""
+    endpoints = {
+        'get-stuff': {'help': "Gets stuff", 'params': {}},
+        'put-stuff': {'help': "Changes stuff", 'params': {}},
+    }
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers()
+
+    parsers = generate_all_endpoints_parsers(subparsers, endpoints)
+
+    assert sorted(parsers.keys()) == ['get-stuff', 'put-stuff']
+    assert all(isinstance(p, ArgumentParser) for p in parsers.values())
+
+
+def test_generate_all_commands_parsers():
+    """Generate subparsers for all commands and return them by name"""
+    commands = {
+        'do-stuff': {
+            'help': "Does stuff",
+            'arguments': {
+                'infile': {'nargs': '?'},
+                '--count': {'type': int},
+            },
+        },
+    }
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest='endpoint_name')
+
+    parsers = generate_all_commands_parsers(subparsers, commands)
+    args = parser.parse_args(['do-stuff', 'in.txt', '--count', '3'])
+
+    assert list(parsers.keys()) == ['do-stuff']
+    assert (args.endpoint_name, args.infile, args.count) == \
+        ('do-stuff', 'in.txt', 3)
+
+
 def test_format_response_unsupported_format():
     """Attempt to use an unsupported formatting flag"""
     response = Response()
@@ -201,3 +247,216 @@ def test_format_response_json():
     # Ensure valid JSON is returned after formatting
     assert json.loads(format_response('json', response))
     assert json.loads(format_response('pprint', response))
+
+
+@pytest.mark.parametrize('output_format', ['json', 'jsonl', 'pprint', 'text'])
+@pytest.mark.parametrize('items', [
+    [],
+    [{'id': 1}],
+    [{'id': 2, 'tags': ['a', 'b']}, {'id': 1, 'title': "Yay!"}],
+])
+def test_format_items(output_format, items):
+    """Streamed formatting matches the formatting of a whole response"""
+    response = Response()
+    response.__setstate__({
+        '_content': json.dumps(items, separators=(',', ':')).encode(),
+    })
+
+    assert ''.join(format_items(output_format, iter(items))) == \
+        format_response(output_format, response)
+
+
+@pytest.mark.parametrize('output_format', ['json', 'pprint', 'text'])
+def test_format_items_deadline(output_format):
+    """Close the array of partial output once the deadline is over"""
+    def items():
+        yield {'id': 1}
+        raise DeadlineExceeded(Deadline(1))
+
+    chunks = []
+    with pytest.raises(DeadlineExceeded):
+        for chunk in format_items(output_format, items()):
+            chunks.append(chunk)
+
+    assert json.loads(''.join(chunks)) == [{'id': 1}]
+
+
+def test_format_items_unsupported_format():
+    """Attempt to use an unsupported formatting flag"""
+    with pytest.raises(ValueError) as err:
+        list(format_items('xml', []))
+
+    assert "not a supported format" in str(err.value)
+
+
+def test_read_links_jsonl():
+    """Read links from a JSON Lines file"""
+    infile = io.StringIO(
+        '{"url": "https://domain.tld", "tags": ["a", "b"]}\n'
+        '\n'
+        '{"title": "Note", "tags": "c d", "private": true}\n'
+    )
+    assert list(read_links(infile, 'jsonl')) == [
+        {'url': 'https://domain.tld', 'tags': ['a', 'b']},
+        {'title': 'Note', 'tags': ['c', 'd'], 'private': True},
+    ]
+
+
+def test_read_links_jsonl_invalid():
+    """Report the line holding an invalid link"""
+    infile = io.StringIO('{"url": "https://domain.tld"}\n[1, 2]\n')
+    with pytest.raises(ValueError) as err:
+        list(read_links(infile, 'jsonl'))
+    assert "line 2" in str(err.value)
+
+
+def test_read_links_report_errors():
+    """Yield invalid links as errors, and keep reading"""
+    infile = io.StringIO('{"url": "https://a.tld"}\nnot json\n'
+                         '{"url": "https://b.tld"}\n')
+    links = list(read_links(infile, 'jsonl', report_errors=True))
+
+    assert links[0] == {'url': 'https://a.tld'}
+    assert isinstance(links[1], InvalidLink)
+    assert links[1].line_number == 2
+    assert links[2] == {'url': 'https://b.tld'}
+
+
+def test_read_links_csv():
+    """Read links from a CSV file"""
+    infile = io.StringIO(
+        'url,title,tags,private\n'
+        'https://domain.tld,Domain,a b,0\n'
+        'https://other.tld,,,yes\n'
+    )
+    assert list(read_links(infile, 'csv')) == [
+        {'url': 'https://domain.tld', 'title': 'Domain',
+         'tags': ['a', 'b'], 'private': False},
+        {'url': 'https://other.tld', 'private': True},
+    ]
+
+
+def test_read_links_unsupported_format():
+    """Attempt to use an unsupported input format"""
+    with pytest.raises(ValueError) as err:
+        list(read_links(io.StringIO(''), 'xml'))
+    assert "not a supported input format" in str(err.value)
+
+
+def test_format_bulk_results():
+    """Format bulk operation results as JSON Lines"""
+    response = Response()
+    response.__setstate__({'_content': b'{"id":12}', 'status_code': 201})
+    response.retries = 2
+
+    output = ''.join(format_bulk_results([
+        BulkResult(0, {'url': 'a'}, response, None),
+        BulkResult(1, {'url': 'b'}, None, ValueError("Boom")),
+    ]))
+
+    assert [json.loads(line) for line in output.split('\n')] == [
+        {'index': 0, 'ok': True, 'status': 201,
+         'response': {'id': 12}, 'error': None, 'retries': 2},
+        {'index': 1, 'ok': False, 'status': None,
+         'response': None, 'error': 'Boom', 'retries': 0},
+    ]
+
+
+def test_format_response_jsonl():
+    """Format a Requests Response object to JSON Lines"""
+    response = Response()
+    response.__setstate__({'_content': b'[{"id":2},{"id":1}]'})
+    assert format_response('jsonl', response) == '{"id": 2}\n{"id": 1}'
+
+    response = Response()
+    response.__setstate__({'_content': b'{"name":"tag"}'})
+    assert format_response('jsonl', response) == '{"name": "tag"}'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 7, 4096])
+def test_iter_json_array(chunk_size):
+    """Decode array items from arbitrary chunks of text"""
+    items = [{'id': 3, 'title': "Yay! \u00e9"}, 1234567, [], "]", 0.5]
+    text = ' %s\n' % json.dumps(items, indent=2)
+    chunks = [
+        text[start:start + chunk_size]
+        for start in range(0, len(text), chunk_size)
+    ]
+    assert list(iter_json_array(chunks)) == items
+
+
+@pytest.mark.parametrize('text, message', [
+    ('{"id": 1}', "Expecting a JSON array"),
+    ('[{"id": 1}', "Truncated JSON array"),
+    ('[1 2]', "Expecting ',' delimiter"),
+])
+def test_iter_json_array_invalid(text, message):
+    """Invalid arrays are reported"""
+    with pytest.raises(ValueError) as err:
+        list(iter_json_array([text]))
+    assert message in str(err.value)
+
+
+def _streamed_response(content):
+    """Build a Requests Response object whose body has not been read"""
+    response = Response()
+    response.raw = io.BytesIO(content)
+    return response
+
+
+@pytest.mark.parametrize('output_format', ['json', 'jsonl', 'pprint', 'text'])
+@pytest.mark.parametrize('content', [
+    b'',
+    b'[]',
+    b'[{"id":2,"tags":["caf\xc3\xa9"]},{"id":1}]',
+    b'{"global_counter":3251,"settings":{"title":"Yay!"}}',
+])
+def test_format_response_stream(output_format, content):
+    """Streamed formatting matches the formatting of a whole response"""
+    response = Response()
+    response.__setstate__({'_content': content})
+
+    assert ''.join(format_response_stream(
+        output_format,
+        _streamed_response(content)
+    )) == format_response(output_format, response)
+
+
+def test_format_response_stream_unsupported_format():
+    """Attempt to use an unsupported formatting flag"""
+    with pytest.raises(ValueError) as err:
+        list(format_response_stream('xml', _streamed_response(b'[]')))
+    assert "not a supported format" in str(err.value)
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('2017-03-10T19:53:34+01:00', (2017, 3, 10, 18, 53, 34)),
+    ('2015-02-22T15:14:41+0000', (2015, 2, 22, 15, 14, 41)),
+])
+def test_parse_datetime(value, expected):
+    """Parse dates returned by the REST API"""
+    parsed = parse_datetime(value)
+    assert parsed.utctimetuple()[:6] == expected
+
+
+def test_parse_datetime_empty():
+    """Links that were never updated have an empty update date"""
+    assert parse_datetime('') is None
+
+
+def test_lazy_argument_parser():
+    """Arguments of lazy subparsers are added on first use"""
+    parser = ArgumentParser()
+    subparsers = parser.add_subparsers(dest='endpoint_name',
+                                       parser_class=LazyArgumentParser)
+    populate = mock.Mock(
+        side_effect=lambda parser, metadata: parser.add_argument('--stuff')
+    )
+    subparser = subparsers.add_parser('put-stuff')
+    subparser.defer(populate, {'help': "Changes stuff"})
+
+    populate.assert_not_called()
+    assert parser.parse_args(['put-stuff', '--stuff', 'x']).stuff == 'x'
+    populate.assert_called_once_with(subparser, {'help': "Changes stuff"})
+    assert '--stuff' in subparser.format_help()
+    populate.assert_called_once()